@@ -4,6 +4,9 @@
 #   cp api_config.example.py api_config.py
 # The file api_config.py is gitignored; never commit it with production keys.
 #
+# Optional settings not set here are read from an environment variable of the same
+# name; dict settings take a JSON object there, e.g. CHAT_CACHE='{"ttl_seconds": 3600}'.
+#
 # ============================================
 # AI Service Configuration
 # ============================================
@@ -18,6 +21,41 @@ MINIMAX_API_URL = 'https://api.minimaxi.com/v1/text/chatcompletion_v2'
 # Model name
 MINIMAX_MODEL = 'MiniMax-M2.1'
 
+# Voice clone endpoint (usually don't need to change)
+# MINIMAX_VOICE_CLONE_URL = 'https://api.minimaxi.com/v1/voice_clone'
+
+# UPSTREAM_POLICY: retries / timeouts for MiniMax calls. Per-attempt 'timeout' and the
+# overall 'deadline' are in seconds; 'hedge_after' (voice clone only) starts the HD model
+# in parallel when turbo has not answered after that many seconds (costs a second call).
+# UPSTREAM_POLICY = {
+#     'chat': {'attempts': 2, 'timeout': 30, 'deadline': 45},
+#     'voice_clone': {'attempts': 3, 'timeout': 45, 'deadline': 90, 'fallback_timeout': 60, 'hedge_after': None},
+# }
+
+# Circuit breaker around MiniMax (state shared by all workers in CACHE_DIR/upstream_health.sqlite3).
+# When at least 'min_calls' attempts in the last 'window_seconds' include 'failure_ratio'
+# failures (or successes slower than 'slow_fraction' × the attempt timeout), requests get an
+# immediate 503 for 'open_seconds', then a single probe decides whether to resume.
+# CIRCUIT_BREAKER = {
+#     'enabled': True,
+#     'window_seconds': 60,
+#     'min_calls': 6,
+#     'failure_ratio': 0.5,
+#     'slow_fraction': 0.8,
+#     'open_seconds': 30,
+#     'sync_seconds': 1.0,    # each worker flushes its counts / reads the shared state this often
+# }
+
+# Keep-alive connections to MiniMax kept open per Gunicorn worker
+# UPSTREAM_POOL_SIZE = 16
+
+# Async mode only (./optools.sh start async): max in-flight MiniMax calls per worker
+# UPSTREAM_ASYNC_MAX_CONNECTIONS = 500
+
+# Async mode only: threads per worker that run the Flask routes (pages, data files, /api/status,
+# job SSE and chunked audio streams — each open stream holds one thread)
+# ASYNC_WSGI_THREADS = 32
+
 # ============================================
 # Voice Cloning Configuration
 # ============================================
@@ -63,3 +101,111 @@ RATE_LIMIT = {
     # Maximum requests per minute per IP address (optional, 0 = unlimited)
     'requests_per_minute': 0,
 }
+
+# Runtime state directory (rate-limit store, chat cache, audio, precompressed static files).
+# Keep it outside the repository: everything under the repository root is served as static files.
+# Default: $XDG_CACHE_HOME/english-ai-assistant (~/.cache/english-ai-assistant)
+# CACHE_DIR = '/var/cache/english-ai-assistant'
+
+# GET /api/status/details (per-component counters, sizes and shared file paths) answers only
+# requests with "Authorization: Bearer <token>"; unset → the endpoint returns 404.
+# curl -H "Authorization: Bearer $TOKEN" http://127.0.0.1:8082/api/status/details
+# STATUS_DETAILS_TOKEN = 'change-me'
+
+# Rate limit storage backend
+# - 'memory': per-process counters (each Gunicorn worker counts separately)
+# - 'sqlite': one SQLite (WAL) file shared by all workers on this machine
+# - 'redis':  any Redis-protocol server, shared across machines
+RATE_LIMIT_BACKEND = 'memory'
+
+# Max client IPs tracked by the 'memory' backend per worker (least recently seen
+# IPs are evicted first; idle IPs expire automatically after the longest window)
+# RATE_LIMIT_MAX_CLIENTS = 10000
+
+# Used when RATE_LIMIT_BACKEND = 'sqlite' (default: CACHE_DIR/rate_limit.sqlite3)
+# RATE_LIMIT_SQLITE_PATH = '/var/cache/english-ai-assistant/rate_limit.sqlite3'
+
+# Used when RATE_LIMIT_BACKEND = 'redis'
+# RATE_LIMIT_REDIS_URL = 'redis://127.0.0.1:6379/0'
+
+# ============================================
+# AI Answer Cache
+# ============================================
+
+# Identical questions (case / spacing / trailing punctuation ignored) with the
+# same model and web-search flag are answered from cache instead of MiniMax.
+# Any key left out keeps its default.
+# CHAT_CACHE = {
+#     'enabled': True,
+#     'ttl_seconds': 7 * 24 * 3600,
+#     'max_entries': 2000,        # in-memory LRU entries per worker
+#     'disk': True,               # shared SQLite tier for all workers (CACHE_DIR/chat_cache.sqlite3)
+#     'max_disk_entries': 50000,
+# }
+
+# Precomputed word explanations (generate with ./optools.sh precompute-words).
+# Word-card questions ("future 是什么意思？") without web search are answered
+# from this file first; the server picks up a regenerated file within 30s.
+# WORD_EXPLANATIONS_PATH = 'data/word-explanations.json'
+
+# Word data indexed by GET /api/words (each worker rebuilds the index within 30s
+# of the file changing).
+# WORDS_DATA_PATH = 'data/words.json'
+
+# Full-text index for GET /api/search, written by ./optools.sh build-data and
+# memory-mapped by each worker (remapped within 30s of the file changing).
+# SEARCH_INDEX_PATH = 'data/search-index.bin'
+
+# ============================================
+# Static Files
+# ============================================
+
+# gzip (and brotli, if installed) copies of text files >= min_bytes, stored in 'dir'
+# (build ahead with ./optools.sh precompress-static). Any key left out keeps its default.
+# STATIC_ASSETS = {
+#     'precompress': True,
+#     'dir': '/var/cache/english-ai-assistant/static',   # default: CACHE_DIR/static
+#     'min_bytes': 1024,
+#     'check_seconds': 1.0,                    # re-stat a file at most this often
+#     'memory_max_bytes': 64 * 1024 * 1024,    # in-memory copies per Gunicorn worker
+#     'memory_file_max': 256 * 1024,           # larger bodies are sent with sendfile
+# }
+
+# ============================================
+# Voice Clone Audio Cache
+# ============================================
+
+# Synthesized audio is downloaded once per (file_id, model, text) and served
+# from /api/audio/... afterwards; least recently played files are removed when
+# the directory grows past max_bytes. Any key left out keeps its default.
+# VOICE_AUDIO_CACHE = {
+#     'enabled': True,
+#     'dir': '/var/cache/english-ai-assistant/audio',    # default: CACHE_DIR/audio
+#     'max_bytes': 1024 * 1024 * 1024,
+# }
+
+# Output of ./optools.sh presynth-listens (audio files + manifest.json);
+# /api/voice-clone serves chapters found in the manifest without calling MiniMax.
+# Default: CACHE_DIR/presynth
+# VOICE_PRESYNTH_DIR = '/var/cache/english-ai-assistant/presynth'
+
+# Text longer than the 10,000-character single-call limit is split into pieces of about
+# 'chunk_chars' that are synthesized in parallel ('concurrency' per Gunicorn worker) and
+# streamed back in order from /api/audio/stream/...; longer than 'max_chars' → 400.
+# VOICE_CHUNKED = {
+#     'enabled': True,
+#     'chunk_chars': 2000,
+#     'concurrency': 3,
+#     'max_chars': 100000,
+# }
+
+# Background voice-clone jobs (POST /api/voice-clone/jobs, used by the audiobook player).
+# 'workers' synthesis threads per Gunicorn worker; 'max_queue' active jobs site-wide
+# (more → 503); 'per_ip' active jobs per client (more → 429).
+# VOICE_JOBS = {
+#     'enabled': True,
+#     'workers': 2,
+#     'max_queue': 50,
+#     'per_ip': 2,
+#     'ttl_seconds': 3600,
+# }
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+英语单词学习网站 - 异步（ASGI）入口
+
+/api/chat（含 /api/chat/stream）与 /api/voice-clone 在事件循环中用 httpx.AsyncClient 调用 MiniMax，
+等待上游时不占用线程，单个进程可同时挂起数百个上游请求；
+其余请求（index.html、data/*.json、/api/status、SSE 与分段音频流等）仍由 server.py 的 Flask 应用处理，
+在每个 worker 独立的有界线程池（ASYNC_WSGI_THREADS 个线程）中并发执行，长时间的流式响应不会挡住其他请求。
+请求校验、速率限制、响应解析都复用 server.py 中的同一套函数；其中会读写 SQLite / Redis / 磁盘的调用
+（速率限制、问答缓存与跨 worker 租约、音频缓存写入、分段合成登记）用 asyncio.to_thread 放到线程池执行，
+不阻塞事件循环。
+
+启动方式：
+    ./optools.sh start async
+    （等价于 gunicorn asgi:app -k uvicorn_worker.UvicornWorker -w 4）
+
+依赖：pip install -r requirements-async.txt
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import server
+from server import (
+    ApiError,
+    app as flask_app,
+    check_rate_limit,
+    logger,
+)
+
+# 每个 worker 同时挂起的上游连接上限
+UPSTREAM_ASYNC_MAX_CONNECTIONS = int(server._optional_config('UPSTREAM_ASYNC_MAX_CONNECTIONS', 500))
+# 每个 worker 中同时执行 Flask 请求的线程数（SSE、分段音频流等长连接各占一个线程）
+ASYNC_WSGI_THREADS = int(server._optional_config('ASYNC_WSGI_THREADS', 32))
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+PREFLIGHT_HEADERS = CORS_HEADERS + [
+    (b'access-control-allow-methods', b'POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type'),
+]
+
+_client = None
+_client_pid = None
+
+
+def get_async_client():
+    """本 worker 共享的 httpx.AsyncClient（连接池 + keep-alive）"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        # 自定义 transport 时连接上限要设在 transport 上（AsyncClient 的 limits 参数会被忽略）
+        # retries 只重试建连失败，与同步版 get_upstream_session() 一致
+        _client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(
+            retries=2,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=server.UPSTREAM_POOL_SIZE,
+            ),
+        ))
+        _client_pid = os.getpid()
+    return _client
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': CORS_HEADERS + [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def read_json(receive):
+    """读取请求体并解析 JSON；格式错误时返回 None（与 Flask 视图中的空请求同样处理）"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(b''.join(chunks) or b'null')
+    except ValueError:
+        return None
+
+
+def client_ip_of(scope):
+    client = scope.get('client')
+    return client[0] if client else 'unknown'
+
+
+# ---------- AI 问答 ----------
+
+def is_retryable_async_error(e):
+    """server.is_retryable_upstream_error 的 httpx 版本"""
+    if isinstance(e, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in server.RETRYABLE_STATUS
+    return False
+
+
+async def call_minimax_api_async(question, enable_web_search=False):
+    """server.call_minimax_api 的异步版本（同样按 CHAT_POLICY 重试）"""
+    payload = server.build_chat_payload(question, enable_web_search)
+
+    async def attempt(timeout):
+        response = await get_async_client().post(
+            server.MINIMAX_API_URL,
+            headers=server.minimax_headers(),
+            json=payload,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        return await server.CHAT_POLICY.call_async(attempt, retryable=is_retryable_async_error)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"MiniMax API HTTP 错误: {e}")
+        try:
+            error_data = e.response.json()
+        except ValueError:
+            error_data = {}
+        raise Exception(f"API 请求失败: {error_data.get('base_resp', {}).get('msg', str(e))}")
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"MiniMax API 错误: {e}")
+        raise Exception(f"API 请求失败: {str(e)}")
+
+
+# 同一事件循环内相同问题的进行中调用：key -> asyncio.Future
+_chat_flights = {}
+
+
+async def wait_for_peer_answer_async(key, deadline):
+    """server.wait_for_peer_answer 的异步版本（轮询时不阻塞事件循环；deadline 为 loop.time()）"""
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        try:
+            answer, running = await asyncio.to_thread(server.chat_cache.poll_flight, key)
+        except sqlite3.Error as e:
+            logger.warning(f"问答请求合并轮询失败: {e}")
+            return None
+        if answer is not None or not running:
+            return answer
+        await asyncio.sleep(server.CHAT_FLIGHT_POLL_SECONDS)
+    return None
+
+
+async def join_chat_flight(key):
+    """若同一问题已在本进程进行中，等待并返回其回答；否则登记为 leader 并返回 (None, future)"""
+    future = _chat_flights.get(key)
+    if future is not None:
+        try:
+            answer = await asyncio.wait_for(asyncio.shield(future), server.CHAT_FLIGHT_FOLLOWER_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise server.chat_flight_timeout() from None
+        server.record_coalesced_chat()
+        return answer, None
+    future = _chat_flights[key] = asyncio.get_running_loop().create_future()
+    return None, future
+
+
+def finish_chat_flight(key, future, answer=None, error=None):
+    if _chat_flights.get(key) is future:
+        del _chat_flights[key]
+    if error is not None:
+        future.set_exception(error)
+        # 没有跟随者时也不要报 "exception was never retrieved"
+        future.exception()
+    else:
+        future.set_result(answer)
+
+
+async def claim_chat_flight_across_workers(key):
+    """server.claim_chat_flight 的异步版本：返回其他 worker 得到的回答，或 None（本 worker 已持有租约，负责调用上游）"""
+    cache = server.chat_cache
+    if cache is None or cache.db is None:
+        return None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + server.CHAT_FLIGHT_LEASE_SECONDS
+    while not await asyncio.to_thread(cache.claim_flight, key, server.CHAT_FLIGHT_LEASE_SECONDS):
+        answer = await wait_for_peer_answer_async(key, deadline)
+        if answer is not None:
+            server.record_coalesced_chat()
+            return answer
+        if loop.time() >= deadline:
+            raise server.chat_flight_timeout()
+    return None
+
+
+async def release_chat_flight_across_workers(key):
+    if server.chat_cache is not None:
+        await asyncio.to_thread(server.chat_cache.release_flight, key)
+
+
+async def answer_chat_question_async(question, enable_web_search=False):
+    """server.answer_chat_question 的异步版本，返回 (answer, coalesced)"""
+    key = server.ChatAnswerCache.make_key(question, enable_web_search)
+    answer, future = await join_chat_flight(key)
+    if future is None:
+        return answer, True
+    try:
+        answer = await claim_chat_flight_across_workers(key)
+        coalesced = answer is not None
+        if not coalesced:
+            try:
+                result = await call_minimax_api_async(question, enable_web_search)
+                answer = server.extract_chat_answer(result)
+                if server.chat_cache is not None:
+                    await asyncio.to_thread(server.chat_cache.put, question, enable_web_search, answer)
+            finally:
+                await release_chat_flight_across_workers(key)
+    except asyncio.CancelledError:
+        finish_chat_flight(key, future, error=Exception('请求已取消'))
+        raise
+    except Exception as e:
+        finish_chat_flight(key, future, error=e)
+        raise
+    finish_chat_flight(key, future, answer=answer)
+    return answer, coalesced
+
+
+async def chat_api(scope, receive, send):
+    """AI 问答 API 代理（异步）"""
+    client_ip = client_ip_of(scope)
+
+    allowed, message = await asyncio.to_thread(check_rate_limit, client_ip)
+    if not allowed:
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: {message}")
+        return await send_json(send, {'error': message}, 429)
+
+    try:
+        question, enable_web_search = server.parse_chat_request(await read_json(receive))
+        logger.info(f"API 请求 - IP: {client_ip}, 问题长度: {len(question)}")
+
+        answer, source = await asyncio.to_thread(server.lookup_chat_answer, question, enable_web_search)
+        if answer is not None:
+            logger.info(f"API 缓存命中（{source}） - IP: {client_ip}")
+            return await send_json(send, {'answer': answer, 'cached': True})
+
+        server.require_api_key()
+
+        answer, coalesced = await answer_chat_question_async(question, enable_web_search)
+
+        logger.info(f"API 成功 - IP: {client_ip}{'（合并请求）' if coalesced else ''}")
+        await send_json(send, {'answer': answer})
+    except ApiError as e:
+        await send_json(send, e.payload, e.status)
+    except Exception as e:
+        logger.error(f"API 错误 - IP: {client_ip}, 错误: {str(e)}")
+        await send_json(send, {'error': str(e)}, 500)
+
+
+async def send_sse_start(send):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': CORS_HEADERS + [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+
+async def send_sse(send, event, payload, more_body=True):
+    body = server.sse_event(event, payload).encode('utf-8')
+    await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+
+async def stream_minimax_api_async(question, enable_web_search=False):
+    """server.stream_minimax_api 的异步版本，逐段产出回答文本（收到响应头之前按 CHAT_POLICY 重试）"""
+    payload = server.build_chat_payload(question, enable_web_search)
+    payload['stream'] = True
+    client = get_async_client()
+
+    async def attempt(timeout):
+        request = client.build_request(
+            'POST', server.MINIMAX_API_URL, headers=server.minimax_headers(), json=payload, timeout=timeout
+        )
+        response = await client.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+        response.raise_for_status()
+        return response
+
+    response = await server.CHAT_POLICY.call_async(attempt, retryable=is_retryable_async_error)
+    try:
+        async for line in response.aiter_lines():
+            done, text = server.parse_chat_stream_line(line)
+            if done:
+                break
+            if text:
+                yield text
+    finally:
+        await response.aclose()
+
+
+async def chat_stream_api(scope, receive, send):
+    """AI 问答流式接口（异步），事件格式同 server.chat_stream_api"""
+    client_ip = client_ip_of(scope)
+
+    allowed, message = await asyncio.to_thread(check_rate_limit, client_ip)
+    if not allowed:
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: {message}")
+        return await send_json(send, {'error': message}, 429)
+
+    try:
+        question, enable_web_search = server.parse_chat_request(await read_json(receive))
+        logger.info(f"API 流式请求 - IP: {client_ip}, 问题长度: {len(question)}")
+        answer, source = await asyncio.to_thread(server.lookup_chat_answer, question, enable_web_search)
+        if answer is not None:
+            logger.info(f"API 缓存命中（{source}） - IP: {client_ip}")
+            await send_sse_start(send)
+            await send_sse(send, 'delta', {'text': answer})
+            return await send_sse(send, 'done', {'cached': True}, more_body=False)
+        server.require_api_key()
+    except ApiError as e:
+        return await send_json(send, e.payload, e.status)
+
+    await send_sse_start(send)
+    key = server.ChatAnswerCache.make_key(question, enable_web_search)
+    future = None
+    try:
+        # 相同问题已在进行中（本进程或其他 worker）：等待其结果后一次性返回
+        answer, future = await join_chat_flight(key)
+        if future is not None:
+            answer = await claim_chat_flight_across_workers(key)
+        if answer is None:
+            answer = await stream_chat_answer_async(send, key, question, enable_web_search)
+            logger.info(f"API 流式成功 - IP: {client_ip}")
+            done = {'cached': False}
+        else:
+            await send_sse(send, 'delta', {'text': answer})
+            done = {'cached': False, 'coalesced': True}
+        if future is not None:
+            finish_chat_flight(key, future, answer=answer)
+        await send_sse(send, 'done', done, more_body=False)
+    except asyncio.CancelledError:
+        if future is not None and not future.done():
+            finish_chat_flight(key, future, error=Exception('请求已取消'))
+        raise
+    except Exception as e:
+        if future is not None and not future.done():
+            finish_chat_flight(key, future, error=e)
+        logger.error(f"API 流式错误 - IP: {client_ip}, 错误: {str(e)}")
+        if isinstance(e, httpx.HTTPError):
+            e = f'API 请求失败: {e}'
+        await send_sse(send, 'error', {'error': str(e)}, more_body=False)
+
+
+async def stream_chat_answer_async(send, key, question, enable_web_search):
+    """作为 leader 流式调用上游并逐段转发，返回完整回答并写入缓存"""
+    parts = []
+    try:
+        async for text in stream_minimax_api_async(question, enable_web_search):
+            parts.append(text)
+            await send_sse(send, 'delta', {'text': text})
+    finally:
+        await release_chat_flight_across_workers(key)
+    answer = ''.join(parts)
+    if not answer:
+        raise Exception('API 响应格式错误，无法提取回答内容')
+    if server.chat_cache is not None:
+        await asyncio.to_thread(server.chat_cache.put, question, enable_web_search, answer)
+    return answer
+
+
+# ---------- 音色复刻 ----------
+
+async def call_voice_clone_api_async(file_id, text, voice_description='未知'):
+    """server.call_voice_clone_api 的异步版本（同样的 VOICE_CLONE_POLICY 重试、备选与对冲）"""
+    headers = server.minimax_headers()
+    client = get_async_client()
+
+    def synthesize(model):
+        async def attempt(timeout):
+            voice_id = server.new_voice_id()
+            logger.info(f"调用 MiniMax 音色复刻 API - voice_id: {voice_id}, 语音: {voice_description}, 模型: {model}")
+            response = await client.post(
+                server.MINIMAX_VOICE_CLONE_URL,
+                headers=headers,
+                json={'file_id': file_id, 'voice_id': voice_id, 'text': text, 'model': model},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"MiniMax 音色复刻 API 响应: {result}")
+            if server.voice_clone_succeeded(result):
+                return result
+            if model == server.VOICE_CLONE_MODEL:
+                raise server.FallbackRequired(f"极速版模型失败（{server.voice_clone_status_msg(result)}）")
+            raise Exception(f"音色复刻失败: {server.voice_clone_status_msg(result)}")
+        return attempt
+
+    return await server.VOICE_CLONE_POLICY.call_async(
+        synthesize(server.VOICE_CLONE_MODEL),
+        synthesize(server.VOICE_CLONE_FALLBACK_MODEL),
+        retryable=is_retryable_async_error
+    )
+
+async def rehost_voice_clone_audio_async(key, source_url, fallback_url):
+    """server.rehost_voice_clone_audio 的异步版本：用共享的 httpx 客户端下载（不超过 MAX_FILE_BYTES），
+    再在线程池中写入音频缓存（写文件与淘汰旧文件不阻塞事件循环）"""
+    audio_cache = server.audio_cache
+    ext = audio_cache.extension_of(source_url)
+    try:
+        chunks = []
+        size = 0
+        async with get_async_client().stream('GET', source_url, timeout=60) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(64 * 1024):
+                size += len(chunk)
+                if size > audio_cache.MAX_FILE_BYTES:
+                    raise Exception(f'音频文件超过 {audio_cache.MAX_FILE_BYTES} 字节，不缓存')
+                chunks.append(chunk)
+
+        def store():
+            with audio_cache.writer(key, ext) as write:
+                for chunk in chunks:
+                    write(chunk)
+
+        await asyncio.to_thread(store)
+        return audio_cache.url_for(key + ext)
+    except Exception as e:
+        logger.warning(f"音频缓存下载失败，返回上游地址: {e}")
+        return fallback_url
+
+
+async def voice_clone_api(scope, receive, send):
+    """音色复刻 API 代理（异步）"""
+    client_ip = client_ip_of(scope)
+
+    allowed, message = await asyncio.to_thread(check_rate_limit, client_ip)
+    if not allowed:
+        logger.warning(f"音色复刻速率限制触发 - IP: {client_ip}, 原因: {message}")
+        return await send_json(send, {'error': message}, 429)
+
+    try:
+        text, selected_voice = server.parse_voice_clone_request(await read_json(receive))
+        voice_description = selected_voice.get('description', '未知')
+        logger.info(f"音色复刻请求 - IP: {client_ip}, 文本长度: {len(text)}, 语音: {voice_description}")
+        cache_key = server.AudioCache.make_key(selected_voice['file_id'], text)
+        stored_url = await asyncio.to_thread(server.find_stored_voice_clone_audio, cache_key)
+        if stored_url is not None:
+            logger.info(f"音色复刻缓存命中 - IP: {client_ip}")
+            return await send_json(send, {'audio_url': stored_url, 'text': text, 'cached': True})
+        server.check_voice_clone_text_length(text)
+        server.require_api_key()
+
+        if server.needs_chunked_synthesis(text):
+            # 分段合成在 server 的线程池中进行，这里只登记（创建片段目录）并返回流式播放地址
+            audio_url = await asyncio.to_thread(
+                server.chunked_voice_clone.start, cache_key, selected_voice['file_id'], text, voice_description
+            )
+            logger.info(f"音色复刻分段合成已开始 - IP: {client_ip}")
+            return await send_json(send, {'audio_url': audio_url, 'text': text})
+
+        result = await call_voice_clone_api_async(selected_voice['file_id'], text, voice_description)
+        audio_url = server.voice_clone_audio_url(result)
+        if server.audio_cache is not None:
+            audio_url = await rehost_voice_clone_audio_async(cache_key, result['demo_audio'], audio_url)
+
+        logger.info(f"音色复刻成功 - IP: {client_ip}")
+        await send_json(send, {'audio_url': audio_url, 'text': text})
+    except ApiError as e:
+        await send_json(send, e.payload, e.status)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"MiniMax 音色复刻 API HTTP 错误 - IP: {client_ip}, 错误: {e}")
+        try:
+            error_data = e.response.json()
+        except ValueError:
+            error_data = {}
+        error_msg = error_data.get('base_resp', {}).get('msg', str(e))
+        await send_json(send, {
+            'error': f'API 请求失败: {error_msg}',
+            'details': str(e),
+            'client_ip': client_ip
+        }, 500)
+    except httpx.TimeoutException as e:
+        logger.error(f"MiniMax 音色复刻超时 - IP: {client_ip}, 错误: {e}")
+        await send_json(send, {
+            'error': '请求超时，请稍后重试',
+            'details': 'API 服务器响应时间过长',
+            'retryable': True
+        }, 504)
+    except httpx.NetworkError as e:
+        logger.error(f"MiniMax 音色复刻连接错误 - IP: {client_ip}, 错误: {e}")
+        await send_json(send, {
+            'error': '网络连接失败',
+            'details': '无法连接到 API 服务器，请检查网络设置',
+            'retryable': True
+        }, 502)
+    except Exception as e:
+        logger.error(f"音色复刻错误 - IP: {client_ip}, 错误: {str(e)}")
+        await send_json(send, {'error': str(e), 'client_ip': client_ip}, 500)
+
+
+# ---------- 路由 ----------
+
+ASYNC_ROUTES = {
+    '/api/chat': chat_api,
+    '/api/chat/stream': chat_stream_api,
+    '/api/voice-clone': voice_clone_api,
+}
+
+_wsgi_pool = None
+_wsgi_pool_pid = None
+
+
+def get_wsgi_pool():
+    """本 worker 执行 Flask 请求的线程池（fork 后按进程号重建）"""
+    global _wsgi_pool, _wsgi_pool_pid
+    if _wsgi_pool is None or _wsgi_pool_pid != os.getpid():
+        _wsgi_pool = ThreadPoolExecutor(max_workers=ASYNC_WSGI_THREADS, thread_name_prefix='wsgi')
+        _wsgi_pool_pid = os.getpid()
+    return _wsgi_pool
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """WsgiToAsgiInstance 默认用 thread_sensitive 的 sync_to_async，同一 worker 的所有 Flask 请求
+    排队在同一个线程上；这里改为在 get_wsgi_pool() 中执行，请求之间互不阻塞"""
+
+    # 父类的 run_wsgi_app 是 sync_to_async 包装后的同步函数，__wrapped__ 为原函数
+    _run_wsgi_app_sync = WsgiToAsgiInstance.__dict__['run_wsgi_app'].__wrapped__
+
+    async def run_wsgi_app(self, body):
+        run = sync_to_async(self._run_wsgi_app_sync, thread_sensitive=False, executor=get_wsgi_pool())
+        await run(body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+wsgi_app = PooledWsgiToAsgi(flask_app)
+
+
+async def app(scope, receive, send):
+    """ASGI 应用：异步路由优先，其余交给 Flask"""
+    if scope['type'] == 'http':
+        handler = ASYNC_ROUTES.get(scope['path'])
+        if handler is not None:
+            if scope['method'] == 'OPTIONS':
+                await send({'type': 'http.response.start', 'status': 200, 'headers': PREFLIGHT_HEADERS})
+                return await send({'type': 'http.response.body', 'body': b''})
+            if scope['method'] == 'POST':
+                return await handler(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if _client is not None:
+                    await _client.aclose()
+                return await send({'type': 'lifespan.shutdown.complete'})
+    return await wsgi_app(scope, receive, send)
@@ -223,7 +223,8 @@ async function checkServiceHealth() {
 
         clearTimeout(timeoutId);
         const data = await response.json();
-        return data.status === 'ok';
+        // degraded：AI 上游已熔断，但网站本身仍可正常使用
+        return data.status === 'ok' || data.status === 'degraded';
     } catch (error) {
         console.error('Service health check failed:', error);
         return false;
@@ -341,30 +342,62 @@ function updateHeroShanghaiDate() {
 }
 
 /** 按东八区日期确定性选取一词，避免简单取模导致连续多日过于相近 */
-function pickWordOfTheDay(words) {
-    if (!words.length) return null;
+function wordOfTheDayIndex(total) {
     let h = getShanghaiDayKey();
     h = (Math.imul(h, 7919) + 104729) >>> 0;
-    return words[h % words.length];
+    return h % total;
+}
+
+function pickWordOfTheDay(words) {
+    if (!words.length) return null;
+    return words[wordOfTheDayIndex(words.length)];
+}
+
+/** 今日一词：使用分片时按索引里各单元的单词数定位，只加载选中的那个单元 */
+async function findWordOfTheDay() {
+    const units = [];
+    (AppState.wordData || []).forEach(book => {
+        (book.units || []).forEach(unit => {
+            const shard = wordUnitShards.get(unit);
+            if (shard) units.push({ book, unit, count: shard.count });
+        });
+    });
+    if (!units.length) return pickWordOfTheDay(flattenAllWordsFromBooks(AppState.wordData));
+
+    const total = units.reduce((acc, entry) => acc + entry.count, 0);
+    if (!total) return null;
+    let offset = wordOfTheDayIndex(total);
+    const { book, unit } = units.find(entry => {
+        if (offset < entry.count) return true;
+        offset -= entry.count;
+        return false;
+    });
+    await loadWordUnitShard(unit);
+    const w = unit.words[offset];
+    return w ? { ...w, _bookName: book.name || '', _unitLabel: unit.unit || unit.title || '' } : null;
 }
 
 /** 首页 Hero：今日一词 +「问墨小灵」预填问题（替代外链笑话） */
-function loadHomeDailyWord() {
+async function loadHomeDailyWord() {
     updateHeroShanghaiDate();
 
     const statusEl = document.getElementById('daily-word-status');
     const innerEl = document.getElementById('daily-word-inner');
     if (!statusEl || !innerEl) return;
 
-    const all = flattenAllWordsFromBooks(AppState.wordData);
-    if (!all.length) {
+    let w;
+    try {
+        w = await findWordOfTheDay();
+    } catch (error) {
+        console.error('加载单词分片失败:', error.message);
+    }
+    if (w === null) {
         statusEl.hidden = false;
         statusEl.textContent = '暂无词书数据，请稍后在「单词」页学习。';
         innerEl.hidden = true;
         return;
     }
 
-    const w = pickWordOfTheDay(all);
     if (!w) {
         statusEl.hidden = false;
         statusEl.textContent = '暂时选不出今日一词。';
@@ -568,7 +601,7 @@ function bindEvents() {
 
     // 结果页操作
     document.getElementById('retry-test-btn')?.addEventListener('click', retryTest);
-    document.getElementById('review-wrong-btn')?.addEventListener('click', reviewWrongWords);
+    document.getElementById('review-wrong-btn')?.addEventListener('click', () => whenAllWordsLoaded(reviewWrongWords));
     document.getElementById('back-home-btn')?.addEventListener('click', () => switchPage('home'));
 
     // 错词本操作
@@ -626,10 +659,10 @@ function switchPage(pageName) {
             renderFlashcardSetup();
             break;
         case 'wrongbook':
-            renderWrongbookPage();
+            whenAllWordsLoaded(renderWrongbookPage);
             break;
         case 'favorites':
-            renderFavoritesPage();
+            whenAllWordsLoaded(renderFavoritesPage);
             break;
         case 'readings':
             showReadingsPage();
@@ -642,7 +675,7 @@ function switchPage(pageName) {
             // 这两个页面通过函数内部调用 switchPage，无需特殊初始化
             break;
         case 'progress':
-            renderProgressPage();
+            whenAllWordsLoaded(renderProgressPage);
             break;
         case 'tool':
             initToolPage();
@@ -1565,10 +1598,83 @@ function initGrammarTensesQuiz(root) {
 }
 
 // ========== 数据加载 ==========
+/** 带内容版本号的静态资源地址（server.py 在 index.html 中注入 window.ASSET_VERSIONS；其他方式打开时原样返回） */
+function assetUrl(path) {
+    const version = window.ASSET_VERSIONS && window.ASSET_VERSIONS[path];
+    return version ? `${path}?v=${version}` : path;
+}
+
+/** 单词分片：unit 对象 → { url, count, promise }（不写进 unit，导出 words.json 时不带多余字段） */
+const wordUnitShards = new WeakMap();
+
+/** 加载一个单元的单词分片（重复调用复用同一请求） */
+function loadWordUnitShard(unit) {
+    const shard = wordUnitShards.get(unit);
+    if (!shard) return Promise.resolve();
+    if (!shard.promise) {
+        shard.promise = fetch(shard.url)
+            .then(response => {
+                if (!response.ok) throw new Error(`加载单词分片失败: ${shard.url}`);
+                return response.json();
+            })
+            .then(words => {
+                unit.words = words;
+            })
+            .catch(error => {
+                shard.promise = null; // 允许稍后重试
+                throw error;
+            });
+    }
+    return shard.promise;
+}
+
+function loadWordBookShards(book) {
+    return Promise.all((book.units || []).map(loadWordUnitShard));
+}
+
+/** 听写、闪卡开始前只加载当前词书的分片；加载失败时记录日志，按已加载的单词继续 */
+async function ensureWordBookLoaded(book) {
+    try {
+        await loadWordBookShards(book);
+    } catch (error) {
+        console.error('加载单词分片失败:', error.message);
+    }
+}
+
+/** 需要全部单词的页面（错词本、收藏、进度）先加载所有词书的分片再渲染，已加载的分片不会重复请求 */
+function whenAllWordsLoaded(callback) {
+    Promise.all((AppState.wordData || []).map(loadWordBookShards)).then(callback, error => {
+        console.error('加载单词分片失败:', error.message);
+        callback();
+    });
+}
+
+/**
+ * 优先读取分片索引 data/words/index.json（词书 → 单元 → 分片地址、单词数）：
+ * 这里只建立词书 / 单元目录，某本词书的分片在用到时才加载；没有索引时回退到整份 words.json。
+ */
+async function loadWordDataFromShards() {
+    const response = await fetch(assetUrl('data/words/index.json'));
+    if (!response.ok) return false;
+    const index = await response.json();
+    AppState.wordData = (index.books || []).map(book => ({
+        id: book.id,
+        name: book.name,
+        units: (book.units || []).map(entry => {
+            const unit = { unit: entry.unit, title: entry.title, category: entry.category, words: [] };
+            wordUnitShards.set(unit, { url: entry.url, count: entry.count || 0, promise: null });
+            return unit;
+        })
+    }));
+    console.log('从服务器加载单词索引成功，共 ' + AppState.wordData.length + ' 个词书');
+    return true;
+}
+
 async function loadWordData() {
     try {
-        // 从服务器加载数据
-        const response = await fetch('data/words.json');
+        // 从服务器加载数据（分片优先）
+        if (await loadWordDataFromShards()) return;
+        const response = await fetch(assetUrl('data/words.json'));
         if (!response.ok) throw new Error('加载单词数据失败');
         AppState.wordData = await response.json();
         console.log('从服务器加载单词数据成功，共 ' + AppState.wordData.length + ' 个词书');
@@ -1885,7 +1991,7 @@ function handleWordBookChange(bookId) {
 }
 
 // 开始听写
-function startDictation() {
+async function startDictation() {
     const wordbookSelect = document.getElementById('wordbook-select');
     const unitSelect = document.getElementById('word-unit-select');
 
@@ -1902,6 +2008,7 @@ function startDictation() {
         showToast('没有找到单词数据');
         return;
     }
+    await ensureWordBookLoaded(book);
 
     // 收集所有单词
     let allWords = [];
@@ -2339,12 +2446,15 @@ function clearUnitSelection() {
     AppState.selectedUnits = [];
 }
 
-function startFlashcardTest() {
+async function startFlashcardTest() {
     if (AppState.flashcardSelectedUnits.length === 0) {
         alert('请至少选择一个单元');
         return;
     }
 
+    const currentBook = AppState.wordData.find(book => (book.id || book.name) === AppState.flashcardWordBook);
+    if (currentBook) await ensureWordBookLoaded(currentBook);
+
     // 获取测试模式
     const mode = document.querySelector('input[name="test-mode"]:checked').value;
 
@@ -3473,7 +3583,7 @@ function reviewWrongWords() {
 // ========== 阅读模块 ==========
 async function loadReadingData() {
     try {
-        const response = await fetch('data/readings.json');
+        const response = await fetch(assetUrl('data/readings.json'));
         if (!response.ok) throw new Error('加载阅读数据失败');
         const data = await response.json();
         // 清理临时字段
@@ -3497,7 +3607,7 @@ async function loadReadingData() {
 // 加载听书数据
 async function loadSpeechData() {
     try {
-        const response = await fetch('data/listen.json');
+        const response = await fetch(assetUrl('data/listen.json'));
         if (!response.ok) throw new Error('加载听书数据失败');
         const data = await response.json();
 
@@ -5083,10 +5193,10 @@ async function playSpeechWithVoiceClone(content) {
     // 重置暂停状态
     AppState.speechPaused = false;
 
-    // 显示持久提示（30秒后自动隐藏）
+    // 显示持久提示（2分钟后自动隐藏，与合成超时一致）
     showPersistentToast('正在生成克隆声音...', {
         autoHide: true,
-        hideAfter: 30000 // 30秒超时
+        hideAfter: 120000
     });
 
     try {
@@ -5127,11 +5237,12 @@ async function playSpeechWithVoiceClone(content) {
             }, 15000);
 
             try {
-                addVoiceCloneLog('调用 callVoiceCloneAPI', 'timeout=30秒');
+                addVoiceCloneLog('调用 callVoiceCloneAPI', 'timeout=120秒');
 
+                // 合成在服务器后台任务中进行，长文本也不会因单个请求过长被中断
                 audioUrl = await callVoiceCloneAPI(content, {
                     signal: abortController.signal,
-                    timeout: 30000 // 30秒超时
+                    timeout: 120000 // 120秒超时
                 });
 
                 addVoiceCloneLog('API 返回', audioUrl ? `URL长度: ${audioUrl.length}` : 'URL为空');
@@ -5163,7 +5274,7 @@ async function playSpeechWithVoiceClone(content) {
                 // 处理超时
                 if (error.name === 'AbortError' || error.message.includes('超时')) {
                     showToast('生成超时，请重试');
-                    addVoiceCloneLog('请求超时', '30秒内未响应，请重试');
+                    addVoiceCloneLog('请求超时', '120秒内未完成，请重试');
                     return;
                 }
 
@@ -5472,20 +5583,28 @@ function clearAudioCache() {
 }
 
 // 调用音色复刻 API
+// 轮询音色复刻任务状态的间隔（毫秒）
+const VOICE_CLONE_JOB_POLL_MS = 1500;
+
+// 提交音色复刻任务（POST /api/voice-clone/jobs）并轮询到完成，返回音频 URL
+// 每个请求都很短：长文本合成需要 45–60 秒，单个长请求常被 iOS Safari 或代理中断
 async function callVoiceCloneAPI(text, options = {}) {
-    const { timeout = 60000, signal } = options; // 默认 60 秒超时
+    const { timeout = 120000, signal } = options; // 默认 120 秒超时（含排队）
 
     addVoiceCloneLog('API 开始', `timeout=${timeout/1000}秒`);
 
-    // 创建 AbortController（如果未提供）
-    const controller = signal || new AbortController();
+    // 超时或调用方取消（signal）时中止提交与轮询请求
+    const controller = new AbortController();
+    if (signal) {
+        signal.addEventListener('abort', () => controller.abort());
+    }
     const timeoutId = setTimeout(() => {
         addVoiceCloneLog('API 超时', `已等待 ${timeout/1000} 秒`);
         controller.abort();
     }, timeout);
 
     try {
-        addVoiceCloneLog('fetch 开始', '请求 /api/voice-clone');
+        addVoiceCloneLog('fetch 开始', '提交 /api/voice-clone/jobs');
 
         // 构建请求数据，包含选中的 file_id
         const requestData = {
@@ -5498,7 +5617,7 @@ async function callVoiceCloneAPI(text, options = {}) {
             addVoiceCloneLog('语音选择', AppState.speechCloneSelectedVoice.description || '未知');
         }
 
-        const response = await fetch('/api/voice-clone', {
+        const response = await fetch('/api/voice-clone/jobs', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -5507,16 +5626,33 @@ async function callVoiceCloneAPI(text, options = {}) {
             signal: controller.signal
         });
 
-        clearTimeout(timeoutId);
         addVoiceCloneLog('fetch 完成', `status=${response.status}`);
 
         if (!response.ok) {
-            const error = await response.json();
+            const error = await response.json().catch(() => ({}));
             addVoiceCloneLog('API 响应错误', error.error || '请求失败');
             throw new Error(error.error || '音色复刻请求失败');
         }
 
-        const data = await response.json();
+        // 已预合成或缓存的文本直接返回 done；否则按任务 ID 轮询
+        let data = await response.json();
+        const statusUrl = data.status_url;
+        while (data.status !== 'done') {
+            if (data.status === 'error') {
+                addVoiceCloneLog('任务失败', data.error || '未知错误');
+                throw new Error(data.error || '音色复刻失败');
+            }
+            addVoiceCloneLog('任务进行中', data.position ? `排队第 ${data.position} 位` : data.status);
+            await new Promise(resolve => setTimeout(resolve, VOICE_CLONE_JOB_POLL_MS));
+            const statusResponse = await fetch(statusUrl, { signal: controller.signal });
+            if (!statusResponse.ok) {
+                const error = await statusResponse.json().catch(() => ({}));
+                throw new Error(error.error || '查询合成任务失败');
+            }
+            data = await statusResponse.json();
+        }
+
+        clearTimeout(timeoutId);
         addVoiceCloneLog('解析响应', data.audio_url ? 'audio_url 存在' : 'audio_url 为空');
         return data.audio_url;
     } catch (error) {
@@ -6535,7 +6671,7 @@ function initMoxiaolingMainLottie() {
         renderer: 'svg',
         loop: true,
         autoplay: true,
-        path,
+        path: assetUrl(path),
         rendererSettings: {
             preserveAspectRatio: 'xMidYMid meet'
         }
@@ -6729,6 +6865,60 @@ function setMoxiaolingMascotState(state) {
     syncMoxiaolingLottiePlayback(state);
 }
 
+// 渲染问答回答（Markdown → HTML）；流式接收时每收到一段就整体重渲染一次
+function renderQAAnswer(answerEl, markdown) {
+    if (typeof marked !== 'undefined') {
+        marked.setOptions({
+            breaks: true,
+            gfm: true,
+            headerIds: false,
+            mangle: false
+        });
+        answerEl.innerHTML = marked.parse(markdown);
+    } else {
+        answerEl.innerHTML = escapeHtml(markdown).replace(/\n/g, '<br>');
+    }
+}
+
+// 读取 /api/chat/stream 的 SSE 事件（delta / done / error），每收到一段文本回调 onText(已收到的全文)
+async function readChatStream(response, onText) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+
+            const payload = JSON.parse(data);
+            if (event === 'delta') {
+                answer += payload.text || '';
+                onText(answer);
+            } else if (event === 'error') {
+                throw new Error(payload.error || '请求失败');
+            } else if (event === 'done') {
+                return answer;
+            }
+        }
+    }
+    return answer;
+}
+
 async function submitQA() {
     const inputEl = document.getElementById('qa-input');
     const submitBtn = document.getElementById('qa-submit-btn');
@@ -6759,7 +6949,9 @@ async function submitQA() {
         const enableWebSearch = document.getElementById('web-search-toggle').checked;
 
         // 调用本地 API 服务器（server.py），由后端代理调用 MiniMax
-        const response = await fetch(`${API_BASE_URL}/chat`, {
+        // 优先使用流式接口：第一段文字到达就开始显示，不必等整段回答生成完
+        const supportsStream = typeof ReadableStream !== 'undefined' && typeof TextDecoder !== 'undefined';
+        const response = await fetch(`${API_BASE_URL}/${supportsStream ? 'chat/stream' : 'chat'}`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -6775,21 +6967,25 @@ async function submitQA() {
             throw new Error(errorData.error || `请求失败: ${response.status}`);
         }
 
-        const data = await response.json();
+        let answer = '';
+        const contentType = response.headers.get('Content-Type') || '';
+        if (response.body && contentType.includes('text/event-stream')) {
+            answer = await readChatStream(response, text => {
+                if (loadingEl.style.display !== 'none') {
+                    loadingEl.style.display = 'none';
+                    loadingEl.setAttribute('aria-busy', 'false');
+                    resultEl.style.display = 'block';
+                }
+                renderQAAnswer(answerEl, text);
+            });
+        } else {
+            const data = await response.json();
+            answer = data.answer;
+        }
 
-        if (data.answer) {
+        if (answer) {
             // 使用 marked.js 解析 Markdown
-            if (typeof marked !== 'undefined') {
-                marked.setOptions({
-                    breaks: true,
-                    gfm: true,
-                    headerIds: false,
-                    mangle: false
-                });
-                answerEl.innerHTML = marked.parse(data.answer);
-            } else {
-                answerEl.innerHTML = data.answer.replace(/\n/g, '<br>');
-            }
+            renderQAAnswer(answerEl, answer);
             setMoxiaolingMascotState('happy');
             mascotHappyTimer = setTimeout(() => {
                 setMoxiaolingMascotState('idle');
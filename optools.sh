@@ -3,10 +3,16 @@
 # Word Wizard - Server Script
 # Uses Flask-based server with API proxy for AI features
 # Usage: ./optools.sh start|stop|restart|status
+#        ./optools.sh start|restart async      # asyncio mode for /api/chat + /api/voice-clone (asgi.py)
 #        ./optools.sh init|install [--force]   # venv + Python deps
 #        ./optools.sh check-env                # report env & dependencies (no changes)
 #        ./optools.sh check-words|check-readings|check-listens [path]
 #        ./optools.sh convert-words|convert-readings|convert-listens
+#        ./optools.sh build-data [words|readings|listens] [--force]  # Python, incremental convert + check
+#        ./optools.sh bench <name>             # micro-benchmarks (see scripts/README.md)
+#        ./optools.sh precompute-words [options] # AI explanations for data/words.json
+#        ./optools.sh presynth-listens [options] # voice-clone audio for data/listen.json
+#        ./optools.sh precompress-static         # gzip / brotli copies of css, js, data, lottie
 
 # 脚本所在目录即仓库根目录，便于从任意 cwd 调用
 ROOT="$(cd "$(dirname "$0")" && pwd)"
@@ -15,6 +21,8 @@ cd "$ROOT" || exit 1
 PORT=8082
 export PORT
 PID_FILE=".server.pid"
+# sync: server:app（同步 Gunicorn worker）；async: asgi:app（Uvicorn worker，上游调用不占线程）
+SERVER_MODE="${SERVER_MODE:-sync}"
 
 # Primary non-loopback IPv4 for LAN access (Gunicorn binds 0.0.0.0)
 get_lan_ipv4() {
@@ -197,7 +205,7 @@ check_env() {
     if command -v node &>/dev/null; then
         echo "  node:    $(node --version 2>&1) ($(command -v node))"
     else
-        echo "  node:    NOT FOUND (needed for convert-words / convert-readings / convert-listens)"
+        echo "  node:    NOT FOUND (needed for convert-words / convert-readings / convert-listens; build-data does not need it)"
     fi
     echo ""
 
@@ -315,6 +323,15 @@ install_deps() {
 }
 
 start_server() {
+    [ -n "$1" ] && SERVER_MODE="$1"
+    case "$SERVER_MODE" in
+        sync|async) ;;
+        *)
+            echo "[Error] Unknown server mode: $SERVER_MODE (expected: sync | async)"
+            exit 1
+            ;;
+    esac
+
     # Check if virtual environment exists
     create_venv
     
@@ -322,6 +339,7 @@ start_server() {
     echo "Starting Server (Gunicorn)"
     echo "========================================"
     echo "Port: $PORT"
+    echo "Mode: $SERVER_MODE"
     echo "Python: $(get_python_cmd)"
     echo "Virtual Environment: $USE_VENV"
     echo "PID File: $PID_FILE"
@@ -391,10 +409,22 @@ start_server() {
         fi
     fi
 
+    local APP_ARGS="server:app"
+    if [ "$SERVER_MODE" = "async" ]; then
+        if ! $PYTHON_CMD -c "import uvicorn_worker, httpx, asgiref" 2>/dev/null; then
+            echo ""
+            echo "[Error] Async mode needs extra packages:"
+            echo "  $(get_pip_cmd) install -r requirements-async.txt"
+            echo ""
+            exit 1
+        fi
+        APP_ARGS="asgi:app -k uvicorn_worker.UvicornWorker"
+    fi
+
     echo "[Info] Starting Gunicorn..."
-    echo "[Debug] Command: $GUNICORN_CMD server:app -w 4 -b 0.0.0.0:$PORT"
+    echo "[Debug] Command: $GUNICORN_CMD $APP_ARGS -w 4 -b 0.0.0.0:$PORT"
     
-    $GUNICORN_CMD server:app -w 4 -b 0.0.0.0:$PORT --pid "$PID_FILE" --daemon 2>&1
+    $GUNICORN_CMD $APP_ARGS -w 4 -b 0.0.0.0:$PORT --pid "$PID_FILE" --daemon 2>&1
     EXIT_CODE=$?
     
     if [ $EXIT_CODE -ne 0 ]; then
@@ -455,10 +485,10 @@ stop_server() {
         
         # Check for Gunicorn server
         if [ "$stopped" = false ]; then
-            PID=$(pgrep -f "gunicorn.*server:app" 2>/dev/null | head -1)
+            PID=$(pgrep -f "gunicorn.*(server|asgi):app" 2>/dev/null | head -1)
             if [ -n "$PID" ]; then
                 echo "Found Gunicorn process (PID: $PID)"
-            pkill -f "gunicorn.*server:app" 2>/dev/null
+            pkill -f "gunicorn.*(server|asgi):app" 2>/dev/null
                 sleep 1
                 rm -f "$PID_FILE"
                 echo "✓ Server stopped (Gunicorn)"
@@ -508,7 +538,7 @@ check_status() {
         
         # Check for Gunicorn server
         if [ "$running" = false ]; then
-            pid=$(pgrep -f "gunicorn.*server:app" 2>/dev/null | head -1)
+            pid=$(pgrep -f "gunicorn.*(server|asgi):app" 2>/dev/null | head -1)
             if [ -n "$pid" ]; then
                 echo "✓ Server is running (Gunicorn, PID: $pid)"
                 running=true
@@ -540,7 +570,7 @@ check_status() {
 
 case "$1" in
     start)
-        start_server
+        start_server "$2"
         ;;
     stop)
         stop_server
@@ -548,7 +578,7 @@ case "$1" in
     restart)
         stop_server
         sleep 1
-        start_server
+        start_server "$2"
         ;;
     install)
         shift
@@ -588,11 +618,32 @@ case "$1" in
         shift
         node scripts/convert-listens.js "$@"
         ;;
+    build-data)
+        shift
+        "$(get_python_cmd)" scripts/build-data.py "$@"
+        ;;
+    bench)
+        shift
+        "$(get_python_cmd)" scripts/benchmark.py "$@"
+        ;;
+    precompute-words)
+        shift
+        "$(get_python_cmd)" scripts/precompute-word-explanations.py "$@"
+        ;;
+    presynth-listens)
+        shift
+        "$(get_python_cmd)" scripts/presynthesize-listens.py "$@"
+        ;;
+    precompress-static)
+        shift
+        "$(get_python_cmd)" scripts/precompress-static.py "$@"
+        ;;
     *)
         echo "Usage: ./optools.sh <command> [arguments]"
         echo ""
         echo "Server:"
         echo "  ./optools.sh start           # Start (Gunicorn, 4 workers)"
+        echo "  ./optools.sh start async     # Start in asyncio mode (needs requirements-async.txt)"
         echo "  ./optools.sh stop            # Stop server"
         echo "  ./optools.sh restart         # Restart"
         echo "  ./optools.sh check-env       # Check python/node/venv/deps (no changes)"
@@ -608,6 +659,11 @@ case "$1" in
         echo "  ./optools.sh convert-words"
         echo "  ./optools.sh convert-readings"
         echo "  ./optools.sh convert-listens"
+        echo "  ./optools.sh build-data [words|readings|listens] [--force]   # all three in Python, only changed books"
+        echo "  ./optools.sh bench rate-limit   # server.py micro-benchmarks"
+        echo "  ./optools.sh precompute-words   # data/words.json → data/word-explanations.json (MiniMax)"
+        echo "  ./optools.sh presynth-listens   # data/listen.json → CACHE_DIR/presynth/ voice-clone audio (MiniMax)"
+        echo "  ./optools.sh precompress-static # css/js/data/lottie → CACHE_DIR/static/ gzip (+ br) copies"
         echo ""
         echo "Configuration:"
         echo "  cp api_config.example.py api_config.py"
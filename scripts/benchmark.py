@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+server.py 性能基准工具
+运行方式（在仓库根目录）：python3 scripts/benchmark.py <名称> [--iterations N]
+
+可用基准：
+  rate-limit   速率限制判定耗时（不同历史长度下的单次判定成本）
+  rate-limit-redis  Redis 后端（本地 redis-server 或内置 RESP 替身）与内存后端的判定比对及往返耗时
+  upstream     对本地模拟 MiniMax 服务的单次请求延迟：每次新建连接 vs 共享连接池
+  voice-clone  音色复刻调用策略在注入超时 / 慢模型 / 合成失败时的耗时与结果（重试、备选、对冲）
+  circuit-breaker  上游持续超时时每个问答请求的耗时：无熔断 vs 有熔断
+  static       静态文件每秒请求数：send_from_directory vs 每次读文件 vs 内存缓存
+  words        /api/words 查询索引与线性扫描全部单词的耗时对比
+  spelling     听写拼写纠错：删除索引与逐个计算编辑距离的耗时对比
+  word-codec   words.json 与紧凑编码 words.compact.json 的大小与解析耗时
+  search       全文检索索引在复制 100 份的阅读 / 听书语料上的查询延迟
+  checkers     check-*-format.py 在放大到多 MB 的 data/*.md 上的吞吐量与峰值内存
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
+sys.path.insert(0, _REPO_ROOT)
+
+
+def _per_call_us(func, iterations):
+    """执行 func 若干次，返回单次平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_rate_limit(args):
+    """历史长度从 10 增长到 100,000 时，内存后端单次判定耗时应保持不变"""
+    import server
+
+    print('📊 速率限制判定耗时（memory 后端，小时 + 每日窗口均已填满）')
+    print(f"{'历史长度':>10}  {'允许路径 (µs)':>14}  {'拒绝路径 (µs)':>14}")
+    for size in (10, 1000, 100000):
+        backend = server.MemoryRateLimitBackend()
+        now = time.time()
+        windows = [('hourly', 3600, size), ('daily', 86400, size * 2)]
+        for _ in range(size):
+            backend.hit('warm', now, windows, 0)
+
+        # 允许路径：同一客户端 'allow' 已有 size 条记录，上限留足余量，计时的每次调用都会被允许
+        allow_limit = size + args.iterations + 1
+        allow_windows = [('hourly', 3600, allow_limit), ('daily', 86400, allow_limit * 2)]
+        for i in range(size):
+            backend.hit('allow', now, allow_windows, 0)
+        allowed = _per_call_us(lambda i: backend.hit('allow', now, allow_windows, 0), args.iterations)
+        assert backend.hit('allow', now, allow_windows, 0)[0], '允许路径的计时调用被拒绝'
+        # 拒绝路径：'warm' 的小时窗口已满
+        assert not backend.hit('warm', now, windows, 0)[0]
+        denied = _per_call_us(lambda i: backend.hit('warm', now, windows, 0), args.iterations)
+        print(f'{size:>10}  {allowed:>14.2f}  {denied:>14.2f}')
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Redis 协议（RESP）的最小替身：只执行 RedisRateLimitBackend.SCRIPT（用 Python 按同样的规则计算）
+
+    没有 redis-server 时用于检查 RESP 客户端、参数布局与回复解析；有序集合保存在 zsets 中（所有连接共享）。
+    """
+
+    zsets = {}
+    _lock = threading.Lock()
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            self.wfile.write(self._dispatch(args))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            raise ValueError(line)
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def _dispatch(self, args):
+        import server
+
+        command = args[0].upper()
+        if command in ('PING', 'AUTH', 'SELECT'):
+            return b'+OK\r\n'
+        if command != 'EVAL' or args[1] != server.RedisRateLimitBackend.SCRIPT:
+            return b'-ERR unsupported command\r\n'
+        with self._lock:
+            reply = self._rate_limit(args[3], args[4:])
+        # Lua 返回的 {整数, 字符串, 字符串} → RESP 数组（整数 + 两个 bulk string）
+        parts = [b'*3\r\n:%d\r\n' % reply[0]]
+        for value in reply[1:]:
+            data = value.encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+
+    def _rate_limit(self, key, argv):
+        """与 Lua 脚本相同：清理过期成员 → 逐个窗口检查 → 冷却检查 → 记录本次请求"""
+        now, cooldown, horizon, member = float(argv[0]), float(argv[1]), float(argv[2]), argv[3]
+        entries = [(score, m) for score, m in self.zsets.get(key, []) if score > now - horizon]
+        for i in range(4, len(argv), 3):
+            window, seconds, limit = argv[i], float(argv[i + 1]), int(argv[i + 2])
+            recent = [score for score, _m in entries if score > now - seconds]
+            if len(recent) >= limit:
+                self.zsets[key] = entries
+                return 0, window, repr(min(recent) + seconds)
+        if cooldown > 0 and entries and now - entries[-1][0] < cooldown:
+            self.zsets[key] = entries
+            return 0, 'cooldown', repr(entries[-1][0] + cooldown)
+        entries.append((now, member))
+        entries.sort()
+        self.zsets[key] = entries
+        return 1, 'ok', ''
+
+
+def start_redis():
+    """有 redis-server 时在随机端口启动一个临时实例（真实的 Lua 执行），否则启动 FakeRedisHandler
+
+    返回 (url, 说明, stop())。
+    """
+    import shutil
+    import socket
+    import subprocess
+
+    binary = shutil.which('redis-server') or shutil.which('valkey-server')
+    if binary:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        process = subprocess.Popen(
+            [binary, '--port', str(port), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(50):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        return f'redis://127.0.0.1:{port}/0', os.path.basename(binary), process.terminate
+
+    FakeRedisHandler.zsets = {}
+    redis = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeRedisHandler)
+    redis.daemon_threads = True
+    threading.Thread(target=redis.serve_forever, daemon=True).start()
+    return f'redis://127.0.0.1:{redis.server_address[1]}/0', '内置 RESP 替身（未找到 redis-server）', redis.shutdown
+
+
+def bench_rate_limit_redis(args):
+    """Redis 后端（EVAL + Lua 脚本）：与内存后端的判定逐次比对，并测量单次判定往返耗时"""
+    import server
+
+    url, kind, stop = start_redis()
+    print(f'📊 速率限制 Redis 后端（{kind}）')
+    try:
+        redis = server.RedisRateLimitBackend(url)
+        memory = server.MemoryRateLimitBackend()
+        # (客户端, 窗口, 冷却秒数, 连续请求次数)
+        cases = [
+            ('window', [('minute', 60, 3), ('hourly', 3600, 5)], 0, 5),
+            ('hourly', [('minute', 60, 10), ('hourly', 3600, 2)], 0, 3),
+            ('cooldown', [('minute', 60, 10)], 30, 3),
+        ]
+        failures = []
+        for client, windows, cooldown, count in cases:
+            decisions = []
+            failed_before = len(failures)
+            for _ in range(count):
+                now = time.time()
+                got = redis.hit(client, now, windows, cooldown)
+                expected = memory.hit(client, now, windows, cooldown)
+                decisions.append(f"{'允许' if got[0] else got[1]}")
+                if got[:2] != expected[:2]:
+                    failures.append(f'{client}: Redis {got[:2]}，内存后端 {expected[:2]}')
+                elif not got[0] and not now < got[2] <= now + max([s for _w, s, _l in windows] + [cooldown]):
+                    failures.append(f'{client}: reset_at {got[2]} 不合理')
+            print(f"   {'✓' if len(failures) == failed_before else '✗'} {client:<10} {' → '.join(decisions)}")
+
+        windows = [('minute', 60, 10 ** 9), ('hourly', 3600, 10 ** 9)]
+        iterations = min(args.iterations, 2000)
+        per_call = _per_call_us(lambda i: redis.hit('bench', time.time(), windows, 0), iterations)
+        print(f'   单次判定（EVAL 往返）: {per_call:.1f} µs（{iterations} 次平均）')
+    finally:
+        stop()
+    if failures:
+        raise SystemExit('Redis 后端与内存后端的判定不一致：\n  ' + '\n  '.join(failures))
+
+
+class FakeMiniMaxHandler(BaseHTTPRequestHandler):
+    """模拟 MiniMax 的聊天 / 音色复刻接口（HTTP/1.1，支持 keep-alive）"""
+
+    protocol_version = 'HTTP/1.1'
+    # 头和正文分两次写出，不关 Nagle 会在 keep-alive 连接上叠加 40ms 延迟确认
+    disable_nagle_algorithm = True
+    # 每个请求额外等待的秒数，用于模拟上游耗时
+    delay = 0.0
+    # 按模型额外等待的秒数，如 {'speech-2.6-turbo': 2.0}
+    model_delays = {}
+    # 故障注入：接下来 hang_requests 个请求先等待 hang_seconds（超过客户端超时即为一次超时）
+    hang_requests = 0
+    hang_seconds = 0.0
+    # 故障注入：这些模型返回 status_msg 不是 success 的合成结果
+    failing_models = set()
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        with self._lock:
+            hang = FakeMiniMaxHandler.hang_requests > 0
+            if hang:
+                FakeMiniMaxHandler.hang_requests -= 1
+        if hang:
+            time.sleep(self.hang_seconds)
+        delay = self.delay + self.model_delays.get(payload.get('model'), 0.0)
+        if delay:
+            time.sleep(delay)
+        if payload.get('stream'):
+            return self._send_stream('future 的意思是“将来”。')
+        if self.path.endswith('/voice_clone'):
+            failed = payload.get('model') in self.failing_models
+            body = {
+                'demo_audio': '' if failed else f'http://{self.headers["Host"]}/audio/{payload.get("voice_id", "voice")}.mp3',
+                'base_resp': {'status_code': 1 if failed else 0, 'status_msg': 'failed' if failed else 'success'},
+                'model': payload.get('model'),
+            }
+        else:
+            body = {'choices': [{'message': {'role': 'assistant', 'content': 'future 的意思是“将来”。'}}]}
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """demo_audio 指向的音频文件（固定内容的假 MP3）"""
+        data = b'ID3' + bytes(range(256)) * 64
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content):
+        """stream: true 时按 SSE 分片返回（每个字一个 delta，最后是汇总的 message 分片）"""
+        events = [{'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': ch}}]} for ch in content]
+        events.append({'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'content': content}}]})
+        lines = [f'data: {json.dumps(e, ensure_ascii=False)}\n\n'.encode('utf-8') for e in events]
+        lines.append(b'data: [DONE]\n\n')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Content-Length', str(sum(len(line) for line in lines)))
+        self.end_headers()
+        for line in lines:
+            self.wfile.write(line)
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认监听队列只有 5，并发基准会被拒绝连接
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 故障注入的请求会被客户端超时断开，写响应时的 BrokenPipe 属于预期
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_fake_minimax(handler=FakeMiniMaxHandler):
+    """在随机端口启动模拟服务，返回 (server, base_url)"""
+    httpd = _FakeServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f'http://127.0.0.1:{httpd.server_address[1]}'
+
+
+def bench_upstream(args):
+    """同样的问答请求：模块级 requests.post（每次新连接）vs get_upstream_session()（连接复用）"""
+    import requests
+    import server
+
+    httpd, base_url = start_fake_minimax()
+    server.MINIMAX_API_URL = f'{base_url}/v1/text/chatcompletion_v2'
+    iterations = min(args.iterations, 2000)
+    payload = {'model': server.MINIMAX_MODEL, 'messages': [{'role': 'user', 'content': 'future'}]}
+
+    fresh = _per_call_us(
+        lambda i: requests.post(server.MINIMAX_API_URL, json=payload, timeout=5).json(),
+        iterations
+    )
+    server.call_minimax_api('warm up')
+    pooled = _per_call_us(lambda i: server.call_minimax_api('future'), iterations)
+    httpd.shutdown()
+
+    print(f'📊 上游请求延迟（本地模拟服务，{iterations} 次，明文 HTTP；真实 HTTPS 省下的 TLS 握手更多）')
+    print(f'   每次新建连接: {fresh / 1000:.3f} ms/次')
+    print(f'   共享连接池:   {pooled / 1000:.3f} ms/次')
+    print(f'   每次节省:     {(fresh - pooled) / 1000:.3f} ms')
+
+
+def bench_voice_clone(args):
+    """音色复刻调用策略：单次超时 0.5s、整体截止 3s，对比各种注入故障下的耗时、结果与计数
+
+    每个场景同时检查结果（成功时的模型 / 失败）、耗时上下限与 retries / fallbacks / hedges 计数，
+    不符合预期时以非零状态退出。
+    """
+    import logging
+    import server
+
+    server.logger.setLevel(logging.ERROR)
+    handler = FakeMiniMaxHandler
+    httpd, base_url = start_fake_minimax(handler)
+    server.MINIMAX_VOICE_CLONE_URL = f'{base_url}/v1/voice_clone'
+    turbo, hd = server.VOICE_CLONE_MODEL, server.VOICE_CLONE_FALLBACK_MODEL
+    deadline = 3
+
+    def scenario(hang=0, delays=None, failing=(), hedge_after=None):
+        handler.hang_requests, handler.hang_seconds = hang, 1.0
+        handler.model_delays, handler.failing_models = delays or {}, set(failing)
+        server.VOICE_CLONE_POLICY = server.UpstreamPolicy(
+            'voice_clone', attempts=3, timeout=0.5, deadline=deadline, base_delay=0.1,
+            fallback_timeout=1.0, hedge_after=hedge_after
+        )
+        start = time.perf_counter()
+        try:
+            model = server.call_voice_clone_api(1, 'hello')['model']
+        except Exception as e:
+            model = type(e).__name__
+        stats = server.VOICE_CLONE_POLICY.stats()
+        counts = {k: stats[k] for k in ('retries', 'fallbacks', 'hedges', 'hedge_wins')}
+        return time.perf_counter() - start, model, counts
+
+    # (名称, 场景参数, 期望结果（成功时为模型名，失败时为异常类名）, 耗时范围 (秒), 期望计数（未列出的为 0）)
+    rows = [
+        ('正常', {}, turbo, (0, 0.3), {}),
+        ('极速版前 2 次超时', {'hang': 2}, turbo, (1.0, deadline), {'retries': 2}),
+        ('一直超时（受截止时间约束）', {'hang': 100}, 'ReadTimeout', (1.5, deadline + 0.2), {'retries': 2}),
+        ('极速版合成失败 → 高质量', {'failing': [turbo]}, hd, (0, 0.3), {'fallbacks': 1}),
+        ('极速版慢 0.4s，不对冲', {'delays': {turbo: 0.4}}, turbo, (0.4, 0.7), {}),
+        ('极速版慢 0.4s，0.1s 后对冲', {'delays': {turbo: 0.4}, 'hedge_after': 0.1}, hd, (0.1, 0.35),
+         {'hedges': 1, 'hedge_wins': 1}),
+        ('两个模型都失败', {'failing': [turbo, hd]}, 'Exception', (0, 0.3), {'fallbacks': 1}),
+    ]
+    print(f'📊 音色复刻调用策略（本地模拟服务：单次超时 0.5s，整体截止 {deadline}s）')
+    failures = []
+    for label, kwargs, expected_model, (low, high), expected_counts in rows:
+        elapsed, model, counts = scenario(**kwargs)
+        expected_counts = {k: expected_counts.get(k, 0) for k in counts}
+        problems = []
+        if model != expected_model:
+            problems.append(f'结果 {model}，期望 {expected_model}')
+        if not low <= elapsed <= high:
+            problems.append(f'耗时 {elapsed:.2f}s 不在 [{low}, {high}]')
+        if counts != expected_counts:
+            problems.append(f'计数 {counts}，期望 {expected_counts}')
+        shown = ' '.join(f'{k}={v}' for k, v in counts.items())
+        print(f"   {'✓' if not problems else '✗'} {label:<24} {elapsed:>6.2f}s  {model:<18} {shown}")
+        failures.extend(f'{label}: {problem}' for problem in problems)
+    handler.hang_requests = 0
+    httpd.shutdown()
+    if failures:
+        raise SystemExit('音色复刻调用策略与预期不符：\n  ' + '\n  '.join(failures))
+
+
+def bench_circuit_breaker(args):
+    """上游一直超时时每个问答请求的耗时：无熔断（每次等满超时）vs 有熔断（打开后直接 503）"""
+    import logging
+    import tempfile
+    import server
+
+    server.logger.setLevel(logging.CRITICAL)
+    handler = FakeMiniMaxHandler
+    httpd, base_url = start_fake_minimax(handler)
+    server.MINIMAX_API_URL = f'{base_url}/v1/text/chatcompletion_v2'
+    handler.hang_requests, handler.hang_seconds = 10 ** 6, 1.0
+    requests_per_run = 20
+
+    def run(breaker):
+        server.CHAT_POLICY = server.UpstreamPolicy('chat', attempts=1, timeout=0.3, deadline=1, breaker=breaker)
+        elapsed = []
+        for i in range(requests_per_run):
+            start = time.perf_counter()
+            try:
+                server.call_minimax_api(f'question {i}')
+            except Exception:
+                pass
+            elapsed.append(time.perf_counter() - start)
+        return elapsed
+
+    without = run(None)
+    with tempfile.TemporaryDirectory() as tmp:
+        server.CIRCUIT_BREAKER['path'] = os.path.join(tmp, 'breaker.sqlite3')
+        breaker = server.CircuitBreaker.from_config('chat', probe_seconds=1)
+        with_breaker = run(breaker)
+        stats = breaker.stats()
+    handler.hang_requests = 0
+    httpd.shutdown()
+
+    print(f'📊 上游一直超时（单次超时 0.3s），连续 {requests_per_run} 个问答请求')
+    print(f'   无熔断: 共 {sum(without):.2f}s，平均 {sum(without) / len(without) * 1000:.1f} ms/次')
+    print(f'   有熔断: 共 {sum(with_breaker):.2f}s，平均 {sum(with_breaker) / len(with_breaker) * 1000:.1f} ms/次'
+          f'（最小调用数 {breaker.min_calls} 后打开，拒绝 {stats["rejected"]} 次）')
+
+
+def bench_static(args):
+    """静态文件每秒请求数（Flask 测试客户端，不含网络）：send_from_directory vs 每次 stat + 读文件 vs 内存缓存"""
+    import tempfile
+    import server
+    from flask import send_from_directory
+
+    paths = ['/', '/js/app.js', '/css/main.css', '/data/words.json', '/lottie/mascot-cat.json']
+    headers = {'Accept-Encoding': 'gzip, br'}
+    iterations = min(args.iterations, 2000)
+
+    @server.app.route('/__bench_plain/<path:filename>')
+    def plain(filename):
+        return send_from_directory(server.STATIC_DIR, filename)
+
+    def rps(client, urls, request_headers):
+        for url in urls:
+            client.get(url, headers=request_headers).close()
+        start = time.perf_counter()
+        for i in range(iterations):
+            client.get(urls[i % len(urls)], headers=request_headers).close()
+        return iterations / (time.perf_counter() - start)
+
+    client = server.app.test_client()
+    plain_rps = rps(client, ['/__bench_plain/index.html'] + [f'/__bench_plain{p}' for p in paths[1:]], {})
+    with tempfile.TemporaryDirectory() as tmp:
+        server.static_assets = server.StaticAssets(server.STATIC_DIR, tmp, check_seconds=0, memory_max_bytes=0)
+        disk_rps = rps(client, paths, headers)
+        server.static_assets = server.StaticAssets(server.STATIC_DIR, tmp)
+        memory_rps = rps(client, paths, headers)
+        stats = server.static_assets.stats()
+
+    print(f'📊 静态文件（{", ".join(paths)} 轮流请求，{iterations} 次，Accept-Encoding: gzip）')
+    print(f'   send_from_directory（不压缩）: {plain_rps:>8.0f} 次/秒')
+    print(f'   每次 stat + 读压缩文件:        {disk_rps:>8.0f} 次/秒')
+    print(f'   内存缓存:                      {memory_rps:>8.0f} 次/秒'
+          f'（内存 {stats["memory_entries"]} 项 {stats["memory_bytes"] / 1024:.0f} KB）')
+    print('   超过 memory_file_max 的文件经 wsgi.file_wrapper 发送，Gunicorn 下为 sendfile（测试客户端中不体现）')
+
+
+def bench_checkers(args):
+    """把 data/*.md 重复拼接成多 MB 的输入：逐行单遍检查的吞吐量，以及与整文件读入时的峰值内存对比"""
+    import importlib.util
+    import tempfile
+    import tracemalloc
+    from markdown_lines import open_markdown
+
+    checkers = [
+        ('WORDS.md', 'check-words-format.py', 'WordsFormatChecker'),
+        ('READINGS.md', 'check-readings-format.py', 'ReadingsFormatChecker'),
+        ('LISTEN.md', 'check-listens-format.py', 'ListenFormatChecker'),
+    ]
+
+    def measure(checker_class, path, streaming, trace):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        checker = checker_class()
+        with open_markdown(path) as f:
+            if streaming:
+                checker.check_lines(f)
+            else:
+                checker.check_format(f.read())
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return elapsed, peak
+
+    print('📊 格式检查（data/*.md 重复 N 遍）：逐行单遍检查 vs 先读入整个文件')
+    print(f"{'文件':<12} {'N':>4} {'大小':>9} {'用时':>8} {'吞吐量':>10} {'峰值内存(逐行)':>14} {'峰值内存(整文件)':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for source, file_name, class_name in checkers:
+            spec = importlib.util.spec_from_file_location(class_name, os.path.join(_SCRIPT_DIR, file_name))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            checker_class = getattr(module, class_name)
+            with open(os.path.join(_REPO_ROOT, 'data', source), 'r', encoding='utf-8') as f:
+                content = f.read()
+            for repeat in (1, 10, 100):
+                path = os.path.join(tmp, source)
+                with open(path, 'w', encoding='utf-8') as f:
+                    for _ in range(repeat):
+                        f.write(content)
+                        f.write('\n')
+                size = os.path.getsize(path)
+                elapsed, _ = measure(checker_class, path, True, False)
+                _, stream_peak = measure(checker_class, path, True, True)
+                _, whole_peak = measure(checker_class, path, False, True)
+                print(f'{source:<12} {repeat:>4} {size / 1024 / 1024:>7.2f}MB {elapsed * 1000:>6.0f}ms '
+                      f'{size / 1024 / 1024 / elapsed:>7.1f}MB/s {stream_peak / 1024:>12.0f}KB {whole_peak / 1024:>14.0f}KB')
+
+
+def bench_words(args):
+    """/api/words 的查询索引 vs 像浏览器那样逐个扫描全部单词（words.json 原样及复制 50 份词书）"""
+    import server
+
+    with open(server.WORDS_DATA_PATH, 'r', encoding='utf-8') as f:
+        books = json.load(f)
+    queries = [
+        ('prefix=te', {'prefix': 'te'}),
+        ('word=future', {'word': 'future'}),
+        ('meaning=未来', {'meaning': '未来'}),
+        ('category+book', {'category': books[0]['units'][0].get('category'), 'book': books[0]['id']}),
+    ]
+
+    def scan(words, prefix=None, word=None, meaning=None, category=None, book=None):
+        results = []
+        for book_id, entry in words:
+            key = server.word_key(entry['word'])
+            if prefix is not None and not key.startswith(server.word_key(prefix)):
+                continue
+            if word is not None and key != server.word_key(word):
+                continue
+            if meaning is not None and meaning not in entry.get('meaning', ''):
+                continue
+            if category is not None and entry.get('category') != category:
+                continue
+            if book is not None and book_id != book:
+                continue
+            results.append(entry)
+        return results
+
+    print('📊 单词查询耗时：WordSearchIndex.search vs 线性扫描')
+    print(f"{'单词数':>8}  {'查询':<16} {'结果':>6}  {'索引 (µs)':>10}  {'扫描 (µs)':>10}")
+    for copies in (1, 50):
+        enlarged = [
+            {**book, 'id': f"{book['id']}-{copy}" if copy else book['id']}
+            for copy in range(copies) for book in books
+        ]
+        index = server.WordSearchIndex(enlarged)
+        words = [(book['id'], word) for book in enlarged for unit in book['units'] for word in unit['words']]
+        for label, criteria in queries:
+            count = len(index.search(**criteria))
+            indexed = _per_call_us(lambda i: index.search(**criteria), args.iterations)
+            scanned = _per_call_us(lambda i: scan(words, **criteria), max(args.iterations // 100, 10))
+            print(f'{len(index):>8}  {label:<16} {count:>6}  {indexed:>10.1f}  {scanned:>10.1f}')
+
+
+def bench_spelling(args):
+    """拼写纠错：删除索引（SpellingIndex.suggest）vs 与全部词条逐个计算编辑距离；批改一整班听写的总耗时"""
+    import random
+    import server
+
+    with open(server.WORDS_DATA_PATH, 'r', encoding='utf-8') as f:
+        index = server.WordSearchIndex(json.load(f))
+    spelling = index.spelling
+    rng = random.Random(0)
+
+    def typo(word):
+        chars = list(server.word_key(word))
+        for _ in range(rng.choice((1, 2))):
+            i = rng.randrange(len(chars))
+            edit = rng.choice(('delete', 'replace', 'swap'))
+            if edit == 'delete' and len(chars) > 1:
+                del chars[i]
+            elif edit == 'swap' and i + 1 < len(chars):
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            else:
+                chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+        return ''.join(chars)
+
+    def scan(answer):
+        query = server.word_key(answer)
+        ranked = sorted(
+            (distance, term) for term in spelling.terms
+            for distance in (server.edit_distance(query, term, spelling.MAX_DISTANCE),)
+            if distance <= spelling.MAX_DISTANCE
+        )
+        return ranked[:5]
+
+    answers = [typo(index.words[rng.randrange(len(index))]['word']) for _ in range(800)]
+    print(f'📊 拼写纠错（{len(spelling)} 个词条，编辑距离 ≤ {spelling.MAX_DISTANCE}，随机 1–2 处拼写错误）')
+    indexed = _per_call_us(lambda i: spelling.suggest(answers[i % len(answers)]), max(args.iterations // 10, len(answers)))
+    scanned = _per_call_us(lambda i: scan(answers[i % len(answers)]), 200)
+    print(f'  单个答案：删除索引 {indexed:.0f} µs，逐个比较 {scanned:.0f} µs')
+    start = time.perf_counter()
+    for answer in answers:
+        spelling.suggest(answer)
+    print(f'  一个班 40 人 × 20 个单词（{len(answers)} 个答案）：{(time.perf_counter() - start) * 1000:.0f} ms')
+
+
+def bench_word_codec(args):
+    """单词数据：words.json（缩进）vs words.compact.json 的大小（原始 / gzip）与 Python 解析耗时"""
+    import gzip
+    import word_codec
+
+    with open(os.path.join(_REPO_ROOT, 'data', 'words.json'), 'r', encoding='utf-8') as f:
+        books = json.load(f)
+    iterations = max(args.iterations // 100, 20)
+    encodings = [
+        ('words.json', json.dumps(books, ensure_ascii=False, indent=2), json.loads),
+        ('compact', word_codec.dumps(books), lambda text: word_codec.decode_words(json.loads(text))),
+    ]
+
+    print('📊 单词数据编码：大小与解析耗时（紧凑编码的解析含 decode_words 还原）')
+    print(f"{'格式':<12} {'大小':>9} {'gzip':>9}  {'解析 (ms)':>10}")
+    for label, content, parse in encodings:
+        assert parse(content) == books
+        data = content.encode('utf-8')
+        elapsed = _per_call_us(lambda i: parse(content), iterations) / 1000
+        print(f'{label:<12} {len(data) / 1024:>7.1f}KB {len(gzip.compress(data)) / 1024:>7.1f}KB  {elapsed:>10.2f}')
+
+
+def bench_search(args):
+    """全文检索索引：readings.json + listen.json 原样及复制 100 份时的构建耗时、文件大小与查询延迟（mmap 打开）"""
+    import tempfile
+    import search_index
+
+    with open(os.path.join(_REPO_ROOT, 'data', 'readings.json'), 'r', encoding='utf-8') as f:
+        readings = json.load(f)
+    with open(os.path.join(_REPO_ROOT, 'data', 'listen.json'), 'r', encoding='utf-8') as f:
+        listens = json.load(f)
+    passages = search_index.collect_passages(readings, listens)
+    queries = ['lifeguard', 'help people', 'i want to be', '飞行员', '父亲节 father']
+    iterations = max(args.iterations // 100, 20)
+
+    print('📊 全文检索：构建耗时、索引大小与单次查询延迟（前 10 条，含摘要）')
+    with tempfile.TemporaryDirectory() as tmp:
+        for copies in (1, 100):
+            enlarged = [passage for _ in range(copies) for passage in passages]
+            start = time.perf_counter()
+            content = search_index.build_index(enlarged)
+            built = time.perf_counter() - start
+            path = os.path.join(tmp, f'search-{copies}.bin')
+            with open(path, 'wb') as f:
+                f.write(content)
+            index = search_index.open_index(path)
+            print(f'\n{len(enlarged)} 段，{index.n_terms} 个词项，索引 {len(content) / 1024 / 1024:.1f} MB，构建 {built * 1000:.0f} ms')
+            print(f"  {'查询':<16} {'命中':>7}  {'耗时 (µs)':>10}")
+            for query in queries:
+                total, _ = index.search(query)
+                elapsed = _per_call_us(lambda i: index.search(query), iterations)
+                print(f'  {query:<16} {total:>7}  {elapsed:>10.0f}')
+
+
+BENCHMARKS = {
+    'rate-limit': bench_rate_limit,
+    'rate-limit-redis': bench_rate_limit_redis,
+    'upstream': bench_upstream,
+    'voice-clone': bench_voice_clone,
+    'circuit-breaker': bench_circuit_breaker,
+    'static': bench_static,
+    'checkers': bench_checkers,
+    'words': bench_words,
+    'search': bench_search,
+    'spelling': bench_spelling,
+    'word-codec': bench_word_codec,
+}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='server.py 性能基准')
+    parser.add_argument('name', choices=sorted(BENCHMARKS), help='基准名称')
+    parser.add_argument('--iterations', type=int, default=20000, help='每组测量的调用次数')
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    main()
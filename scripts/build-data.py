@@ -0,0 +1,939 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据构建工具：一次解析 data/WORDS.md、data/READINGS.md、data/LISTEN.md，
+用 check-*-format.py 的规则检查后生成 data/words.json（及 data/words/ 分片）、
+data/readings.json、data/listen.json，输出与 scripts/convert-*.js 逐字节相同（convert-listens.js 对连续两个 ## 会报错，这里记为空章节）。
+构建 readings 或 listens 时，再由两个 JSON 生成 /api/search 使用的全文检索索引 data/search-index.bin（见 search_index.py）。
+构建 words 时另写紧凑编码的 data/words.compact.json（见 word_codec.py）。
+每次构建最后由三个 JSON 生成单词 → 课文语境的交叉引用 data/context/（每个单元一个分片 + index.json）。
+运行方式（在仓库根目录）：python3 scripts/build-data.py [words|readings|listens ...] [--force]
+
+增量构建：每个文件按书本（# 标题）切段，每段的解析结果与检查结果以内容 sha256 为键缓存在
+.cache/build-data.json；再次运行时只重新解析改动过的书本，内容未变的输出文件不会重写（mtime 不变）。
+本脚本或检查脚本更新后缓存自动作废；--force 忽略缓存全部重建。
+有错误的数据源不写出，退出码为 1。
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
+sys.path.insert(0, _REPO_ROOT)
+
+import search_index  # noqa: E402
+import word_codec  # noqa: E402
+DATA_DIR = os.path.join(_REPO_ROOT, 'data')
+CACHE_PATH = os.path.join(_REPO_ROOT, '.cache', 'build-data.json')
+CACHE_VERSION = 1
+
+CHECKERS = {
+    'words': ('check-words-format.py', 'WordsFormatChecker'),
+    'readings': ('check-readings-format.py', 'ReadingsFormatChecker'),
+    'listens': ('check-listens-format.py', 'ListenFormatChecker'),
+}
+
+# 词书名称到 ID 的映射（与 convert-words.js / check-words-format.py 一致）
+BOOK_NAME_TO_ID = {
+    '英语五年级上册': 'grade5-upper',
+    '英语六年级上册': 'grade6-upper',
+    '英语五年级下册': 'grade5-lower',
+    '英语六年级下册': 'grade6-lower'
+}
+
+UNIT_RE = re.compile(r'##\s*(Unit\s*\d+)')
+TITLE_RE = re.compile(r'Title:\s*(.+?)\s*Category:\s*(.+)')
+CATEGORY_TRAILING_COMMA_RE = re.compile(r',+\s*$')
+EXAMPLE_RE = re.compile(r'^(.+?)\s*\(([^)]+)\)\s*$')
+PHONETIC_RE = re.compile(r'/([^/]+)/')
+LEADING_WORD_RE = re.compile(r'^([^\s/]+(?:\s+[^\s/]+)?)')
+# JS 的 \p{Script=Han}（Python re 不支持 Unicode 脚本属性，列出 Han 脚本的码段）
+HAN_RE = re.compile(
+    '[\u2e80-\u2e99\u2e9b-\u2ef3\u2f00-\u2fd5\u3005\u3007\u3021-\u3029\u3038-\u303b'
+    '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufa6d\ufa70-\ufad9'
+    '\U00016fe2\U00016fe3\U00016ff0\U00016ff1\U00020000-\U0002a6df\U0002a700-\U0002ebe0'
+    '\U0002f800-\U0002fa1d\U00030000-\U0003134a]'
+)
+
+READING_TITLE_RE = re.compile(r'题目：(.+?)\s*\(([^)]+)\)')
+READING_SCENE_RE = re.compile(r'^[*#]\s*场景：')
+READING_PATTERN_RE = re.compile(r'^(.+?)\s*\(([^)]+)\)$')
+READING_DIALOGUE_RE = re.compile(r'^([^:]+):\s*(.+?)\s*\(([^)]+)\)$')
+SPEAKER_CN_RE = re.compile(r'^([^：:]+)[：:]')
+TRAILING_PERIOD_RE = re.compile(r'\.$')
+READING_SECTION_PREFIXES = ('# 题目：', '# 场景：', '# 重点句型', '# 知识点')
+
+LINE_NUMBER_RE = re.compile(r'第 (\d+) 行')
+
+
+# ---------------------------------------------------------------------------
+# 切段：按书本标题切分，返回 [(first_line, raw_lines, content_lines, context)]
+# ---------------------------------------------------------------------------
+
+def _without_comments(lines: List[str]) -> List[bool]:
+    """逐行标记是否在 <!-- ... --> 注释块内（与 convert-words.js / convert-readings.js 的过滤规则相同）"""
+    flags = []
+    in_comment_block = False
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith('<!--'):
+            in_comment_block = True
+            flags.append(True)
+            continue
+        if in_comment_block:
+            if '-->' in line:
+                in_comment_block = False
+            flags.append(True)
+            continue
+        flags.append(False)
+    return flags
+
+
+def _split(lines: List[str], is_heading, comments: Optional[List[bool]] = None):
+    """在 is_heading 为真的（非注释）行处切段；首个标题之前的内容（若有）自成一段"""
+    starts = [i for i, raw in enumerate(lines) if not (comments and comments[i]) and is_heading(raw)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    segments = []
+    for start, end in zip(starts, starts[1:] + [len(lines)]):
+        raw_lines = lines[start:end]
+        if comments:
+            content_lines = [raw for raw, hidden in zip(raw_lines, comments[start:end]) if not hidden]
+        else:
+            content_lines = raw_lines
+        segments.append((start + 1, raw_lines, content_lines))
+    return segments
+
+
+def _is_words_book_heading(raw: str) -> bool:
+    return raw.startswith('# ') and '年级' in _words_book_name(raw.strip())
+
+
+def _is_readings_book_heading(raw: str) -> bool:
+    line = raw.strip()
+    return line.startswith('# ') and not line.startswith(READING_SECTION_PREFIXES)
+
+
+def _is_listen_book_heading(raw: str) -> bool:
+    return raw.startswith('# ')
+
+
+def split_words(lines: List[str]):
+    comments = _without_comments(lines)
+    return [(first, raw, content, None) for first, raw, content in _split(lines, _is_words_book_heading, comments)]
+
+
+def split_readings(lines: List[str]):
+    """
+    convert-readings.js 从第一个题目行开始解析：此前的书本标题不生效，材料沿用全文第一个书本名；
+    材料的单元名取「之前最近的 ## 行」。这些作为上下文随段落一起参与缓存键。
+    """
+    comments = _without_comments(lines)
+    book_name = ''
+    for raw, hidden in zip(lines, comments):
+        if not hidden and _is_readings_book_heading(raw):
+            book_name = re.sub(r'^#\s*', '', raw.strip()).strip()
+            break
+    segments = []
+    unit_name = ''
+    has_reading = False
+    for first, raw_lines, content_lines in _split(lines, _is_readings_book_heading, comments):
+        context = {'book_name': None if has_reading else book_name, 'unit_name': unit_name}
+        segments.append((first, raw_lines, content_lines, context))
+        for raw in content_lines:
+            line = raw.strip()
+            if line.startswith('## '):
+                unit_name = re.sub(r'^##\s*', '', line).strip()
+            elif line.startswith('# 题目：') or line.startswith('* 题目：'):
+                has_reading = True
+    return segments, book_name
+
+
+def split_listens(lines: List[str]):
+    # convert-listens.js 不过滤注释块（只跳过以 <!-- 开头的行）
+    return [(first, raw, content, None) for first, raw, content in _split(lines, _is_listen_book_heading)]
+
+
+# ---------------------------------------------------------------------------
+# 解析：逐行移植 convert-*.js，输出结构与字段顺序保持一致
+# ---------------------------------------------------------------------------
+
+def _words_book_name(line: str) -> str:
+    return line.replace('# ', '', 1).replace('单词', '', 1).strip()
+
+
+def split_word_line_without_phonetic(word_line: str) -> Tuple[str, str]:
+    """无音标时：英文词/短语与中文释义以「首个汉字」为界（WORDS.md 约定）"""
+    han_match = HAN_RE.search(word_line)
+    if han_match:
+        return word_line[:han_match.start()].strip(), word_line[han_match.start():].strip()
+    word_match = LEADING_WORD_RE.match(word_line)
+    if word_match:
+        return word_match.group(1).strip(), word_line[word_match.end():].strip()
+    return word_line.strip(), ''
+
+
+def parse_word_line(line: str, book: Optional[Dict], unit: Optional[Dict], index: int) -> Optional[Dict]:
+    """格式: * word /phonetic/ meaning"""
+    word_line = line[2:].strip()
+    word = word_line
+    phonetic = ''
+    meaning = ''
+
+    phonetic_match = PHONETIC_RE.search(word_line)
+    if phonetic_match:
+        phonetic = '/' + phonetic_match.group(1) + '/'
+        parts = word_line.split('/')
+        if len(parts) >= 3:
+            word = parts[0].strip()
+            meaning = parts[2].strip()
+    else:
+        word, meaning = split_word_line_without_phonetic(word_line)
+        if not word:
+            return None
+
+    book_id = (book.get('id') or 'book') if book else 'book'
+    unit_num = unit['unit'].replace('Unit ', 'u', 1) if unit else 'u0'
+    return {
+        'id': f'{book_id}-{unit_num}-w{index + 1}',
+        'word': word,
+        'phonetic': phonetic,
+        'meaning': meaning,
+        'example': '',
+        'translation': '',
+        'memoryTip': '',
+        'category': unit['category'] if unit else ''
+    }
+
+
+def parse_words(lines: List[str], context=None):
+    """一段 WORDS.md（已去掉注释块）→ (词书列表, None)；首段为空，其余各一本"""
+    books = []
+    current_book = None
+    current_unit = None
+    current_word = None
+    word_index = 0
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if line.startswith('```'):
+            continue
+
+        if raw_line.startswith('# '):
+            book_name = _words_book_name(line)
+            if '年级' in book_name:
+                if current_word and current_unit:
+                    current_unit['words'].append(current_word)
+                    word_index += 1
+                current_book = {
+                    'id': BOOK_NAME_TO_ID.get(book_name, book_name),
+                    'name': book_name,
+                    'units': []
+                }
+                books.append(current_book)
+                current_unit = None
+                current_word = None
+                word_index = 0
+            continue
+
+        if raw_line.startswith('## '):
+            unit_match = UNIT_RE.search(line)
+            if unit_match:
+                if current_word and current_unit:
+                    current_unit['words'].append(current_word)
+                    word_index += 1
+                current_word = None
+                current_unit = {
+                    'unit': unit_match.group(1),
+                    'title': '',
+                    'category': '',
+                    'words': []
+                }
+                word_index = 0
+                if current_book:
+                    current_book['units'].append(current_unit)
+            continue
+
+        if raw_line.startswith('Title:'):
+            title_match = TITLE_RE.search(line)
+            if title_match and current_unit:
+                current_unit['title'] = title_match.group(1).strip()
+                current_unit['category'] = CATEGORY_TRAILING_COMMA_RE.sub('', title_match.group(2).strip())
+            continue
+
+        if raw_line.startswith('  - '):
+            detail_content = line[2:].strip()
+            if not current_word:
+                continue
+            if detail_content.startswith('例句：'):
+                example_part = detail_content[3:]
+                match = EXAMPLE_RE.match(example_part)
+                if match:
+                    current_word['example'] = match.group(1).strip()
+                    current_word['translation'] = match.group(2).strip()
+                elif example_part.strip():
+                    current_word['example'] = example_part.strip()
+            elif detail_content.startswith('记忆：'):
+                current_word['memoryTip'] = detail_content[3:].strip()
+            continue
+
+        if raw_line.startswith('* '):
+            if current_word and current_unit:
+                current_unit['words'].append(current_word)
+                word_index += 1
+            current_word = parse_word_line(line, current_book, current_unit, word_index)
+            continue
+
+    if current_word and current_unit:
+        current_unit['words'].append(current_word)
+    return books, None
+
+
+def _new_reading(book_name: str = '', unit_name: str = '', title_match=None) -> Dict:
+    return {
+        'id': None,
+        'bookName': book_name,
+        'unitName': unit_name,
+        'title': title_match.group(1).strip() if title_match else '',
+        'titleCn': title_match.group(2).strip() if title_match else '',
+        'scene': '',
+        'keySentencePatterns': [],
+        'knowledgePoints': [],
+        'dialogues': []
+    }
+
+
+def parse_readings(lines: List[str], context: Dict):
+    """
+    一段 READINGS.md（已去掉注释块）→ ({carry, readings}, 段末状态)。
+    convert-readings.js 中书本标题不会结束当前材料，新书第一个题目之前的句型 / 对话仍归上一篇：
+    这部分放在 carry 里（scene 为 None 表示未出现场景行），汇总时并入上一段的最后一篇；
+    段末的句型 / 知识点状态传给下一段。id 与空壳过滤在汇总时处理。
+    """
+    readings = []
+    carry = _new_reading() if context.get('open') else None
+    if carry:
+        carry['scene'] = None
+    current_reading = carry
+    is_parsing_patterns = context.get('patterns', False)
+    is_parsing_knowledge_points = context.get('knowledge', False)
+    current_book_name = context['book_name'] or ''
+    current_unit_name = context['unit_name']
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if line.startswith('```'):
+            continue
+
+        # 第一个题目之前的书本标题不生效（同 convert-readings.js 的起始行）
+        if _is_readings_book_heading(raw_line):
+            if current_reading:
+                current_book_name = re.sub(r'^#\s*', '', line).strip()
+            continue
+
+        if line.startswith('## '):
+            current_unit_name = re.sub(r'^##\s*', '', line).strip()
+            continue
+
+        if line.startswith('# 题目：') or line.startswith('* 题目：'):
+            if current_reading and current_reading is not carry:
+                readings.append(current_reading)
+            clean_line = re.sub(r'^[*#]\s*', '', line, count=1)
+            current_reading = _new_reading(current_book_name, current_unit_name,
+                                           READING_TITLE_RE.search(clean_line))
+            is_parsing_patterns = False
+            is_parsing_knowledge_points = False
+            continue
+
+        if not current_reading:
+            continue
+
+        if line.startswith('# 场景：') or line.startswith('* 场景：'):
+            current_reading['scene'] = READING_SCENE_RE.sub('', line, count=1).strip()
+            continue
+
+        if line.startswith('# 重点句型') or line.startswith('* 重点句型'):
+            is_parsing_patterns = True
+            is_parsing_knowledge_points = False
+            continue
+
+        if line.startswith('# 知识点') or line.startswith('* 知识点'):
+            is_parsing_patterns = False
+            is_parsing_knowledge_points = True
+            continue
+
+        if raw_line.startswith('  - ') and is_parsing_patterns:
+            half_match = READING_PATTERN_RE.match(line[2:].strip())
+            if half_match:
+                current_reading['keySentencePatterns'].append({
+                    'pattern': half_match.group(1).strip(),
+                    'meaning': TRAILING_PERIOD_RE.sub('', half_match.group(2).strip())
+                })
+            continue
+
+        if raw_line.startswith('  - ') and is_parsing_knowledge_points:
+            knowledge_point_line = line[2:].strip()
+            if knowledge_point_line:
+                current_reading['knowledgePoints'].append(knowledge_point_line)
+            continue
+
+        if not raw_line.startswith('  '):
+            is_parsing_patterns = False
+            is_parsing_knowledge_points = False
+
+        if (':' in line or '：' in line) and ('(' in line or '（' in line):
+            dialogue_match = READING_DIALOGUE_RE.match(line)
+            if dialogue_match:
+                cn_translation = TRAILING_PERIOD_RE.sub('', dialogue_match.group(3).strip())
+                speaker_cn_match = SPEAKER_CN_RE.match(cn_translation)
+                current_reading['dialogues'].append({
+                    'speaker': dialogue_match.group(1).strip(),
+                    'speakerCn': speaker_cn_match.group(1).strip() if speaker_cn_match else cn_translation,
+                    'content': dialogue_match.group(2).strip(),
+                    'contentCn': cn_translation
+                })
+            continue
+
+    if current_reading and current_reading is not carry:
+        readings.append(current_reading)
+    state = {
+        'open': current_reading is not None,
+        'patterns': is_parsing_patterns,
+        'knowledge': is_parsing_knowledge_points,
+    }
+    return {'carry': carry, 'readings': readings}, state
+
+
+def parse_listens(lines: List[str], context=None):
+    """一段 LISTEN.md → (书本列表, None)；首个 # 标题之前的内容被忽略，每本书一篇听书材料，id 在汇总时编号"""
+    if not lines or not lines[0].startswith('# '):
+        return [], None
+    book = {'name': lines[0].strip().replace('# ', '', 1).strip(), 'speeches': []}
+    speech = None
+    chapter = None
+    chapter_content: List[str] = []
+    is_parsing_summary = False
+
+    def new_speech():
+        return {'id': None, 'title': book['name'], 'summary': '', 'chapters': []}
+
+    def finish_chapter():
+        speech['chapters'].append({**chapter, 'content': '\n'.join(chapter_content).strip()})
+
+    for raw_line in lines[1:]:
+        line = raw_line.strip()
+        if line.startswith('<!--') or line.startswith('```'):
+            continue
+
+        # 二级标题 ## 标题 -> 新章节开始；"文章概要" 是特殊章节，存为 summary
+        if raw_line.startswith('## '):
+            chapter_title = line.replace('## ', '', 1).strip()
+            if chapter:
+                # 连续两个 ## 之间没有任何行时 convert-listens.js 会报错，这里照常记一个空章节
+                speech = speech or new_speech()
+                finish_chapter()
+            if is_parsing_summary and chapter_content:
+                speech['summary'] = '\n'.join(chapter_content).strip()
+            chapter_content = []
+            if chapter_title == '文章概要':
+                is_parsing_summary = True
+                chapter = None
+            else:
+                is_parsing_summary = False
+                chapter = {'title': chapter_title}
+            continue
+
+        if not speech:
+            speech = new_speech()
+
+        if is_parsing_summary or chapter:
+            # 跳过章节标题后的第一个空行
+            if not chapter_content and not line:
+                continue
+            chapter_content.append(raw_line)
+
+    if speech:
+        if is_parsing_summary and chapter_content:
+            speech['summary'] = '\n'.join(chapter_content).strip()
+        elif chapter:
+            finish_chapter()
+        if speech['chapters']:
+            book['speeches'].append(speech)
+    return ([book] if book['speeches'] else []), None
+
+
+# ---------------------------------------------------------------------------
+# 输出：与 JSON.stringify(data, null, 2) 相同的格式
+# ---------------------------------------------------------------------------
+
+def to_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def unit_slug(unit: Dict) -> str:
+    """单元分片文件名：Unit 3 → u3（与单词 ID 中的单元部分一致）"""
+    return re.sub(r'^Unit', 'u', re.sub(r'\s+', '', unit['unit']), count=1, flags=re.IGNORECASE)
+
+
+def words_outputs(books: List[Dict]) -> Dict[str, str]:
+    """data/words.json 与 data/words/ 分片（索引格式与 hash 算法同 convert-words.js 的 writeShards）"""
+    outputs = {os.path.join(DATA_DIR, 'words.json'): to_json(books)}
+    index = {'version': 1, 'books': []}
+    for book in books:
+        book_entry = {'id': book['id'], 'name': book['name'], 'units': []}
+        for unit in book['units']:
+            file_name = f'{unit_slug(unit)}.json'
+            content = to_json(unit['words'])
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+            outputs[os.path.join(DATA_DIR, 'words', book['id'], file_name)] = content
+            book_entry['units'].append({
+                'unit': unit['unit'],
+                'title': unit['title'],
+                'category': unit['category'],
+                'count': len(unit['words']),
+                'hash': content_hash,
+                'url': f"data/words/{book['id']}/{file_name}?v={content_hash}"
+            })
+        index['books'].append(book_entry)
+    outputs[os.path.join(DATA_DIR, 'words', 'index.json')] = to_json(index)
+    # 紧凑编码（字符串表 + 按列存放，见 word_codec.py），convert-words.js 不生成
+    outputs[os.path.join(DATA_DIR, 'words.compact.json')] = word_codec.dumps(books)
+    return outputs
+
+
+def merge_readings(results: List[Dict]) -> List[Dict]:
+    """按段拼接阅读材料：carry 并入上一篇，再过滤空壳条目（来自注释示例等：无句型、无知识点、无对话）"""
+    readings = []
+    for result in results:
+        carry = result['carry']
+        if carry and readings:
+            last = readings[-1] = dict(readings[-1])
+            if carry['scene'] is not None:
+                last['scene'] = carry['scene']
+            for field in ('keySentencePatterns', 'knowledgePoints', 'dialogues'):
+                last[field] = last[field] + carry[field]
+        readings.extend(result['readings'])
+    return [
+        r for r in readings
+        if r['keySentencePatterns'] or r['knowledgePoints'] or r['dialogues']
+    ]
+
+
+def readings_outputs(readings: List[Dict], book_name: str) -> Dict[str, str]:
+    readings = [dict(r, id=f'reading-{i:03d}') for i, r in enumerate(readings, 1)]
+    return {os.path.join(DATA_DIR, 'readings.json'): to_json({'bookName': book_name, 'readings': readings})}
+
+
+def listens_outputs(books: List[Dict]) -> Dict[str, str]:
+    speech_index = 0
+    numbered = []
+    for book in books:
+        speeches = []
+        for speech in book['speeches']:
+            speech_index += 1
+            speeches.append(dict(speech, id=f'speech-{speech_index:03d}'))
+        numbered.append(dict(book, speeches=speeches))
+    return {os.path.join(DATA_DIR, 'listen.json'): to_json({'books': numbered})}
+
+
+def write_if_changed(path: str, content: Union[str, bytes]) -> bool:
+    """内容不变时不写（保留 mtime，静态文件缓存与 ETag 不受影响）；写入为原子替换"""
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def remove_stale(directory: str, keep) -> int:
+    """删除 directory 下不再生成的 .json（已删除的词书 / 单元），以及随之变空的子目录"""
+    removed = 0
+    for root, dirs, files in os.walk(directory, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith('.json') and path not in keep:
+                os.remove(path)
+                removed += 1
+        if root != directory and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+
+# ---------------------------------------------------------------------------
+# 构建
+# ---------------------------------------------------------------------------
+
+def load_checker(kind: str):
+    file_name, class_name = CHECKERS[kind]
+    spec = importlib.util.spec_from_file_location(class_name, os.path.join(_SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, class_name)
+
+
+def rules_fingerprint() -> str:
+    """本脚本、三个检查脚本及其共用的 markdown_lines.py 的内容摘要：解析或检查规则变化后缓存作废"""
+    digest = hashlib.sha256()
+    names = [os.path.basename(__file__), 'markdown_lines.py'] + [file_name for file_name, _ in CHECKERS.values()]
+    for name in names:
+        with open(os.path.join(_SCRIPT_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_cache(fingerprint: str) -> Dict:
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION and cache.get('rules') == fingerprint:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'rules': fingerprint}
+
+
+def save_cache(cache: Dict):
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp_path = f'{CACHE_PATH}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def shift_line_numbers(messages: List[str], offset: int) -> List[str]:
+    """检查器按段运行，报告里的行号是段内行号，加上段首偏移换成文件行号"""
+    return [LINE_NUMBER_RE.sub(lambda m: f'第 {int(m.group(1)) + offset} 行', msg) for msg in messages]
+
+
+def build_segments(kind: str, segments, parse, cache: Dict, force: bool):
+    """
+    逐段取缓存或重新解析 + 检查；返回 (各段结果, 错误, 警告, 重新解析的段数)。
+    缓存键是段落原文（含注释，检查器会看到）、上下文与上一段末状态的 sha256，
+    段落在文件中移动位置不影响命中。
+    """
+    checker_class = None
+    previous = {} if force else cache.get(kind, {})
+    entries = {}
+    results, errors, warnings = [], [], []
+    parsed = 0
+    state = None
+    for first_line, raw_lines, content_lines, context in segments:
+        if state:
+            context = dict(context, **state)
+        text = '\n'.join(raw_lines)
+        key = hashlib.sha256((json.dumps(context, ensure_ascii=False) + '\n' + text).encode('utf-8')).hexdigest()
+        entry = entries.get(key) or previous.get(key)
+        if entry is None:
+            if checker_class is None:
+                checker_class = load_checker(kind)
+            checker = checker_class()
+            checker.check_format(text)
+            result, state = parse(content_lines, context)
+            entry = {
+                'result': result,
+                'state': state,
+                'errors': checker.errors,
+                'warnings': checker.warnings,
+            }
+            parsed += 1
+        entries[key] = entry
+        state = entry['state']
+        results.append(entry['result'])
+        errors.extend(shift_line_numbers(entry['errors'], first_line - 1))
+        warnings.extend(shift_line_numbers(entry['warnings'], first_line - 1))
+    # 只保留本次用到的段，删掉的书本不在缓存里堆积
+    cache[kind] = entries
+    return results, errors, warnings, parsed
+
+
+def build(kind: str, cache: Dict, force: bool) -> Dict:
+    source = {'words': 'WORDS.md', 'readings': 'READINGS.md', 'listens': 'LISTEN.md'}[kind]
+    with open(os.path.join(DATA_DIR, source), 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+
+    if kind == 'words':
+        segments = split_words(lines)
+        results, errors, warnings, parsed = build_segments(kind, segments, parse_words, cache, force)
+        books = [book for result in results for book in result]
+        outputs = words_outputs(books)
+        summary = f"{len(books)} 本词书，{sum(len(u['words']) for b in books for u in b['units'])} 个单词"
+    elif kind == 'readings':
+        segments, book_name = split_readings(lines)
+        results, errors, warnings, parsed = build_segments(kind, segments, parse_readings, cache, force)
+        readings = merge_readings(results)
+        outputs = readings_outputs(readings, book_name)
+        summary = f'{len(readings)} 篇阅读材料'
+    else:
+        segments = split_listens(lines)
+        results, errors, warnings, parsed = build_segments(kind, segments, parse_listens, cache, force)
+        books = [book for result in results for book in result]
+        outputs = listens_outputs(books)
+        summary = f'{len(books)} 本听书'
+
+    written = removed = 0
+    if not errors:
+        written = sum(write_if_changed(path, content) for path, content in outputs.items())
+        if kind == 'words':
+            removed = remove_stale(os.path.join(DATA_DIR, 'words'), set(outputs))
+    return {
+        'source': source,
+        'summary': summary,
+        'segments': len(segments),
+        'parsed': parsed,
+        'outputs': len(outputs),
+        'written': written,
+        'removed': removed,
+        'errors': errors,
+        'warnings': warnings,
+    }
+
+
+def build_search_index() -> Dict:
+    """由磁盘上的 readings.json、listen.json 生成全文检索索引"""
+    with open(os.path.join(DATA_DIR, 'readings.json'), 'r', encoding='utf-8') as f:
+        readings = json.load(f)
+    with open(os.path.join(DATA_DIR, 'listen.json'), 'r', encoding='utf-8') as f:
+        listens = json.load(f)
+    passages = search_index.collect_passages(readings, listens)
+    content = search_index.build_index(passages)
+    return {
+        'passages': len(passages),
+        'bytes': len(content),
+        'written': write_if_changed(os.path.join(DATA_DIR, 'search-index.bin'), content),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 单词 → 课文语境交叉引用（data/context/）
+# ---------------------------------------------------------------------------
+
+CONTEXT_DIR = os.path.join(DATA_DIR, 'context')
+CONTEXT_TOKEN_RE = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+CONTEXT_SENTENCE_RE = re.compile(r'[^.!?\n]+[.!?]*')
+CONTEXT_PARENTHESES_RE = re.compile(r'\([^)]*\)')
+# 每个单词最多记录的句子数
+MAX_CONTEXT_PER_WORD = 20
+# 词组中 ... 可以代替的最多单词数（do ... homework → do my homework）
+CONTEXT_MAX_GAP = 3
+
+# 轻量词形还原：后缀 → 可能的原形结尾（stopped / running 另外去掉重复的辅音）
+CONTEXT_SUFFIXES = (
+    ('ies', ('y',)),
+    ('ied', ('y',)),
+    ('es', ('', 'e')),
+    ('s', ('',)),
+    ('ed', ('', 'e')),
+    ('ing', ('', 'e')),
+)
+# 课本中常见的不规则变化
+CONTEXT_IRREGULAR = {
+    'am': 'be', 'is': 'be', 'are': 'be', 'was': 'be', 'were': 'be', 'been': 'be',
+    'has': 'have', 'had': 'have', 'does': 'do', 'did': 'do', 'done': 'do',
+    'went': 'go', 'gone': 'go', 'made': 'make', 'came': 'come', 'saw': 'see', 'seen': 'see',
+    'took': 'take', 'taken': 'take', 'got': 'get', 'ate': 'eat', 'eaten': 'eat',
+    'wrote': 'write', 'written': 'write', 'flew': 'fly', 'bought': 'buy', 'thought': 'think',
+    'taught': 'teach', 'gave': 'give', 'given': 'give', 'ran': 'run', 'swam': 'swim',
+    'sang': 'sing', 'told': 'tell', 'said': 'say', 'left': 'leave', 'felt': 'feel',
+    'met': 'meet', 'found': 'find', 'sat': 'sit', 'stood': 'stand', 'slept': 'sleep',
+    'won': 'win', 'wore': 'wear', 'worn': 'wear', 'grew': 'grow', 'grown': 'grow',
+    'knew': 'know', 'put': 'put', 'burnt': 'burn', 'kept': 'keep', 'born': 'bear',
+    'children': 'child', 'men': 'man', 'women': 'woman', 'feet': 'foot', 'teeth': 'tooth',
+    'mice': 'mouse', 'geese': 'goose', 'people': 'person',
+}
+
+
+def lemma_candidates(token: str) -> set:
+    """token 可能的原形（含 token 本身）：所有格、复数 / 三单、过去式、-ing 与常见不规则变化"""
+    if token.endswith("'s"):
+        token = token[:-2]
+    forms = {token}
+    if token in CONTEXT_IRREGULAR:
+        forms.add(CONTEXT_IRREGULAR[token])
+    for suffix, endings in CONTEXT_SUFFIXES:
+        if token.endswith(suffix) and len(token) > len(suffix) + 1:
+            stem = token[:-len(suffix)]
+            forms.update(stem + ending for ending in endings)
+            if suffix in ('ed', 'ing') and len(stem) > 2 and stem[-1] == stem[-2]:
+                forms.add(stem[:-1])
+    return forms
+
+
+def word_pattern(word: str) -> Tuple[str, ...]:
+    """单词 / 词组的匹配模式：去掉 (be) 等括号部分与首尾的 ...，中间的 ... 保留为任意几个词"""
+    text = CONTEXT_PARENTHESES_RE.sub(' ', word.replace('**', '').lower())
+    pattern = [
+        '...' if part.strip('.') == '' else part
+        for part in text.replace('...', ' ... ').split()
+    ]
+    while pattern and pattern[0] == '...':
+        pattern.pop(0)
+    while pattern and pattern[-1] == '...':
+        pattern.pop()
+    return tuple(pattern)
+
+
+def context_passages(readings: Dict, listens: Dict):
+    """产出 (段落 ID, 英文文本)：阅读句型 <阅读 ID>#p<序号>、阅读对话 #d<序号>、听书章节 <听书 ID>#c<序号>"""
+    for reading in readings.get('readings', []):
+        for index, item in enumerate(reading.get('keySentencePatterns', [])):
+            yield f"{reading['id']}#p{index}", item.get('pattern', '')
+        for index, line in enumerate(reading.get('dialogues', [])):
+            yield f"{reading['id']}#d{index}", line.get('content', '')
+    for book in listens.get('books', []):
+        for speech in book.get('speeches', []):
+            for index, chapter in enumerate(speech.get('chapters', [])):
+                yield f"{speech['id']}#c{index}", chapter.get('content', '')
+
+
+def _match_pattern(lemmas: List[set], i: int, pattern: Tuple[str, ...], j: int) -> bool:
+    if j == len(pattern):
+        return True
+    if pattern[j] == '...':
+        return any(
+            _match_pattern(lemmas, k, pattern, j + 1)
+            for k in range(i + 1, min(i + CONTEXT_MAX_GAP, len(lemmas)) + 1)
+        )
+    return i < len(lemmas) and pattern[j] in lemmas[i] and _match_pattern(lemmas, i + 1, pattern, j + 1)
+
+
+def context_outputs(books: List[Dict], readings: Dict, listens: Dict) -> Dict[str, str]:
+    """每个单元一个分片 {sentences: [[段落 ID, 句子在该字段中的偏移, 句子], ...], words: {单词 ID: [句子下标, ...]}}，
+    以及 data/context/index.json（格式同 data/words/index.json）"""
+    by_first: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+    for book in books:
+        for unit in book['units']:
+            for word in unit['words']:
+                pattern = word_pattern(word['word'])
+                if pattern:
+                    by_first.setdefault(pattern[0], []).append((word['id'], pattern))
+
+    refs: Dict[str, List[Tuple[str, int, str]]] = {}
+    for passage_id, text in context_passages(readings, listens):
+        for match in CONTEXT_SENTENCE_RE.finditer(text):
+            sentence = match.group().strip()
+            if not sentence:
+                continue
+            lemmas = [lemma_candidates(token) for token in CONTEXT_TOKEN_RE.findall(sentence.lower())]
+            found = set()
+            for i, forms in enumerate(lemmas):
+                for form in forms:
+                    for word_id, pattern in by_first.get(form, ()):
+                        if word_id not in found and _match_pattern(lemmas, i + 1, pattern, 1):
+                            found.add(word_id)
+            offset = match.start() + len(match.group()) - len(match.group().lstrip())
+            for word_id in found:
+                word_refs = refs.setdefault(word_id, [])
+                if len(word_refs) < MAX_CONTEXT_PER_WORD:
+                    word_refs.append((passage_id, offset, sentence))
+
+    outputs = {}
+    index = {'version': 1, 'books': []}
+    for book in books:
+        book_entry = {'id': book['id'], 'units': []}
+        for unit in book['units']:
+            sentences: List[List] = []
+            sentence_ids: Dict[Tuple[str, int], int] = {}
+            words = {}
+            for word in unit['words']:
+                if word['id'] not in refs:
+                    continue
+                ids = []
+                for passage_id, offset, sentence in refs[word['id']]:
+                    key = (passage_id, offset)
+                    if key not in sentence_ids:
+                        sentence_ids[key] = len(sentences)
+                        sentences.append([passage_id, offset, sentence])
+                    ids.append(sentence_ids[key])
+                words[word['id']] = ids
+            file_name = f'{unit_slug(unit)}.json'
+            content = json.dumps({'sentences': sentences, 'words': words}, ensure_ascii=False, separators=(',', ':'))
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+            outputs[os.path.join(CONTEXT_DIR, book['id'], file_name)] = content
+            book_entry['units'].append({
+                'unit': unit['unit'],
+                'count': len(words),
+                'hash': content_hash,
+                'url': f"data/context/{book['id']}/{file_name}?v={content_hash}",
+            })
+        index['books'].append(book_entry)
+    outputs[os.path.join(CONTEXT_DIR, 'index.json')] = to_json(index)
+    return outputs
+
+
+def build_context() -> Dict:
+    """由磁盘上的 words.json、readings.json、listen.json 生成 data/context/"""
+    data = {}
+    for name in ('words.json', 'readings.json', 'listen.json'):
+        with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+            data[name] = json.load(f)
+    outputs = context_outputs(data['words.json'], data['readings.json'], data['listen.json'])
+    return {
+        'outputs': len(outputs),
+        'words': sum(len(json.loads(content).get('words', {})) for content in outputs.values()),
+        'written': sum(write_if_changed(path, content) for path, content in outputs.items()),
+        'removed': remove_stale(CONTEXT_DIR, set(outputs)),
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='解析 data/*.md，检查格式并生成 data/ 下的 JSON（按书本增量构建）')
+    parser.add_argument('kinds', nargs='*', metavar='words|readings|listens', help='只构建指定的数据（默认全部）')
+    parser.add_argument('--force', action='store_true', help='忽略缓存，全部重新解析与检查')
+    args = parser.parse_args()
+    kinds = args.kinds or list(CHECKERS)
+    for kind in kinds:
+        if kind not in CHECKERS:
+            parser.error(f'未知的数据类型: {kind}（可选 words / readings / listens）')
+
+    start = time.perf_counter()
+    cache = load_cache(rules_fingerprint())
+    failed = False
+    for kind in kinds:
+        report = build(kind, cache, args.force)
+        status = '❌' if report['errors'] else '✅'
+        print(f"{status} {report['source']}: {report['summary']}；"
+              f"{report['segments']} 段中重新解析 {report['parsed']} 段，"
+              f"写出 {report['written']}/{report['outputs']} 个文件"
+              + (f"，删除 {report['removed']} 个旧分片" if report['removed'] else ''))
+        for message in report['errors']:
+            print(f'   ❌ {message}')
+        for message in report['warnings']:
+            print(f'   ⚠️ {message}')
+        if report['errors']:
+            print(f"   {report['source']} 有错误，未写出（修复后重新运行）")
+            failed = True
+    if failed:
+        # 检索索引与单词上下文分片由上面的输出派生，有错误时不要用旧数据或不完整的数据重建
+        print('⏭️ 有错误，跳过 search-index.bin 与 context/ 的生成')
+    else:
+        if 'readings' in kinds or 'listens' in kinds:
+            report = build_search_index()
+            print(f"✅ search-index.bin: {report['passages']} 段文本，{report['bytes'] / 1024:.0f} KB"
+                  + ('' if report['written'] else '（内容未变，未重写）'))
+        report = build_context()
+        print(f"✅ context/: {report['words']} 个单词在课文中出现，写出 {report['written']}/{report['outputs']} 个文件"
+              + (f"，删除 {report['removed']} 个旧分片" if report['removed'] else ''))
+    save_cache(cache)
+    print(f'\n用时 {(time.perf_counter() - start) * 1000:.0f} ms')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
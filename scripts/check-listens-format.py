@@ -15,11 +15,16 @@ LISTEN.md 格式检查工具
 import re
 import sys
 import os
-from typing import List, Dict, Tuple, Optional
+from typing import Dict, Iterable, List, Optional
+
+from markdown_lines import iter_lines, open_markdown, string_lines
 
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 _REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
 
+_BOOK_PREFIX_RE = re.compile(r'^#\s*')
+_CHAPTER_PREFIX_RE = re.compile(r'^##\s*')
+
 
 class ListenFormatChecker:
     """LISTEN.md 格式检查器"""
@@ -43,86 +48,51 @@ class ListenFormatChecker:
             return False
         return True
 
-    def read_file(self, file_path: str) -> Optional[str]:
-        """读取文件内容"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            self.errors.append(f"读取文件失败: {e}")
-            return None
-
     def check_format(self, content: str):
+        """检查 LISTEN.md 格式（content 为整个文件的文本）"""
+        self.check_lines(string_lines(content))
+
+    def check_lines(self, lines: Iterable[str]):
         """
-        检查 LISTEN.md 格式
+        单遍检查 LISTEN.md：lines 为逐行可迭代对象（打开的文件等）。
+        章节正文只计行数不保存，内存占用与文件大小无关。
 
         格式规则：
         - 一级标题 # 书本名称 表示新书本
         - 二级标题 ## 标题 可以是"文章概要"、"正文"、或其他任何章节名
         - 二级标题下的内容都是该章节的内容
         """
-        lines = content.split('\n')
-
         current_book = None
         current_speech = None
         current_chapter = None
-        chapter_content = []
-        is_first_chapter = True
+        content_lines = 0
         is_parsing_summary = False
         speech_index = 0
 
-        for i in range(len(lines)):
-            raw_line = lines[i]
-            line = raw_line.strip()
-
-            # 跳过空行
-            if not line:
-                continue
-
-            # 跳过 HTML 注释和代码块
-            if line.startswith('<!--') or line.startswith('```'):
+        for line_number, raw_line, line, _ in iter_lines(lines, skip_comments=False):
+            # 跳过空行和 HTML 注释行（代码块标记行已由 iter_lines 跳过）
+            if not line or line.startswith('<!--'):
                 continue
 
             # 检测一级标题 # 书本名称 -> 新书开始
             if line.startswith('# ') and not line.startswith('## '):
                 # 如果已有正在处理的书，先保存它
                 if current_book and current_speech:
-                    # 保存最后一个章节或概要
-                    if is_parsing_summary and chapter_content:
-                        current_speech['summary'] = '\n'.join(chapter_content).strip()
-                        current_speech['has_summary'] = bool(current_speech['summary'])
-                    elif current_chapter:
-                        current_chapter['content'] = '\n'.join(chapter_content).strip()
-                        current_speech['chapters'].append(current_chapter)
-
-                    # 添加到当前书的 speeches 列表
-                    if current_speech.get('chapters'):
-                        current_book['speeches'].append(current_speech)
-
-                    # 收集统计信息
-                    self.stats['total_speeches'] += 1
-                    if current_speech.get('chapters'):
-                        self.stats['valid_speeches'] += 1
-                    if current_speech.get('has_summary'):
-                        self.stats['speeches_with_summary'] += 1
-                    self.stats['total_chapters'] += len(current_speech.get('chapters', []))
-
-                # 添加到书籍列表
-                if current_book and current_book.get('speeches'):
+                    self.finish_speech(current_book, current_speech, current_chapter,
+                                       is_parsing_summary and content_lines > 0)
+                if current_book and current_book['speeches']:
                     self.books.append(current_book)
 
                 # 开始新书
-                book_name = re.sub(r'^#\s*', '', line).strip()
                 current_book = {
-                    'name': book_name,
-                    'line_number': i + 1,
+                    'name': _BOOK_PREFIX_RE.sub('', line).strip(),
+                    'line_number': line_number,
                     'speeches': []
                 }
                 current_speech = None
-                is_first_chapter = True
-                is_parsing_summary = False
                 current_chapter = None
-                chapter_content = []
+                content_lines = 0
+                is_parsing_summary = False
                 continue
 
             if not current_book:
@@ -133,9 +103,8 @@ class ListenFormatChecker:
                 speech_index += 1
                 current_speech = {
                     'index': speech_index,
-                    'line_number': i + 1,
+                    'line_number': line_number,
                     'title': current_book['name'],
-                    'summary': '',
                     'has_summary': False,
                     'chapters': []
                 }
@@ -143,100 +112,56 @@ class ListenFormatChecker:
             # 检测二级标题 ## 标题 -> 新章节开始
             # 章节标题可以是"文章概要"、"正文"、或其他任何章节名
             if line.startswith('## '):
-                chapter_title = re.sub(r'^##\s*', '', line).strip()
+                chapter_title = _CHAPTER_PREFIX_RE.sub('', line).strip()
+
+                # 保存上一个概要或章节
+                if is_parsing_summary and content_lines:
+                    current_speech['has_summary'] = True
+                if current_chapter:
+                    current_speech['chapters'].append(current_chapter)
+                content_lines = 0
 
-                # 检查是否是"文章概要"章节（特殊章节，用于存储文章摘要）
+                # "文章概要" 是特殊章节，用于存储文章摘要
                 if chapter_title == '文章概要':
-                    # 保存上一个普通章节（如果有）
-                    if not is_first_chapter and current_chapter:
-                        current_chapter['content'] = '\n'.join(chapter_content).strip()
-                        current_speech['chapters'].append(current_chapter)
-                    elif is_first_chapter and current_speech and current_chapter and chapter_content:
-                        # 第一个章节的情况
-                        current_chapter['content'] = '\n'.join(chapter_content).strip()
-                        current_speech['chapters'].append(current_chapter)
-
-                    # 保存文章概要内容
-                    if is_parsing_summary and chapter_content:
-                        current_speech['summary'] = '\n'.join(chapter_content).strip()
-                        current_speech['has_summary'] = bool(current_speech['summary'])
-
-                    # 重置状态，开始解析文章概要
                     is_parsing_summary = True
-                    is_first_chapter = False
                     current_chapter = None
-                    chapter_content = []
                 else:
-                    # 这是一个普通章节（正文或其他章节）
-                    # 如果之前在解析概要，先保存概要
-                    if is_parsing_summary and chapter_content:
-                        current_speech['summary'] = '\n'.join(chapter_content).strip()
-                        current_speech['has_summary'] = bool(current_speech['summary'])
-
-                    # 保存上一个章节（如果有）
-                    if not is_first_chapter and current_chapter:
-                        current_chapter['content'] = '\n'.join(chapter_content).strip()
-                        current_speech['chapters'].append(current_chapter)
-                    elif is_first_chapter and current_speech and current_chapter and chapter_content:
-                        # 第一个章节的情况
-                        current_chapter['content'] = '\n'.join(chapter_content).strip()
-                        current_speech['chapters'].append(current_chapter)
-
-                    # 开始新章节
                     is_parsing_summary = False
-                    current_chapter = {
-                        'title': chapter_title,
-                        'content': ''
-                    }
-                    chapter_content = []
-                    is_first_chapter = False
+                    current_chapter = {'title': chapter_title}
                 continue
 
-            # 收集章节内容
-            # 二级标题下的所有内容都属于该章节
-            if is_parsing_summary:
-                # 跳过章节标题后的第一个空行
-                if not chapter_content and not line:
-                    continue
-                chapter_content.append(raw_line)
-            elif current_chapter:
-                # 跳过章节标题后的第一个空行
-                if not chapter_content and not line:
-                    continue
-                chapter_content.append(raw_line)
-
-        # 保存最后一个章节或概要
+            # 二级标题下的所有内容都属于该章节（空行已跳过）
+            if is_parsing_summary or current_chapter:
+                content_lines += 1
+
+        # 保存最后一本书
         if current_book and current_speech:
-            if is_parsing_summary and chapter_content:
-                current_speech['summary'] = '\n'.join(chapter_content).strip()
-                current_speech['has_summary'] = bool(current_speech['summary'])
-            elif current_chapter:
-                current_chapter['content'] = '\n'.join(chapter_content).strip()
-                current_speech['chapters'].append(current_chapter)
-
-            # 如果是第一个章节（没有经过章节切换），也需要保存
-            if is_first_chapter and current_chapter and current_chapter.get('content'):
-                current_speech['chapters'].append(current_chapter)
-
-            # 添加到当前书的 speeches 列表
-            if current_speech.get('chapters'):
-                current_book['speeches'].append(current_speech)
-
-            # 收集统计信息
-            self.stats['total_speeches'] += 1
-            if current_speech.get('chapters'):
-                self.stats['valid_speeches'] += 1
-            if current_speech.get('has_summary'):
-                self.stats['speeches_with_summary'] += 1
-            self.stats['total_chapters'] += len(current_speech.get('chapters', []))
-
-        # 添加最后一本书到列表
-        if current_book and current_book.get('speeches'):
+            self.finish_speech(current_book, current_speech, current_chapter,
+                               is_parsing_summary and content_lines > 0)
+        if current_book and current_book['speeches']:
             self.books.append(current_book)
 
         # 更新书籍总数
         self.stats['total_books'] = len(self.books)
 
+    def finish_speech(self, book: Dict, speech: Dict, chapter: Optional[Dict], summary_pending: bool):
+        """保存最后一个概要或章节，收集统计信息"""
+        if summary_pending:
+            speech['has_summary'] = True
+        elif chapter:
+            speech['chapters'].append(chapter)
+
+        # 添加到当前书的 speeches 列表
+        if speech['chapters']:
+            book['speeches'].append(speech)
+
+        self.stats['total_speeches'] += 1
+        if speech['chapters']:
+            self.stats['valid_speeches'] += 1
+        if speech['has_summary']:
+            self.stats['speeches_with_summary'] += 1
+        self.stats['total_chapters'] += len(speech['chapters'])
+
     def print_results(self) -> bool:
         """打印检查结果"""
         print('\n' + '=' * 60)
@@ -298,12 +223,15 @@ class ListenFormatChecker:
             self.print_results()
             return False
         
-        content = self.read_file(listen_path)
-        if content is None:
+        # 逐行读取、单遍检查，不把整个文件读入内存
+        try:
+            with open_markdown(listen_path) as f:
+                self.check_lines(f)
+        except (OSError, UnicodeDecodeError) as e:
+            self.errors.append(f"读取文件失败: {e}")
             self.print_results()
             return False
         
-        self.check_format(content)
         return self.print_results()
 
 
@@ -9,11 +9,25 @@ READINGS.md 格式检查工具
 import re
 import sys
 import os
-from typing import List, Dict, Tuple, Optional
+from typing import Dict, Iterable, List
+
+from markdown_lines import iter_lines, open_markdown, string_lines
 
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 _REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
 
+_SECTION_PREFIXES = ('# 题目：', '# 场景：', '# 重点句型', '# 知识点')
+_HEADING_PREFIX_RE = re.compile(r'^#\s*')
+_UNIT_PREFIX_RE = re.compile(r'^##\s*')
+_LIST_PREFIX_RE = re.compile(r'^[*#]\s*')
+_TITLE_RE = re.compile(r'题目：(.+?)\s*\(([^)]+)\)')
+_SCENE_PREFIX_RE = re.compile(r'^[*#]\s*场景：')
+_PATTERN_CN_RE = re.compile(r'^(.+)（(.+)）$')
+_DIALOGUE_CN_RE = re.compile(r'^([^:]+):\s*(.+?)\s*（([^）]+）)')
+_DIALOGUE_RE = re.compile(r'^([^:]+):\s*(.+?)\s*\(([^)]+)\)')
+_BOLD_LIST_LABEL_RE = re.compile(r'^\*\s+\*\*')
+_BOLD_SUB_ITEM_RE = re.compile(r'^\s{2,}-\s+\*\*')
+
 
 class ReadingsFormatChecker:
     """READINGS.md 格式检查器"""
@@ -37,75 +51,53 @@ class ReadingsFormatChecker:
             return False
         return True
     
-    def read_file(self, file_path: str) -> Optional[str]:
-        """读取文件内容"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            self.errors.append(f"读取文件失败: {e}")
-            return None
-    
+    def _check_bold_label(self, line_no: int, raw_line: str, stripped: str) -> None:
+        """
+        列表元数据行（* 题目：等）与句型/知识点子项（  - 核心词汇：等）不得给标签加粗，
+        与 convert-readings.js 的转换前检查一致。
+        """
+        if _BOLD_LIST_LABEL_RE.match(stripped):
+            self.errors.append(
+                f"第 {line_no} 行：列表元数据行请勿在标签上使用 ** 加粗，"
+                f"请使用「* 题目：」「* 场景：」「* 重点句型：」「* 知识点：」"
+            )
+        elif _BOLD_SUB_ITEM_RE.match(raw_line):
+            self.errors.append(
+                f"第 {line_no} 行：句型/知识点子项请勿使用「- **类别**：」加粗，"
+                f"请使用「- 核心词汇：」「- 重点短语：」等"
+            )
+
     def check_format(self, content: str):
-        """检查格式"""
-        lines = content.split('\n')
-        
-        # 过滤掉 <!-- ... --> 注释块内的行，避免将格式示例当作真实内容检查
-        filtered: List[Tuple[str, int]] = []  # (raw_line, original_line_number 1-based)
-        in_comment_block = False
-        for i, raw in enumerate(lines):
-            stripped = raw.strip()
-            if stripped.startswith('<!--'):
-                in_comment_block = True
-                continue
-            if in_comment_block:
-                if '-->' in stripped:
-                    in_comment_block = False
-                continue
-            filtered.append((raw, i + 1))
-        
-        # 提取书本名称（第一个 # 标题）
-        book_name = ''
-        for raw_line, _ in filtered:
-            stripped = raw_line.strip()
-            if stripped.startswith('# ') and not stripped.startswith('# 题目：') and \
-               not stripped.startswith('# 场景：') and not stripped.startswith('# 重点句型') and \
-               not stripped.startswith('# 知识点'):
-                book_name = re.sub(r'^#\s*', '', stripped)
-                self.book_name = book_name
-                break
-        
+        """检查格式（content 为整个文件的文本）"""
+        self.check_lines(string_lines(content))
+
+    def check_lines(self, lines: Iterable[str]):
+        """
+        单遍检查：lines 为逐行可迭代对象（打开的文件等），跳过 <!-- ... --> 注释块，
+        只保留当前阅读材料的状态。第一个题目行之前的内容只用于取书本名称与格式检查。
+        """
         # 当前单元名称
         current_unit_name = ''
         
-        # 找到第一个题目行
-        start_index = 0
-        for idx, (raw_line, _) in enumerate(filtered):
-            stripped = raw_line.strip()
-            if stripped.startswith('# 题目：') or stripped.startswith('* 题目：'):
-                start_index = idx
-                break
-        
         current_reading = None
         is_parsing_patterns = False
         is_parsing_knowledge_points = False
         reading_index = 0
         
-        for idx in range(start_index, len(filtered)):
-            raw_line, line_no = filtered[idx]
-            line = raw_line.strip()
+        for line_no, raw_line, line, _ in iter_lines(lines):
+            self._check_bold_label(line_no, raw_line, line)
             
             # 跳过空行
             if not line:
                 continue
             
-            # 跳过独立的代码块标记行
-            if line.startswith('```'):
-                continue
+            # 书本名称（第一个 # 标题）
+            if not self.book_name and line.startswith('# ') and not line.startswith(_SECTION_PREFIXES):
+                self.book_name = _HEADING_PREFIX_RE.sub('', line)
             
             # 检测单元标题行（## 开头的行）
             if line.startswith('## '):
-                current_unit_name = re.sub(r'^##\s*', '', line)
+                current_unit_name = _UNIT_PREFIX_RE.sub('', line)
                 continue
             
             # 检测题目行（支持两种格式：# 题目： 和 * 题目：）
@@ -119,7 +111,7 @@ class ReadingsFormatChecker:
                     'index': reading_index,
                     'line_number': line_no,
                     'title_line': line,
-                    'book_name': book_name,
+                    'book_name': self.book_name,
                     'unit_name': current_unit_name,
                     'has_scene': False,
                     'has_patterns': False,
@@ -131,10 +123,10 @@ class ReadingsFormatChecker:
                 self.stats['total_readings'] += 1
                 
                 # 移除 # 或 * 前缀
-                clean_line = re.sub(r'^[*#]\s*', '', line)
+                clean_line = _LIST_PREFIX_RE.sub('', line)
                 
                 # 解析标题
-                title_match = re.match(r'题目：(.+?)\s*\(([^)]+)\)', clean_line)
+                title_match = _TITLE_RE.match(clean_line)
                 if title_match:
                     current_reading['title'] = title_match.group(1).strip()
                     current_reading['title_cn'] = title_match.group(2).strip()
@@ -149,7 +141,7 @@ class ReadingsFormatChecker:
             # 检测场景行（支持两种格式：# 场景： 和 * 场景：）
             if line.startswith('# 场景：') or line.startswith('* 场景：'):
                 current_reading['has_scene'] = True
-                scene_content = re.sub(r'^[*#]\s*场景：', '', line)
+                scene_content = _SCENE_PREFIX_RE.sub('', line)
                 current_reading['scene'] = scene_content.strip()
                 if not current_reading['scene']:
                     self.warnings.append(f"第 {line_no} 行：场景描述为空")
@@ -176,7 +168,7 @@ class ReadingsFormatChecker:
                 
                 # 检查是否包含中文括号
                 if '（' in pattern_line and '）' in pattern_line:
-                    pattern_match = re.match(r'^(.+)（(.+)）$', pattern_line)
+                    pattern_match = _PATTERN_CN_RE.match(pattern_line)
                     if pattern_match:
                         current_reading['patterns'].append({
                             'pattern': pattern_match.group(1).strip(),
@@ -209,7 +201,7 @@ class ReadingsFormatChecker:
                 current_reading['has_content'] = True
                 
                 # 尝试匹配全角括号格式
-                dialogue_match = re.match(r'^([^:]+):\s*(.+?)\s*（([^）]+）)', line)
+                dialogue_match = _DIALOGUE_CN_RE.match(line)
                 if dialogue_match:
                     cn_translation = dialogue_match.group(3).strip()
                     cn_translation = cn_translation.rstrip('。')
@@ -225,7 +217,7 @@ class ReadingsFormatChecker:
                     self.stats['total_dialogues'] += 1
                 else:
                     # 尝试匹配半角括号格式
-                    dialogue_match = re.match(r'^([^:]+):\s*(.+?)\s*\(([^)]+)\)', line)
+                    dialogue_match = _DIALOGUE_RE.match(line)
                     if dialogue_match:
                         cn_translation = dialogue_match.group(3).strip()
                         cn_translation = cn_translation.rstrip('.')
@@ -331,12 +323,15 @@ class ReadingsFormatChecker:
             self.print_results()
             return False
         
-        content = self.read_file(readings_path)
-        if content is None:
+        # 逐行读取、单遍检查，不把整个文件读入内存
+        try:
+            with open_markdown(readings_path) as f:
+                self.check_lines(f)
+        except (OSError, UnicodeDecodeError) as e:
+            self.errors.append(f"读取文件失败: {e}")
             self.print_results()
             return False
         
-        self.check_format(content)
         return self.print_results()
 
 
@@ -11,11 +11,19 @@ WORDS.md 格式检查工具
 import re
 import sys
 import os
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional
+
+from markdown_lines import iter_lines, open_markdown, string_lines
 
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 _REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
 
+_UNIT_RE = re.compile(r'##\s*(Unit\s*\d+)')
+_TITLE_RE = re.compile(r'Title:\s*(.+?)\s*Category:\s*(.+)')
+_EXAMPLE_RE = re.compile(r'^(.+?)\s*\(([^)]+)\)\s*$')
+_PHONETIC_RE = re.compile(r'/([^\/]+)/')
+_WORD_RE = re.compile(r'^([^\s\/]+(?:\s+[^\s\/]+)?)')
+
 
 class WordsFormatChecker:
     """WORDS.md 格式检查器"""
@@ -47,146 +55,107 @@ class WordsFormatChecker:
             return False
         return True
     
-    def read_file(self, file_path: str) -> Optional[str]:
-        """读取文件内容"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            self.errors.append(f"读取文件失败: {e}")
-            return None
-    
-    def _check_markdown_bold_forbidden(self, lines: List[str]) -> None:
-        """
-        禁止使用 **...** 加粗。
-        若词条或例句等含 **，转换后听写/输入会要求用户键入星号，与正常听写不符。
-        """
-        in_comment_block = False
-        in_code_block = False
-        for i, raw_line in enumerate(lines):
-            line_stripped = raw_line.strip()
-            if in_comment_block:
-                if '-->' in raw_line:
-                    in_comment_block = False
-                continue
-            if line_stripped.startswith('<!--'):
-                in_comment_block = True
-                continue
-            if line_stripped.startswith('```'):
-                in_code_block = not in_code_block
-                continue
-            if in_code_block:
-                continue
-            if '**' in raw_line:
-                self.errors.append(
-                    f"第 {i + 1} 行：禁止使用 Markdown 加粗 **...** "
-                    f"(听写功能会按原文判题，用户不应输入 * 号；请去掉 ** 仅保留文字)"
-                )
-
     def check_format(self, content: str):
-        """检查格式"""
-        lines = content.split('\n')
-        self._check_markdown_bold_forbidden(lines)
+        """检查格式（content 为整个文件的文本）"""
+        self.check_lines(string_lines(content))
 
+    def check_lines(self, lines: Iterable[str]):
+        """
+        单遍检查：lines 为逐行可迭代对象（打开的文件等）。
+        只保留当前词书 / 单元 / 单词的状态，单元结束时即验证，不在内存中累积整本词书。
+        """
         current_book = None
         current_unit = None
         current_word = None
         word_index = 0
-        in_comment_block = False  # 是否在 <!-- ... --> 注释块内
-        
-        for i, raw_line in enumerate(lines):
-            line = raw_line.strip()
-            
-            # 跳过 HTML 注释块：进入 <!-- 后直到 --> 之前都忽略
-            if line.startswith('<!--'):
-                in_comment_block = True
-                continue
-            if in_comment_block:
-                if '-->' in line:
-                    in_comment_block = False
-                continue
-            # 跳过独立的代码块标记行
-            if line.startswith('```'):
-                continue
-            
+
+        for line_number, raw_line, line, in_code in iter_lines(lines):
+            # 禁止使用 **...** 加粗：转换后听写/输入会要求用户键入星号，与正常听写不符（代码块内不检查）
+            if not in_code and '**' in raw_line:
+                self.errors.append(
+                    f"第 {line_number} 行：禁止使用 Markdown 加粗 **...** "
+                    f"(听写功能会按原文判题，用户不应输入 * 号；请去掉 ** 仅保留文字)"
+                )
+
             # 检测词书标题
             if raw_line.startswith('# '):
-                # 保存上一个词书
-                if current_book:
-                    self.validate_book(current_book)
-                
                 book_name = line.replace('# ', '').replace('单词', '').strip()
-                
+
                 if '年级' not in book_name:
                     continue
-                
+
+                # 结束上一个词书（最后一个单词、最后一个单元）
+                self.finish_word(current_word, current_unit, current_book)
+                self.finish_unit(current_unit)
+                if current_book:
+                    self.validate_book(current_book)
+
                 current_book = {
                     'index': self.stats['total_books'] + 1,
-                    'line_number': i + 1,
+                    'line_number': line_number,
                     'name': book_name,
                     'id': self.BOOK_NAME_MAP.get(book_name, book_name),
                     'has_valid_name': True,
-                    'units': []
+                    'unit_count': 0
                 }
                 self.stats['total_books'] += 1
                 current_unit = None
                 current_word = None
                 continue
-            
+
             # 如果没有当前词书，跳过
             if not current_book:
                 continue
-            
+
             # 检测单元标题
             if raw_line.startswith('## '):
                 # 保存上一个单词
-                if current_word and current_unit:
-                    self.validate_word(current_word, current_unit, current_book)
-                    current_unit['words'].append(current_word)
+                if self.finish_word(current_word, current_unit, current_book):
                     word_index += 1
                 current_word = None
-                
-                unit_match = re.match(r'##\s*(Unit\s*\d+)', line)
+
+                unit_match = _UNIT_RE.match(line)
                 if unit_match:
+                    self.finish_unit(current_unit)
                     current_unit = {
                         'unit': unit_match[1],
-                        'line_number': i + 1,
+                        'line_number': line_number,
                         'title': '',
                         'category': '',
                         'has_title': False,
-                        'words': []
+                        'word_count': 0
                     }
-                    current_book['units'].append(current_unit)
+                    current_book['unit_count'] += 1
                     self.stats['total_units'] += 1
                     word_index = 0
                 continue
-            
+
             # 如果没有当前单元，跳过
             if not current_unit:
                 continue
-            
+
             # 检测 Title 行
             if raw_line.startswith('Title:'):
-                title_match = re.match(r'Title:\s*(.+?)\s*Category:\s*(.+)', line)
+                title_match = _TITLE_RE.match(line)
                 if title_match:
                     current_unit['title'] = title_match.group(1).strip()
                     current_unit['category'] = title_match.group(2).strip()
                     current_unit['has_title'] = True
                 else:
-                    self.warnings.append(f"第 {i + 1} 行：Title/Category 格式不正确，应为 \"Title:标题 Category:分类\"")
+                    self.warnings.append(f"第 {line_number} 行：Title/Category 格式不正确，应为 \"Title:标题 Category:分类\"")
                 continue
-            
+
             # 检测详情行（缩进的 - 行）
             if raw_line.startswith('  - '):
                 detail_content = line[2:].strip()  # 移除 "- " 前缀
-                
+
                 # 如果还没有当前单词数据，跳过
                 if not current_word:
                     continue
-                
+
                 if detail_content.startswith('例句：'):
                     example_part = detail_content[3:]  # 移除 "例句："
-                    example_match = re.match(r'^(.+?)\s*\(([^)]+)\)\s*$', example_part)
+                    example_match = _EXAMPLE_RE.match(example_part)
                     if example_match:
                         current_word['example'] = example_match.group(1).strip()
                         current_word['translation'] = example_match.group(2).strip()
@@ -199,36 +168,30 @@ class WordsFormatChecker:
                     current_word['memory_tip'] = detail_content[3:].strip()
                     self.stats['total_memory_tips'] += 1
                 continue
-            
+
             # 检测单词行（以 * 开头但不是缩进的）
             if raw_line.startswith('* '):
                 # 保存上一个单词
-                if current_word and current_unit:
-                    self.validate_word(current_word, current_unit, current_book)
-                    current_unit['words'].append(current_word)
+                if self.finish_word(current_word, current_unit, current_book):
                     word_index += 1
-                
-                current_word = self.parse_word_line(line, i + 1, current_book, current_unit, word_index)
+
+                current_word = self.parse_word_line(line, line_number, current_book, current_unit, word_index)
                 if current_word:
                     self.stats['total_words'] += 1
                 continue
-        
-        # 保存最后一个单词
-        if current_word and current_unit:
-            self.validate_word(current_word, current_unit, current_book)
-            current_unit['words'].append(current_word)
-            word_index += 1
-        
-        # 验证最后一个词书
+
+        # 结束最后一个词书
+        self.finish_word(current_word, current_unit, current_book)
+        self.finish_unit(current_unit)
         if current_book:
             self.validate_book(current_book)
-    
+
     def parse_word_line(self, line: str, line_number: int, book, unit, index: int) -> Optional[Dict]:
         """解析单词行"""
         word_line = line[2:].strip()  # 移除 "* "
         
         # 先提取音标 /.../
-        phonetic_match = re.search(r'/([^\/]+)/', word_line)
+        phonetic_match = _PHONETIC_RE.search(word_line)
         phonetic = ''
         meaning = ''
         word = ''
@@ -241,14 +204,14 @@ class WordsFormatChecker:
                 meaning = parts[2].strip()
             else:
                 # 没有足够部分，使用空格分割
-                word_match = re.match(r'^([^\s\/]+(?:\s+[^\s\/]+)?)', word_line)
+                word_match = _WORD_RE.match(word_line)
                 if word_match:
                     word = word_match[1].strip()
                     remaining = word_line[len(word_match[0]):].strip()
                     meaning = remaining
         else:
             # 没有音标
-            word_match = re.match(r'^([^\s\/]+(?:\s+[^\s\/]+)?)', word_line)
+            word_match = _WORD_RE.match(word_line)
             if not word_match:
                 self.warnings.append(f"第 {line_number} 行：无法解析单词行")
                 return None
@@ -272,13 +235,30 @@ class WordsFormatChecker:
             'translation': '',
             'memory_tip': ''
         }
-    
+
+    def finish_word(self, word: Optional[Dict], unit: Optional[Dict], book: Optional[Dict]) -> bool:
+        """单词结束：验证并计入所属单元；没有当前单元的单词不计（同 convert-words.js）"""
+        if not (word and unit):
+            return False
+        self.validate_word(word, unit, book)
+        unit['word_count'] += 1
+        return True
+
+    def finish_unit(self, unit: Optional[Dict]):
+        """单元结束：检查标题与单词数"""
+        if not unit:
+            return
+        if not unit.get('title'):
+            self.warnings.append(f"第 {unit['line_number']} 行：单元 {unit['unit']} 缺少标题 (Title:...)")
+        if not unit['word_count']:
+            self.warnings.append(f"第 {unit['line_number']} 行：单元 {unit['unit']} 没有单词")
+
     def validate_book(self, book: Dict):
-        """验证单个词书"""
+        """验证单个词书（单元已在 finish_unit 中逐个检查）"""
         name = book.get('name', f"book-{book['index']}")
         
         # 检查是否有单元
-        if not book.get('units'):
+        if not book['unit_count']:
             self.warnings.append(f"第 {book['line_number']} 行 \"{name}\"：词书中没有单元")
             return
         
@@ -286,14 +266,6 @@ class WordsFormatChecker:
         if not book.get('has_valid_name', True):
             self.errors.append(f"第 {book['line_number']} 行：词书名称格式不正确")
         
-        # 检查每个单元
-        for unit in book['units']:
-            if not unit.get('title'):
-                self.warnings.append(f"第 {unit['line_number']} 行：单元 {unit['unit']} 缺少标题 (Title:...)")
-            
-            if not unit.get('words'):
-                self.warnings.append(f"第 {unit['line_number']} 行：单元 {unit['unit']} 没有单词")
-        
         self.stats['valid_books'] += 1
     
     def validate_word(self, word: Dict, unit: Dict, book: Dict):
@@ -361,12 +333,15 @@ class WordsFormatChecker:
             self.print_results()
             return False
         
-        content = self.read_file(words_path)
-        if content is None:
+        # 逐行读取、单遍检查，不把整个文件读入内存
+        try:
+            with open_markdown(words_path) as f:
+                self.check_lines(f)
+        except (OSError, UnicodeDecodeError) as e:
+            self.errors.append(f"读取文件失败: {e}")
             self.print_results()
             return False
         
-        self.check_format(content)
         return self.print_results()
 
 
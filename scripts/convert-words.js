@@ -1,7 +1,8 @@
 #!/usr/bin/env node
-// 数据转换脚本：将 data/WORDS.md 转为 data/words.json
+// 数据转换脚本：将 data/WORDS.md 转为 data/words.json，并按单元拆分为 data/words/ 下的分片
 // 运行方式（在仓库根目录）：node scripts/convert-words.js
 
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
 
@@ -221,6 +222,48 @@ function parseWordLine(line, book, unit, index) {
     };
 }
 
+/** 单元分片文件名：Unit 3 → u3（与单词 ID 中的单元部分一致） */
+function unitSlug(unit) {
+    return unit.unit.replace(/\s+/g, '').replace(/^Unit/i, 'u');
+}
+
+/**
+ * 写出分片：data/words/<词书 ID>/<单元>.json（该单元的单词数组）与 data/words/index.json。
+ * 索引中的 hash 与 server.py 静态文件的版本号相同（内容 sha256 前 12 位），
+ * 前端请求 url（带 ?v=hash）时服务器返回长期缓存，内容变化后 url 随之变化。
+ */
+function writeShards(wordBooks) {
+    const shardRoot = path.join(REPO_ROOT, 'data', 'words');
+    // 先清空，已删除的词书 / 单元不留旧分片
+    fs.rmSync(shardRoot, { recursive: true, force: true });
+
+    const index = { version: 1, books: [] };
+    wordBooks.forEach(book => {
+        const bookDir = path.join(shardRoot, book.id);
+        fs.mkdirSync(bookDir, { recursive: true });
+        const bookEntry = { id: book.id, name: book.name, units: [] };
+        book.units.forEach(unit => {
+            const fileName = `${unitSlug(unit)}.json`;
+            const content = JSON.stringify(unit.words, null, 2);
+            fs.writeFileSync(path.join(bookDir, fileName), content, 'utf-8');
+            const hash = crypto.createHash('sha256').update(content, 'utf-8').digest('hex').slice(0, 12);
+            bookEntry.units.push({
+                unit: unit.unit,
+                title: unit.title,
+                category: unit.category,
+                count: unit.words.length,
+                hash: hash,
+                url: `data/words/${book.id}/${fileName}?v=${hash}`
+            });
+        });
+        index.books.push(bookEntry);
+    });
+
+    const indexPath = path.join(shardRoot, 'index.json');
+    fs.writeFileSync(indexPath, JSON.stringify(index, null, 2), 'utf-8');
+    return indexPath;
+}
+
 // 主程序
 function main() {
     console.log('开始转换 data/WORDS.md...');
@@ -244,6 +287,11 @@ function main() {
     const outputPath = path.join(REPO_ROOT, 'data', 'words.json');
     fs.writeFileSync(outputPath, jsonOutput, 'utf-8');
     console.log(`\n数据已保存到: ${outputPath}`);
+
+    // 按单元拆分的分片与索引（前端只加载需要的单元）
+    const indexPath = writeShards(wordBooks);
+    const unitCount = wordBooks.reduce((acc, book) => acc + book.units.length, 0);
+    console.log(`分片已保存到: ${path.dirname(indexPath)}（索引 + ${unitCount} 个单元）`);
     
     console.log('\n转换完成！');
 }
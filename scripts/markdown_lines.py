@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Markdown 逐行读取（check-*-format.py 共用）
+iter_lines() 是生成器：逐行读入、跳过 <!-- ... --> 注释块与 ``` 标记行，只保留当前一行，
+检查多 MB 的课本文件时内存占用与文件大小无关。
+"""
+
+import io
+from typing import Iterable, Iterator, NamedTuple
+
+
+class MarkdownLine(NamedTuple):
+    number: int      # 在原文件中的行号（从 1 开始）
+    raw: str         # 原始行（去掉行尾 \n，保留缩进）
+    text: str        # raw.strip()
+    in_code: bool    # 是否在 ``` 代码块内
+
+
+def open_markdown(path: str):
+    """按 \\n 分行打开（与 content.split('\\n') 一致，\\r 留在行内）"""
+    return open(path, 'r', encoding='utf-8', newline='\n')
+
+
+def string_lines(content: str) -> io.StringIO:
+    """把整段文本包装成逐行可迭代对象（check_format(content) 使用）"""
+    return io.StringIO(content, newline='\n')
+
+
+def iter_lines(source: Iterable[str], skip_comments: bool = True) -> Iterator[MarkdownLine]:
+    """
+    source：打开的文件或任何逐行可迭代对象。
+    skip_comments：跳过 <!-- 开头的行直到含 --> 的行（与 convert-*.js 的过滤规则相同）；
+    ``` 标记行总是跳过，其后的行带 in_code=True 产出。
+    """
+    in_comment_block = False
+    in_code_block = False
+    for number, raw in enumerate(source, 1):
+        if raw.endswith('\n'):
+            raw = raw[:-1]
+        text = raw.strip()
+        if skip_comments:
+            if text.startswith('<!--'):
+                in_comment_block = True
+                continue
+            if in_comment_block:
+                if '-->' in text:
+                    in_comment_block = False
+                continue
+        if text.startswith('```'):
+            in_code_block = not in_code_block
+            continue
+        yield MarkdownLine(number, raw, text, in_code_block)
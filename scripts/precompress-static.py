@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态文件预压缩工具
+为 css/、js/、data/、lottie/ 下的文本类文件生成 gzip（安装 brotli 时还有 br）版本，
+保存到 STATIC_ASSETS['dir']（默认 CACHE_DIR/static/，按内容哈希命名）；server.py 按 Accept-Encoding 直接返回。
+运行方式（在仓库根目录）：python3 scripts/precompress-static.py
+
+不运行也可以：服务首次收到某个文件的请求时会生成同样的文件，部署时预先运行只是避免首个请求等待压缩。
+index.html 需要注入版本号，由服务在内存中改写并压缩，不在此列。
+"""
+
+import os
+import sys
+import time
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
+sys.path.insert(0, _REPO_ROOT)
+
+import server  # noqa: E402
+
+ASSET_DIRS = ('css', 'js', 'data', 'lottie')
+
+
+def iter_assets(root):
+    """ASSET_DIRS 下的所有文件（相对仓库根目录，/ 分隔）"""
+    for directory in ASSET_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(root, directory)):
+            for name in sorted(filenames):
+                yield os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, '/')
+
+
+def main():
+    """主函数"""
+    assets = server.static_assets
+    if server.brotli is None:
+        print('ℹ️ 未安装 brotli（pip install brotli），只生成 gzip 版本')
+    start = time.time()
+    results = assets.prebuild(iter_assets(assets.root))
+    total = sum(size for _, size, _ in results)
+    print(f'📁 输出目录: {assets.directory}')
+    for filename, size, sizes in results:
+        parts = ', '.join(f'{encoding} {compressed / 1024:.1f} KB' for encoding, compressed in sizes.items())
+        print(f'   {filename:<44} {size / 1024:>8.1f} KB → {parts}')
+    compressed = sum(sizes['gzip'] for _, _, sizes in results)
+    print(f'\n✅ {len(results)} 个文件，原始 {total / 1024:.0f} KB，gzip 后 {compressed / 1024:.0f} KB，'
+          f'用时 {time.time() - start:.1f}s' + ('' if server.brotli is None else '（另有 br 版本）'))
+
+
+if __name__ == '__main__':
+    main()
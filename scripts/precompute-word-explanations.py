@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单词讲解预生成工具
+遍历 data/words.json 中每个词书 / 单元 / 单词，按单词卡片的提问（“xxx 是什么意思？”）
+调用 MiniMax 生成讲解，写入 data/word-explanations.json；server.py 对相同提问直接返回，不再调用 API。
+运行方式（在仓库根目录）：python3 scripts/precompute-word-explanations.py [--concurrency N] [--book ID] [--limit N] [--force]
+
+可随时中断：每完成 --checkpoint-every 个单词写一次输出文件（先写临时文件再替换），
+再次运行时跳过已生成且单词未变化的条目。需要 api_config.py 中的 MINIMAX_API_KEY。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
+sys.path.insert(0, _REPO_ROOT)
+
+import server  # noqa: E402
+
+ARTIFACT_VERSION = 1
+
+
+def iter_words(words_path, book_id=None):
+    """按词书 → 单元 → 单词的顺序产出 (单词 ID, 单词)"""
+    with open(words_path, 'r', encoding='utf-8') as f:
+        books = json.load(f)
+    for book in books:
+        if book_id and book.get('id') != book_id:
+            continue
+        for unit in book.get('units', []):
+            for word in unit.get('words', []):
+                text = (word.get('word') or '').replace('**', '').strip()
+                if word.get('id') and text:
+                    yield word['id'], text
+
+
+def load_artifact(path):
+    """读取已有输出（断点续跑）；文件不存在时返回空结构"""
+    if not os.path.exists(path):
+        return {'version': ARTIFACT_VERSION, 'entries': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data.setdefault('entries', {})
+    return data
+
+
+def save_artifact(path, data):
+    """原子写入：中途被中断也不会留下半个 JSON 文件"""
+    data['version'] = ARTIFACT_VERSION
+    data['model'] = server.MINIMAX_MODEL
+    data['generated_at'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def explain(word_id, word):
+    """经由 server.py 的上游调用（连接池 + 连接重试）生成一条讲解"""
+    question = server.word_question(word)
+    answer = server.extract_chat_answer(server.call_minimax_api(question))
+    return {'word': word, 'question': question, 'answer': answer}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='预生成单词讲解（data/words.json → data/word-explanations.json）')
+    parser.add_argument('--words', default=os.path.join(_REPO_ROOT, 'data', 'words.json'), help='单词数据文件')
+    parser.add_argument('--output', default=server.WORD_EXPLANATIONS_PATH, help='输出文件')
+    parser.add_argument('--concurrency', type=int, default=4, help='同时进行的 API 请求数')
+    parser.add_argument('--checkpoint-every', type=int, default=20, help='每完成多少个单词写一次输出文件')
+    parser.add_argument('--book', help='只处理指定词书 ID（如 grade5-upper）')
+    parser.add_argument('--limit', type=int, default=0, help='本次最多生成多少个单词（0 表示不限）')
+    parser.add_argument('--force', action='store_true', help='忽略已有结果，全部重新生成')
+    args = parser.parse_args()
+
+    if not server.API_KEY:
+        print('❌ 未配置 MINIMAX_API_KEY（api_config.py 或环境变量）')
+        sys.exit(1)
+
+    words = list(iter_words(args.words, args.book))
+    data = load_artifact(args.output)
+    entries = data['entries']
+    # 词书中已删除的单词不再保留（只处理单个词书时保留其他词书的条目）
+    if not args.book:
+        current = {word_id for word_id, _ in words}
+        for word_id in [k for k in entries if k not in current]:
+            del entries[word_id]
+
+    pending = [
+        (word_id, word) for word_id, word in words
+        if args.force or entries.get(word_id, {}).get('word') != word or not entries[word_id].get('answer')
+    ]
+    if args.limit:
+        pending = pending[:args.limit]
+
+    print(f'📖 单词 {len(words)} 个，已生成 {len(words) - len(pending)} 个，本次生成 {len(pending)} 个')
+    print(f'📁 输出文件: {args.output}')
+
+    done = 0
+    failed = []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(explain, word_id, word): (word_id, word) for word_id, word in pending}
+        try:
+            for future in as_completed(futures):
+                word_id, word = futures[future]
+                try:
+                    entries[word_id] = future.result()
+                    done += 1
+                    print(f'   ✓ [{done}/{len(pending)}] {word_id} {word}')
+                except Exception as e:
+                    failed.append(word_id)
+                    print(f'   ✗ {word_id} {word}: {e}')
+                if done and done % args.checkpoint_every == 0:
+                    save_artifact(args.output, data)
+        except KeyboardInterrupt:
+            print('\n⏹ 已中断，保存已完成的结果...')
+            for future in futures:
+                future.cancel()
+            save_artifact(args.output, data)
+            sys.exit(130)
+
+    save_artifact(args.output, data)
+    print(f'\n✅ 完成 {done} 个，失败 {len(failed)} 个，用时 {time.time() - start:.1f}s；共 {len(entries)} 条讲解')
+    if failed:
+        print('⚠️ 失败的单词可直接重新运行本脚本补齐：' + ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
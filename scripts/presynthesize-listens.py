@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+听书章节预合成工具
+为 data/listen.json 中每个章节 × api_config.py 中每个已配置的复刻语音（MINIMAX_VOICE_CLONE_VOICES）
+调用 MiniMax 音色复刻合成音频，保存到 VOICE_PRESYNTH_DIR（默认 CACHE_DIR/presynth/）并写入 manifest.json；
+server.py 收到相同语音 + 文本的 /api/voice-clone 请求时直接返回该文件，播放变成一次静态文件下载。
+运行方式（在仓库根目录）：python3 scripts/presynthesize-listens.py [--concurrency N] [--file-id ID] [--limit N] [--force]
+
+超过 10,000 字符的章节按段落 / 句子切分后逐段合成，再按顺序拼接为一个 MP3 文件。
+每完成一个章节就更新一次清单，中断后重新运行会跳过已完成的章节。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.normpath(os.path.join(_SCRIPT_DIR, '..'))
+sys.path.insert(0, _REPO_ROOT)
+
+import server  # noqa: E402
+
+MANIFEST_VERSION = 1
+
+
+def iter_chapters(listen_path):
+    """按 词书 → 篇目 → 章节 的顺序产出章节信息（文本与前端请求时一样去掉首尾空白）"""
+    with open(listen_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for book in data.get('books', []):
+        for speech in book.get('speeches', []):
+            for index, chapter in enumerate(speech.get('chapters', []), 1):
+                text = (chapter.get('content') or '').strip()
+                if text:
+                    yield {
+                        'book': book.get('name', ''),
+                        'speech_id': speech.get('id', ''),
+                        'chapter': index,
+                        'title': chapter.get('title', ''),
+                        'text': text,
+                    }
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'entries': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data.setdefault('entries', {})
+    return data
+
+
+def save_manifest(path, data):
+    """原子写入，server.py 读到的总是完整的清单"""
+    data['version'] = MANIFEST_VERSION
+    data['model'] = server.VOICE_CLONE_MODEL
+    data['generated_at'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def with_retries(func, retries, backoff):
+    """失败后按 backoff × 2^n 秒退避重试（音色复刻接口自身的连接重试之外再加一层）"""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f'   ↻ {e}，{delay:.0f}s 后重试（{attempt + 1}/{retries}）')
+            time.sleep(delay)
+
+
+def synthesize_segment(file_id, text, description):
+    """合成一段文本并下载音频内容，返回 (bytes, 扩展名)"""
+    result = server.call_voice_clone_api(file_id, text, description)
+    source_url = result.get('demo_audio') or server.voice_clone_audio_url(result)
+    response = server.get_upstream_session().get(source_url, timeout=60)
+    response.raise_for_status()
+    return response.content, server.AudioCache.extension_of(source_url)
+
+
+def synthesize_chapter(store, job, args):
+    """合成一个章节（必要时分段），写入预合成目录，返回清单条目"""
+    voice, chapter = job['voice'], job['chapter']
+    segments = server.split_voice_clone_text(chapter['text'])
+    ext = None
+    with store.writer(job['key'], '.mp3') as write:
+        for i, segment in enumerate(segments):
+            data, ext = with_retries(
+                lambda: synthesize_segment(voice['file_id'], segment, voice.get('description', '未知')),
+                args.retries, args.backoff
+            )
+            if len(segments) > 1 and ext != '.mp3':
+                raise Exception(f'分段合成只支持拼接 MP3，上游返回了 {ext}')
+            write(data if i == 0 else server.strip_id3v2(data))
+    if ext != '.mp3':
+        # 单段非 MP3 音频：按实际格式改名
+        os.replace(os.path.join(store.directory, job['key'] + '.mp3'), os.path.join(store.directory, job['key'] + ext))
+    name = job['key'] + ext
+    return {
+        'file': name,
+        'bytes': os.path.getsize(os.path.join(store.directory, name)),
+        'file_id': voice['file_id'],
+        'voice': voice.get('description', ''),
+        'book': chapter['book'],
+        'speech_id': chapter['speech_id'],
+        'chapter': chapter['chapter'],
+        'title': chapter['title'],
+        'chars': len(chapter['text']),
+        'segments': len(segments),
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='预合成听书章节音频（data/listen.json × 已配置的复刻语音）')
+    parser.add_argument('--listen', default=os.path.join(_REPO_ROOT, 'data', 'listen.json'), help='听书数据文件')
+    parser.add_argument('--output-dir', default=server.VOICE_PRESYNTH_DIR, help='音频与 manifest.json 的输出目录')
+    parser.add_argument('--concurrency', type=int, default=2, help='同时合成的章节数')
+    parser.add_argument('--retries', type=int, default=3, help='每段合成失败后的重试次数')
+    parser.add_argument('--backoff', type=float, default=2.0, help='首次重试前等待的秒数（之后每次翻倍）')
+    parser.add_argument('--file-id', type=int, help='只合成指定 file_id 的语音')
+    parser.add_argument('--limit', type=int, default=0, help='本次最多合成多少个章节（0 表示不限）')
+    parser.add_argument('--force', action='store_true', help='忽略已有结果，全部重新合成')
+    args = parser.parse_args()
+
+    if not server.API_KEY:
+        print('❌ 未配置 MINIMAX_API_KEY（api_config.py 或环境变量）')
+        sys.exit(1)
+    voices = [v for v in server.configured_voice_clone_voices() if args.file_id in (None, v['file_id'])]
+    if not voices:
+        print('❌ 没有可用的复刻语音（检查 MINIMAX_VOICE_CLONE_VOICES 或 --file-id）')
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    store = server.AudioCache(args.output_dir)
+    manifest_path = os.path.join(args.output_dir, 'manifest.json')
+    manifest = load_manifest(manifest_path)
+    entries = manifest['entries']
+
+    chapters = list(iter_chapters(args.listen))
+    jobs = []
+    for chapter in chapters:
+        for voice in voices:
+            key = server.AudioCache.make_key(voice['file_id'], chapter['text'])
+            entry = entries.get(key)
+            if not args.force and entry and os.path.exists(os.path.join(args.output_dir, entry['file'])):
+                continue
+            jobs.append({'key': key, 'voice': voice, 'chapter': chapter})
+    total = len(chapters) * len(voices)
+    if args.limit:
+        jobs = jobs[:args.limit]
+
+    print(f'🎧 章节 {len(chapters)} 个 × 语音 {len(voices)} 个，已完成 {total - len(jobs)} 个，本次合成 {len(jobs)} 个')
+    print(f'📁 输出目录: {args.output_dir}')
+
+    done = 0
+    failed = []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(synthesize_chapter, store, job, args): job for job in jobs}
+        try:
+            for future in as_completed(futures):
+                job = futures[future]
+                label = f"{job['chapter']['speech_id']} 第 {job['chapter']['chapter']} 章 [{job['voice'].get('description', '')}]"
+                try:
+                    entries[job['key']] = future.result()
+                    done += 1
+                    save_manifest(manifest_path, manifest)
+                    print(f'   ✓ [{done}/{len(jobs)}] {label}')
+                except Exception as e:
+                    failed.append(label)
+                    print(f'   ✗ {label}: {e}')
+        except KeyboardInterrupt:
+            print('\n⏹ 已中断，等待进行中的章节完成后退出...')
+            for future in futures:
+                future.cancel()
+            save_manifest(manifest_path, manifest)
+            sys.exit(130)
+
+    save_manifest(manifest_path, manifest)
+    print(f'\n✅ 完成 {done} 个，失败 {len(failed)} 个，用时 {time.time() - start:.1f}s；清单共 {len(entries)} 条')
+    if failed:
+        print('⚠️ 失败的章节可直接重新运行本脚本补齐')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阅读 / 听书全文检索索引（只依赖标准库）
+
+scripts/build-data.py 在构建 readings.json、listen.json 后调用 build_index() 生成 data/search-index.bin；
+server.py 的 /api/search 用 open_index() 以 mmap 只读打开，多个 worker 共享同一份页缓存。
+
+检索单位（段落）：
+  - 阅读：每条重点句型（pattern + meaning）、每句对话（speaker: content + contentCn）
+  - 听书：每个章节按空行 / 换行切成的段落
+分词：英文按 [a-z0-9]+ 小写切词；中文取连续汉字的单字与相邻两字（bigram），查询时两字以上只用 bigram。
+排序：BM25（k1=1.2, b=0.75），每个 (词项, 段落) 的得分在构建时算好，查询只需累加。
+
+文件格式（小端）：
+  头部      MAGIC, 词项数, 段落数, 各区段起始偏移
+  词项表    每个词项 (词项偏移, 词项字节数, 倒排起点, 文档频率)，按词项 UTF-8 字节排序
+  词项串    所有词项的 UTF-8 拼接
+  倒排      段落编号 u32 数组 + 对应得分 f32 数组
+  段落表    每段 JSON 的起始偏移 u32（共 段落数 + 1 个）、来源 u8
+  段落      每段一个 JSON：source, id, title, ..., text
+"""
+
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+MAGIC = b'EWSIDX1\x00'
+HEADER = struct.Struct('<8sII7Q')
+TERM_ENTRY = struct.Struct('<IIII')
+
+SOURCES = ('reading', 'listen')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 摘要最多包含的字符数；命中位置之前保留约三分之一
+SNIPPET_CHARS = 120
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_HAN_RUN_RE = re.compile(r'[\u3400-\u9fff]+')
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n+')
+
+
+# ---------------------------------------------------------------------------
+# 分词
+# ---------------------------------------------------------------------------
+
+def tokenize(text: str) -> List[str]:
+    """段落分词：英文词 + 每个汉字 + 相邻两字"""
+    terms = _WORD_RE.findall(text.lower())
+    for run in _HAN_RUN_RE.findall(text):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """查询分词（去重、保持顺序）：英文词；两字以上的汉字串只取 bigram，单字取单字"""
+    terms = _WORD_RE.findall(query.lower())
+    for run in _HAN_RUN_RE.findall(query):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return list(dict.fromkeys(terms))
+
+
+# ---------------------------------------------------------------------------
+# 构建
+# ---------------------------------------------------------------------------
+
+def collect_passages(readings: Dict, listens: Dict) -> List[Dict]:
+    """从 readings.json、listen.json 的内容中取出全部检索段落"""
+    passages = []
+    for reading in readings.get('readings', []):
+        base = {
+            'source': 'reading',
+            'id': reading.get('id'),
+            'title': reading.get('title'),
+            'titleCn': reading.get('titleCn'),
+            'unit': reading.get('unitName'),
+        }
+        for index, item in enumerate(reading.get('keySentencePatterns', [])):
+            text = f"{item.get('pattern', '')} {item.get('meaning', '')}".strip()
+            passages.append({**base, 'kind': 'pattern', 'index': index, 'text': text})
+        for index, line in enumerate(reading.get('dialogues', [])):
+            text = f"{line.get('speaker', '')}: {line.get('content', '')}\n{line.get('contentCn', '')}".strip()
+            passages.append({**base, 'kind': 'dialogue', 'index': index, 'text': text})
+    for book in listens.get('books', []):
+        for speech in book.get('speeches', []):
+            for chapter_index, chapter in enumerate(speech.get('chapters', [])):
+                paragraphs = [p.strip() for p in _PARAGRAPH_SPLIT_RE.split(chapter.get('content', ''))]
+                for index, paragraph in enumerate(p for p in paragraphs if p):
+                    passages.append({
+                        'source': 'listen',
+                        'id': speech.get('id'),
+                        'title': speech.get('title'),
+                        'chapter': chapter.get('title'),
+                        'chapterIndex': chapter_index,
+                        'kind': 'paragraph',
+                        'index': index,
+                        'text': paragraph,
+                    })
+    return passages
+
+
+def _align(data: bytearray, boundary: int = 4):
+    data.extend(b'\x00' * (-len(data) % boundary))
+
+
+def _le(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def build_index(passages: List[Dict]) -> bytes:
+    """生成索引文件内容（相同输入得到相同字节，便于“内容不变不重写”）"""
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = []
+    for doc, passage in enumerate(passages):
+        counts: Dict[str, int] = {}
+        for term in tokenize(passage['text']):
+            counts[term] = counts.get(term, 0) + 1
+        # 段落长度按英文词数 + 汉字数计（不重复计算 bigram）
+        lengths.append(sum(n for term, n in counts.items() if len(term) != 2 or not _HAN_RUN_RE.fullmatch(term)))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    n_docs = len(passages)
+    avgdl = (sum(lengths) / n_docs) if n_docs else 1.0
+    terms = sorted(postings, key=lambda t: t.encode('utf-8'))
+
+    term_table = bytearray()
+    term_blob = bytearray()
+    post_docs = array('I')
+    post_weights = array('f')
+    for term in terms:
+        entries = postings[term]
+        encoded = term.encode('utf-8')
+        term_table += TERM_ENTRY.pack(len(term_blob), len(encoded), len(post_docs), len(entries))
+        term_blob += encoded
+        idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+        for doc, tf in entries:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avgdl)
+            post_docs.append(doc)
+            post_weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+
+    doc_offsets = array('I')
+    doc_blob = bytearray()
+    for passage in passages:
+        doc_offsets.append(len(doc_blob))
+        doc_blob += json.dumps(passage, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    doc_offsets.append(len(doc_blob))
+    doc_sources = bytes(SOURCES.index(passage['source']) for passage in passages)
+
+    body = bytearray(HEADER.size)
+    offsets = []
+    for section in (term_table, term_blob, _le(post_docs), _le(post_weights), _le(doc_offsets), doc_sources, doc_blob):
+        _align(body)
+        offsets.append(len(body))
+        body += section
+    HEADER.pack_into(body, 0, MAGIC, len(terms), n_docs, *offsets)
+    return bytes(body)
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+class PassageIndex:
+    """search-index.bin 的只读视图：buffer 为 mmap 或 bytes，查询时只解码命中的段落"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        if len(buffer) < HEADER.size:
+            raise ValueError('索引文件不完整')
+        (magic, self.n_terms, self.n_docs, self.term_table_off, self.term_blob_off, post_docs_off,
+         post_weights_off, doc_offsets_off, doc_sources_off, self.doc_blob_off) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('不是检索索引文件或版本不符')
+        if self.doc_blob_off > len(buffer):
+            raise ValueError('索引文件不完整')
+        view = memoryview(buffer)
+        n_postings = (post_weights_off - post_docs_off) // 4
+        self.post_docs = self._array(view, 'I', post_docs_off, n_postings)
+        self.post_weights = self._array(view, 'f', post_weights_off, n_postings)
+        self.doc_offsets = self._array(view, 'I', doc_offsets_off, self.n_docs + 1)
+        self.doc_sources = view[doc_sources_off:doc_sources_off + self.n_docs]
+
+    @staticmethod
+    def _array(view, typecode, offset, count):
+        """零拷贝的类型化视图（大端机器上复制并转换字节序）"""
+        values = view[offset:offset + count * 4].cast(typecode)
+        if sys.byteorder == 'big':
+            values = array(typecode, values)
+            values.byteswap()
+        return values
+
+    def __len__(self):
+        return self.n_docs
+
+    def _term(self, i):
+        offset, length, start, df = TERM_ENTRY.unpack_from(self.buffer, self.term_table_off + i * TERM_ENTRY.size)
+        begin = self.term_blob_off + offset
+        return bytes(self.buffer[begin:begin + length]), start, df
+
+    def lookup(self, term: str):
+        """二分查找词项，返回 (倒排起点, 文档频率) 或 None"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate, start, df = self._term(mid)
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return start, df
+        return None
+
+    def passage(self, doc: int) -> Dict:
+        start = self.doc_blob_off + self.doc_offsets[doc]
+        end = self.doc_blob_off + self.doc_offsets[doc + 1]
+        return json.loads(bytes(self.buffer[start:end]).decode('utf-8'))
+
+    def search(self, query: str, offset: int = 0, limit: int = 10, source: str = None):
+        """返回 (命中段落总数, 当前页结果)；结果按 BM25 得分降序，得分相同按段落顺序"""
+        terms = query_terms(query)
+        source_id = SOURCES.index(source) if source is not None else None
+        scores: Dict[int, float] = {}
+        for term in terms:
+            found = self.lookup(term)
+            if found is None:
+                continue
+            start, df = found
+            get = scores.get
+            for doc, weight in zip(self.post_docs[start:start + df], self.post_weights[start:start + df]):
+                scores[doc] = get(doc, 0.0) + weight
+        if source_id is not None:
+            scores = {doc: score for doc, score in scores.items() if self.doc_sources[doc] == source_id}
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -item[0]))[offset:]
+        results = []
+        for doc, score in top:
+            passage = self.passage(doc)
+            snippet, highlights = make_snippet(passage.pop('text'), terms)
+            results.append({**passage, 'score': round(score, 4), 'snippet': snippet, 'highlights': highlights})
+        return len(scores), results
+
+
+def _term_pattern(term: str):
+    if _WORD_RE.fullmatch(term):
+        return re.compile(rf'(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])', re.IGNORECASE)
+    return re.compile(re.escape(term))
+
+
+def make_snippet(text: str, terms: Iterable[str]) -> Tuple[str, List[List[int]]]:
+    """截取第一个命中附近的一段文本，返回 (摘要, 命中区间列表 [[start, end], ...])，区间相对摘要"""
+    spans = sorted(m.span() for term in terms for m in _term_pattern(term).finditer(text))
+    merged: List[List[int]] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    begin, end = 0, len(text)
+    if len(text) > SNIPPET_CHARS:
+        first = merged[0][0] if merged else 0
+        begin = max(0, min(first - SNIPPET_CHARS // 3, len(text) - SNIPPET_CHARS))
+        end = begin + SNIPPET_CHARS
+    prefix = '…' if begin > 0 else ''
+    snippet = prefix + text[begin:end] + ('…' if end < len(text) else '')
+    shift = len(prefix) - begin
+    highlights = [
+        [max(start, begin) + shift, min(stop, end) + shift]
+        for start, stop in merged if stop > begin and start < end
+    ]
+    return snippet, highlights
+
+
+def open_index(path: str) -> PassageIndex:
+    """以 mmap 只读打开索引文件（文件为空或格式不符时抛出 ValueError）"""
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError('索引文件为空')
+    try:
+        return PassageIndex(buffer)
+    except struct.error as e:
+        raise ValueError(f'索引文件损坏: {e}')
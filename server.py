@@ -44,19 +44,176 @@ except ImportError:
         'requests_per_minute': 0,
     }
 
+# 可选配置（新增配置项缺失时不影响上面的核心配置导入）
+try:
+    import api_config as _api_config
+except ImportError:
+    _api_config = None
+
+def _optional_config(name, default):
+    """读取可选配置：优先 api_config.py，其次同名环境变量，最后使用默认值"""
+    if _api_config is not None and hasattr(_api_config, name):
+        return getattr(_api_config, name)
+    return os.environ.get(name, default)
+
+
+def _optional_dict_config(name):
+    """读取字典类型的可选配置（未配置时为 {}）：环境变量中的值按 JSON 对象解析"""
+    value = _optional_config(name, {})
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            raise ValueError(f'配置 {name} 不是合法的 JSON: {e}') from None
+    if not isinstance(value, dict):
+        raise ValueError(f'配置 {name} 应为字典（环境变量中为 JSON 对象）')
+    return value
+
+import re
 import json
+import gzip
 import time
+import random
+import asyncio
+import uuid
+import socket
+import sqlite3
 import logging
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory, make_response
+import hashlib
+import hmac
+import mimetypes
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from itertools import islice
+from datetime import datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, make_response, redirect, abort
 from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 import requests
+from werkzeug.security import safe_join
+
+import search_index
+
+try:
+    import brotli  # 可选：安装后静态文件额外提供 br 压缩版本
+except ImportError:
+    brotli = None
 
 # ========== 服务器配置 ==========
 
 HOST = '0.0.0.0'
 PORT = int(os.environ.get('PORT', '8082'))
 
+# 运行时数据目录（速率限制、问答缓存、音频等共享状态文件）。默认放在仓库（静态文件根目录）之外，
+# 避免这些文件能通过静态文件路由下载
+CACHE_DIR = _optional_config('CACHE_DIR', os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'english-ai-assistant'))
+
+# 速率限制存储后端：'memory'（每个 worker 独立）、'sqlite'（多 worker 共享文件）、'redis'
+RATE_LIMIT_BACKEND = _optional_config('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_SQLITE_PATH = _optional_config('RATE_LIMIT_SQLITE_PATH', os.path.join(CACHE_DIR, 'rate_limit.sqlite3'))
+RATE_LIMIT_REDIS_URL = _optional_config('RATE_LIMIT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+# GET /api/status/details（各组件计数、数据文件路径等诊断信息）的访问令牌，未设置时该接口关闭（404）
+STATUS_DETAILS_TOKEN = _optional_config('STATUS_DETAILS_TOKEN', None)
+# MiniMax 音色复刻接口地址
+MINIMAX_VOICE_CLONE_URL = _optional_config('MINIMAX_VOICE_CLONE_URL', 'https://api.minimaxi.com/v1/voice_clone')
+# 每个 worker 到上游的最大保持连接数
+UPSTREAM_POOL_SIZE = int(_optional_config('UPSTREAM_POOL_SIZE', 16))
+
+# 上游调用策略（重试次数、单次超时、整体截止时间、退避、对冲），见 UpstreamPolicy；未写的键使用默认值
+UPSTREAM_POLICY = _optional_dict_config('UPSTREAM_POLICY')
+
+# 上游熔断：滚动窗口内失败（含接近超时的慢调用）比例过高时暂停调用 MiniMax，直接返回 503
+CIRCUIT_BREAKER = {
+    'enabled': True,
+    'window_seconds': 60,       # 统计窗口
+    'min_calls': 6,             # 窗口内至少这么多次调用才判断
+    'failure_ratio': 0.5,       # 失败 + 慢调用占比达到该值时熔断
+    'slow_fraction': 0.8,       # 成功但耗时超过单次超时 × 该比例的调用计为慢调用
+    'open_seconds': 30,         # 熔断持续时间，之后放行一个探测请求（半开）
+    'sync_seconds': 1.0,        # 每个 worker 写入计数、读取共享状态的最短间隔
+    'path': os.path.join(CACHE_DIR, 'upstream_health.sqlite3'),
+    **_optional_dict_config('CIRCUIT_BREAKER'),
+}
+
+# 内存后端最多记录的客户端 IP 数（超出时淘汰最久未访问的 IP）
+RATE_LIMIT_MAX_CLIENTS = int(_optional_config('RATE_LIMIT_MAX_CLIENTS', 10000))
+
+# 预生成的单词讲解（scripts/precompute-word-explanations.py 生成；文件不存在时直接调用 API）
+WORD_EXPLANATIONS_PATH = _optional_config(
+    'WORD_EXPLANATIONS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'word-explanations.json')
+)
+
+# 单词数据（scripts/convert-words.js 或 build-data.py 生成），/api/words 在每个 worker 中为它建立查询索引
+WORDS_DATA_PATH = _optional_config(
+    'WORDS_DATA_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'words.json')
+)
+
+# 阅读 / 听书全文检索索引（scripts/build-data.py 生成），/api/search 在每个 worker 中以 mmap 只读打开
+SEARCH_INDEX_PATH = _optional_config(
+    'SEARCH_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'search-index.bin')
+)
+
+# AI 问答缓存：相同问题（规范化后）+ 模型 + 联网开关直接返回已有回答
+CHAT_CACHE = {
+    'enabled': True,
+    'ttl_seconds': 7 * 24 * 3600,
+    'max_entries': 2000,        # 每个 worker 的内存 LRU 条数
+    'disk': True,               # 是否启用所有 worker 共享的磁盘层（CACHE_DIR/chat_cache.sqlite3）
+    'max_disk_entries': 50000,
+    **_optional_dict_config('CHAT_CACHE'),
+}
+
+# 音色复刻音频缓存：相同 (file_id, 模型, 文本) 只合成一次，音频下载到本地后由本站提供
+VOICE_AUDIO_CACHE = {
+    'enabled': True,
+    'dir': os.path.join(CACHE_DIR, 'audio'),
+    'max_bytes': 1024 * 1024 * 1024,   # 超出时淘汰最久未播放的音频
+    **_optional_dict_config('VOICE_AUDIO_CACHE'),
+}
+
+# 听书章节预合成音频目录（scripts/presynthesize-listens.py 生成，含 manifest.json；不参与缓存淘汰）
+VOICE_PRESYNTH_DIR = _optional_config('VOICE_PRESYNTH_DIR', os.path.join(CACHE_DIR, 'presynth'))
+
+# 音色复刻异步任务（POST /api/voice-clone/jobs）：每个 worker 的合成线程数、全站排队上限、每个 IP 同时进行的任务数
+VOICE_JOBS = {
+    'enabled': True,
+    'workers': 2,
+    'max_queue': 50,
+    'per_ip': 2,
+    'ttl_seconds': 3600,        # 完成的任务状态保留多久
+    **_optional_dict_config('VOICE_JOBS'),
+}
+
+# 静态文件：内容哈希 ETag + 预压缩版本（gzip，安装 brotli 时还有 br），压缩结果保存在 dir 中
+STATIC_ASSETS = {
+    'precompress': True,
+    'dir': os.path.join(CACHE_DIR, 'static'),
+    'min_bytes': 1024,          # 小于该大小的文件不压缩
+    'check_seconds': 1.0,       # 同一文件两次检查 mtime 的最短间隔
+    'memory_max_bytes': 64 * 1024 * 1024,   # 每个 worker 内存中缓存的文件内容总量（含压缩版本）
+    'memory_file_max': 256 * 1024,          # 超过该大小的内容不进内存，交给 wsgi.file_wrapper（sendfile）
+    **_optional_dict_config('STATIC_ASSETS'),
+}
+
+# 超过单次合成上限（10,000 字符）的文本：按句子切成 chunk_chars 字符的片段并行合成，按顺序流式返回
+VOICE_CHUNKED = {
+    'enabled': True,
+    'chunk_chars': 2000,        # 片段越短，第一段音频越快开始播放
+    'concurrency': 3,           # 每个 worker 同时合成的片段数
+    'max_chars': 100000,        # 分段合成允许的最长文本
+    **_optional_dict_config('VOICE_CHUNKED'),
+}
+
 # ========== Flask 应用 ==========
 
 app = Flask(__name__)
@@ -68,260 +225,2994 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 内存中的请求记录（生产环境建议用 Redis）
-request_history = {}
+# ========== 通用组件 ==========
 
-# ========== 辅助函数 ==========
+def _approx_size(obj):
+    """粗略估算对象占用的字节数（递归统计容器内容）"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, deque, set)):
+        size += sum(_approx_size(v) for v in obj)
+    return size
 
-def check_rate_limit(client_ip):
-    """检查速率限制"""
-    now = datetime.now()
-    
-    if client_ip not in request_history:
-        request_history[client_ip] = {
-            'hourly': [],     # 每小时请求记录
-            'daily': [],      # 每日请求记录
-            'minute': [],     # 每分钟请求记录
+
+class BoundedTTLStore:
+    """有容量上限的 LRU + TTL 键值存储（非线程安全，由调用方加锁）
+
+    条目按最近访问顺序排列：超出 max_entries 时淘汰最久未访问的条目；
+    每次写入顺带从最旧一端清理最多 SWEEP_BATCH 条过期条目（摊还清理，无需后台线程）。
+    """
+
+    SWEEP_BATCH = 8
+    # stats() 估算字节数时抽样的条目数（只看最近访问的条目，开销与条目总数无关）
+    SIZE_SAMPLE = 32
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data = OrderedDict()   # key -> (expires_at, value)
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, now):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= now:
+            del self.data[key]
+            self.expirations += 1
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key, value, now, ttl=None):
+        self.data[key] = (now + (self.ttl if ttl is None else ttl), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_entries:
+            self.data.popitem(last=False)
+            self.evictions += 1
+        self.sweep(now)
+
+    def pop(self, key, default=None):
+        item = self.data.pop(key, None)
+        return default if item is None else item[1]
+
+    def sweep(self, now, limit=None):
+        """从最久未访问的一端清理过期条目，遇到未过期条目即停止"""
+        for _ in range(limit or self.SWEEP_BATCH):
+            if not self.data:
+                break
+            key, (expires_at, _value) = next(iter(self.data.items()))
+            if expires_at > now:
+                break
+            del self.data[key]
+            self.expirations += 1
+
+    def stats(self):
+        """entries 含尚未清理的过期条目；bytes 按抽样条目的平均大小估算"""
+        sample = list(islice(reversed(self.data.items()), self.SIZE_SAMPLE))
+        per_entry = sum(_approx_size(k) + _approx_size(v) for k, v in sample) / len(sample) if sample else 0
+        return {
+            'entries': len(self.data),
+            'max_entries': self.max_entries,
+            'bytes': sys.getsizeof(self.data) + int(per_entry * len(self.data)),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
         }
-    
-    # 清理过期记录
-    hourly_cutoff = now - timedelta(hours=1)
-    daily_cutoff = now - timedelta(days=1)
-    minute_cutoff = now - timedelta(minutes=1)
-    
-    # 清理每小时记录
-    request_history[client_ip]['hourly'] = [
-        t for t in request_history[client_ip]['hourly'] 
-        if datetime.fromtimestamp(t) > hourly_cutoff
-    ]
-    
-    # 清理每日记录
-    if RATE_LIMIT.get('requests_per_day', 0) > 0:
-        request_history[client_ip]['daily'] = [
-            t for t in request_history[client_ip]['daily'] 
-            if datetime.fromtimestamp(t) > daily_cutoff
-        ]
-    
-    # 清理每分钟记录
-    if RATE_LIMIT.get('requests_per_minute', 0) > 0:
-        request_history[client_ip]['minute'] = [
-            t for t in request_history[client_ip]['minute'] 
-            if datetime.fromtimestamp(t) > minute_cutoff
+
+
+class _FlightCall:
+    """SingleFlight 中一次进行中的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并并发的相同调用：同一个 key 同时只有一个调用方（leader）真正执行，其余调用方等待并共享结果
+
+    begin() / finish() 供流式等无法包成单个函数的场景使用，普通场景用 do()。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def begin(self, key):
+        """返回 (call, is_leader)；非 leader 应等待 call.event 后读取 call.result / call.error"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self.calls[key] = _FlightCall()
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        call.result, call.error = result, error
+        with self.lock:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+        call.event.set()
+
+    def do(self, key, func, timeout=None):
+        call, leader = self.begin(key)
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError('等待相同请求的结果超时')
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            result = func()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
+
+
+class SharedSQLite:
+    """多个 Gunicorn worker 共享的 SQLite 文件（WAL 模式，读写互不阻塞）
+
+    sqlite3 连接不能跨进程或线程复用：按 (进程号, 线程) 惰性创建。
+    """
+
+    def __init__(self, path, schema=()):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self.connect()
+        for statement in schema:
+            conn.execute(statement)
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE 取得写锁，块内的“读 + 写”对所有 worker 互斥"""
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+class JsonArtifact:
+    """离线脚本生成的 JSON 文件的只读视图：首次使用时加载，之后每 RELOAD_CHECK_SECONDS 秒
+
+    检查一次修改时间，重新生成后无需重启服务。子类实现 build(data) 返回查询用的索引；
+    非 JSON 文件可覆盖 load()。
+    """
+
+    RELOAD_CHECK_SECONDS = 30
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.index = {}
+        self.data = {}
+        self.mtime = None
+        self.checked_at = None
+        self.hits = 0
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def build(self, data):
+        raise NotImplementedError
+
+    def _maybe_reload(self, now):
+        if self.checked_at is not None and now - self.checked_at < self.RELOAD_CHECK_SECONDS:
+            return
+        self.checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.index, self.data, self.mtime = {}, {}, None
+            return
+        if mtime == self.mtime:
+            return
+        try:
+            data = self.load()
+            index = self.build(data)
+        except (OSError, ValueError, AttributeError, KeyError) as e:
+            logger.error(f"加载失败: {self.path}: {e}")
+            return
+        self.index, self.data, self.mtime = index, data, mtime
+        logger.info(f"已加载 {len(index)} 条: {self.path}")
+
+    def _get(self, key):
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            value = self.index.get(key)
+            if value is not None:
+                self.hits += 1
+            return value
+
+    def stats(self):
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            return {
+                'path': os.path.relpath(self.path, os.path.dirname(os.path.abspath(__file__))),
+                'entries': len(self.index),
+                'model': self.data.get('model'),
+                'hits': self.hits,
+            }
+
+
+# ========== 速率限制 ==========
+
+# 检查顺序与提示文案：(窗口名, 窗口秒数, RATE_LIMIT 配置键)
+RATE_LIMIT_WINDOWS = [
+    ('hourly', 3600, 'requests_per_hour'),
+    ('daily', 86400, 'requests_per_day'),
+    ('minute', 60, 'requests_per_minute'),
+]
+
+
+class RateLimitBackend:
+    """速率限制存储后端基类
+
+    hit() 必须原子地完成“检查所有窗口 + 记录本次请求”，
+    返回 (allowed, reason, reset_at)：reason 为窗口名或 'cooldown'，reset_at 为可重试的时间戳。
+    """
+
+    name = 'base'
+
+    def hit(self, key, now, windows, cooldown):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """进程内存后端（每个 Gunicorn worker 各自计数）
+
+    每个窗口是容量等于限额的环形缓冲区 deque(maxlen=limit)：缓冲区满时只需比较最旧的一条，
+    判定和记录都是 O(1)，与历史长度无关。时间戳用 time.monotonic()，不受系统改时影响。
+    客户端记录存放在 BoundedTTLStore 中：空闲超过最长窗口的 IP 已无状态可言，会被自动清理，
+    IP 总数也不超过 max_clients，长时间运行的 worker 内存保持平稳。
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_clients=10000):
+        self.history = BoundedTTLStore(max_clients, ttl=86400)
+        self.lock = threading.Lock()
+
+    def hit(self, key, now, windows, cooldown):
+        mono = time.monotonic()
+        horizon = max([seconds for _w, seconds, _l in windows] + [cooldown])
+        with self.lock:
+            record = self.history.get(key, mono)
+            if record is None:
+                record = {'last': None}
+            # 每次访问都续期：条目在最后一次请求后 horizon 秒过期
+            self.history.set(key, record, mono, ttl=horizon)
+            for window, seconds, limit in windows:
+                ring = record.get(window)
+                if ring is None or ring.maxlen != limit:
+                    # 首次使用或限额被修改：按新容量重建，保留最近的记录
+                    ring = record[window] = deque(ring or (), maxlen=limit)
+                if len(ring) == limit and mono - ring[0] < seconds:
+                    return False, window, now + (ring[0] + seconds - mono)
+            last = record['last']
+            if cooldown > 0 and last is not None and mono - last < cooldown:
+                return False, 'cooldown', now + (last + cooldown - mono)
+            for window, _seconds, _limit in windows:
+                record[window].append(mono)
+            record['last'] = mono
+            return True, 'ok', None
+
+    def stats(self):
+        with self.lock:
+            stats = self.history.stats()
+        return {
+            'backend': self.name,
+            'clients': stats.pop('entries'),
+            'max_clients': stats.pop('max_entries'),
+            **stats,
+        }
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """SQLite（WAL 模式）共享文件后端，同一台机器上的所有 worker 共用计数"""
+
+    name = 'sqlite'
+
+    # 每处理这么多次请求（单个 worker 内），顺带删除所有客户端的过期记录
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.db = SharedSQLite(path, schema=(
+            'CREATE TABLE IF NOT EXISTS rate_events (client TEXT NOT NULL, ts REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS rate_events_client_ts ON rate_events (client, ts)',
+        ))
+
+    def hit(self, key, now, windows, cooldown):
+        horizon = max([seconds for _w, seconds, _l in windows] + [cooldown])
+        with self.db.transaction() as conn:
+            return self._hit_locked(conn, key, now, windows, cooldown, horizon)
+
+    def _hit_locked(self, conn, key, now, windows, cooldown, horizon):
+        self.hits += 1
+        if self.hits % self.SWEEP_EVERY == 0:
+            # 不再访问的 IP 不会触发按 client 的清理，这里定期全表清理
+            conn.execute('DELETE FROM rate_events WHERE ts <= ?', (now - horizon,))
+        conn.execute('DELETE FROM rate_events WHERE client = ? AND ts <= ?', (key, now - horizon))
+        for window, seconds, limit in windows:
+            count, oldest = conn.execute(
+                'SELECT COUNT(*), MIN(ts) FROM rate_events WHERE client = ? AND ts > ?',
+                (key, now - seconds)
+            ).fetchone()
+            if count >= limit:
+                return False, window, oldest + seconds
+        if cooldown > 0:
+            (last,) = conn.execute(
+                'SELECT MAX(ts) FROM rate_events WHERE client = ?', (key,)
+            ).fetchone()
+            if last is not None and now - last < cooldown:
+                return False, 'cooldown', last + cooldown
+        conn.execute('INSERT INTO rate_events (client, ts) VALUES (?, ?)', (key, now))
+        return True, 'ok', None
+
+    def stats(self):
+        clients, rows = self.db.connect().execute(
+            'SELECT COUNT(DISTINCT client), COUNT(*) FROM rate_events'
+        ).fetchone()
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'clients': clients,
+            'rows': rows,
+            'bytes': self.db.size(),
+        }
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Redis 协议后端（有序集合 + Lua 脚本保证原子性），适合多机部署
+
+    只依赖标准库 socket 实现最小的 RESP 客户端，任何兼容 Redis 协议的服务都可以使用。
+    """
+
+    name = 'redis'
+
+    SCRIPT = """
+local now = tonumber(ARGV[1])
+local cooldown = tonumber(ARGV[2])
+local horizon = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - horizon)
+for i = 5, #ARGV, 3 do
+    local seconds = tonumber(ARGV[i + 1])
+    local floor = '(' .. tostring(now - seconds)
+    if redis.call('ZCOUNT', KEYS[1], floor, '+inf') >= tonumber(ARGV[i + 2]) then
+        local oldest = redis.call('ZRANGEBYSCORE', KEYS[1], floor, '+inf', 'WITHSCORES', 'LIMIT', 0, 1)
+        return {0, ARGV[i], tostring(tonumber(oldest[2]) + seconds)}
+    end
+end
+if cooldown > 0 then
+    local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+    if last[2] and now - tonumber(last[2]) < cooldown then
+        return {0, 'cooldown', tostring(tonumber(last[2]) + cooldown)}
+    end
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(horizon))
+return {1, 'ok', ''}
+"""
+
+    def __init__(self, url, timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or '/0').lstrip('/') or 0)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile('rb'))
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+            if self.password:
+                self._execute('AUTH', self.password)
+            if self.db:
+                self._execute('SELECT', self.db)
+        return conn
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('Redis 连接已关闭')
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode()
+        if prefix == b'-':
+            raise RuntimeError(payload.decode())
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RuntimeError(f'无法解析的 Redis 响应: {line!r}')
+
+    def _execute(self, *args):
+        sock, reader = self._connection()
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        try:
+            sock.sendall(b''.join(parts))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            # 连接损坏时丢弃，下次请求重新建立
+            self.local.conn = None
+            raise
+
+    def hit(self, key, now, windows, cooldown):
+        horizon = max([seconds for _w, seconds, _l in windows] + [cooldown])
+        args = [now, cooldown, horizon, f'{now}-{uuid.uuid4().hex[:8]}']
+        for window, seconds, limit in windows:
+            args.extend([window, seconds, limit])
+        allowed, reason, reset_at = self._execute('EVAL', self.SCRIPT, 1, f'rate:{key}', *args)
+        return bool(allowed), reason, float(reset_at) if reset_at else None
+
+    def stats(self):
+        return {'backend': self.name, 'url': f'redis://{self.host}:{self.port}/{self.db}'}
+
+
+def create_rate_limit_backend(kind):
+    """按配置创建速率限制后端；共享后端不可用时退回进程内存后端"""
+    try:
+        if kind == 'sqlite':
+            return SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH)
+        if kind == 'redis':
+            return RedisRateLimitBackend(RATE_LIMIT_REDIS_URL)
+    except Exception as e:
+        logger.error(f"速率限制后端 {kind} 初始化失败，改用内存后端: {e}")
+    return MemoryRateLimitBackend(RATE_LIMIT_MAX_CLIENTS)
+
+
+rate_limiter = create_rate_limit_backend(RATE_LIMIT_BACKEND)
+
+# ========== 上游 HTTP 客户端 ==========
+
+_upstream_session = None
+_upstream_session_pid = None
+_upstream_session_lock = threading.Lock()
+
+
+def get_upstream_session():
+    """返回本 worker 共享的 requests.Session
+
+    连接池 + keep-alive 复用到 MiniMax 的 TCP/TLS 连接，避免每次问答、每次音色复刻都重新握手。
+    只对建连失败自动重试（请求尚未发出，不会重复计费）；读超时和 HTTP 错误交给调用方处理。
+    Gunicorn fork 后按进程号重建，连接不会在 worker 之间共用。
+    """
+    global _upstream_session, _upstream_session_pid
+    if _upstream_session is None or _upstream_session_pid != os.getpid():
+        with _upstream_session_lock:
+            if _upstream_session is None or _upstream_session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=UPSTREAM_POOL_SIZE,
+                    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _upstream_session = session
+                _upstream_session_pid = os.getpid()
+    return _upstream_session
+
+# ========== 上游调用策略 ==========
+
+# 可重试的上游 HTTP 状态码（限流、网关错误、服务暂不可用）
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class FallbackRequired(Exception):
+    """主请求得到了无法使用的结果（如极速版模型合成失败），应改用备选请求"""
+
+
+def is_retryable_upstream_error(e):
+    """requests 异常是否值得重试：超时、连接失败、RETRYABLE_STATUS 中的状态码"""
+    if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return e.response.status_code in RETRYABLE_STATUS
+    return False
+
+
+def upstream_error_data(e):
+    """HTTPError 响应体中的 JSON（没有响应或不是 JSON 时为 {}）
+
+    注意 requests.Response 在 4xx / 5xx 时为假值，必须用 is not None 判断。
+    """
+    if e.response is None:
+        return {}
+    try:
+        data = e.response.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+_hedge_pool = None
+_hedge_pool_pid = None
+
+
+def get_hedge_pool():
+    """本 worker 的对冲请求线程池（fork 后按进程号重建）"""
+    global _hedge_pool, _hedge_pool_pid
+    if _hedge_pool is None or _hedge_pool_pid != os.getpid():
+        with _upstream_session_lock:
+            if _hedge_pool is None or _hedge_pool_pid != os.getpid():
+                _hedge_pool = ThreadPoolExecutor(max_workers=UPSTREAM_POOL_SIZE, thread_name_prefix='hedge')
+                _hedge_pool_pid = os.getpid()
+    return _hedge_pool
+
+
+class CircuitBreaker:
+    """上游熔断器：状态保存在所有 worker 共享的 SQLite 文件中
+
+    - closed：正常调用，每次调用的结果按 BUCKET_SECONDS 分桶计数；窗口内调用数达到 min_calls
+      且失败（含慢调用）占比达到 failure_ratio 时转为 open；
+    - open：open_seconds 内的调用直接抛出 503 ApiError（不占用上游连接和 worker 时间）；
+    - half_open：open 到期后只放行一个探测请求（租约 probe_seconds），成功则恢复 closed 并清空窗口，
+      失败则重新 open；探测期间其他调用仍快速失败。
+    每个 worker 先在内存中累计计数，并缓存最近一次读到的共享状态；至多每 sync_seconds 在一个事务中
+    写入累计的计数、判断是否熔断并刷新状态，因此普通调用的检查与记录不访问 SQLite，
+    其他 worker 打开熔断后本 worker 最多延迟 sync_seconds 生效。只有争取探测资格和记录探测结果时直接读写共享库。
+    SQLite 出错时放行（与速率限制后端一致，宁可多调用也不误拒）。
+    """
+
+    BUCKET_SECONDS = 5
+
+    def __init__(self, name, db, probe_seconds, window_seconds=60, min_calls=6, failure_ratio=0.5,
+                 slow_fraction=0.8, open_seconds=30, sync_seconds=1.0):
+        self.name = name
+        self.db = db
+        self.probe_seconds = probe_seconds
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_fraction = slow_fraction
+        self.open_seconds = open_seconds
+        self.sync_seconds = sync_seconds
+        self.lock = threading.Lock()
+        # 尚未写入共享库的计数：桶号 -> [调用数, 失败数, 慢调用数]
+        self.pending = {}
+        self.pending_rejected = 0
+        # 最近一次同步得到的 (state, opened_at, probe_until)
+        self.shared = ('closed', 0.0, 0.0)
+        self.synced_at = float('-inf')
+
+    @classmethod
+    def from_config(cls, name, probe_seconds):
+        if not CIRCUIT_BREAKER['enabled']:
+            return None
+        try:
+            db = SharedSQLite(CIRCUIT_BREAKER['path'], schema=(
+                'CREATE TABLE IF NOT EXISTS circuit_state ('
+                ' name TEXT PRIMARY KEY, state TEXT NOT NULL, opened_at REAL NOT NULL DEFAULT 0,'
+                ' probe_until REAL NOT NULL DEFAULT 0, opens INTEGER NOT NULL DEFAULT 0,'
+                ' rejected INTEGER NOT NULL DEFAULT 0)',
+                'CREATE TABLE IF NOT EXISTS circuit_calls ('
+                ' name TEXT NOT NULL, bucket INTEGER NOT NULL, calls INTEGER NOT NULL,'
+                ' failures INTEGER NOT NULL, slow INTEGER NOT NULL, PRIMARY KEY (name, bucket))',
+            ))
+        except Exception as e:
+            logger.error(f"上游熔断器初始化失败，不启用熔断: {e}")
+            return None
+        options = {k: v for k, v in CIRCUIT_BREAKER.items() if k not in ('enabled', 'path')}
+        return cls(name, db, probe_seconds, **options)
+
+    def _state(self, conn):
+        row = conn.execute(
+            'SELECT state, opened_at, probe_until, opens, rejected FROM circuit_state WHERE name = ?', (self.name,)
+        ).fetchone()
+        return row or ('closed', 0.0, 0.0, 0, 0)
+
+    def _sync(self, force=False):
+        """距上次同步超过 sync_seconds（或 force）时写入累计的计数、判断是否熔断并刷新共享状态；返回缓存的状态"""
+        with self.lock:
+            if not force and time.monotonic() - self.synced_at < self.sync_seconds:
+                return self.shared
+            self.synced_at = time.monotonic()
+            pending, self.pending = self.pending, {}
+            rejected, self.pending_rejected = self.pending_rejected, 0
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                for bucket, (calls, failures, slow) in pending.items():
+                    conn.execute(
+                        'INSERT INTO circuit_calls (name, bucket, calls, failures, slow) VALUES (?, ?, ?, ?, ?) '
+                        'ON CONFLICT(name, bucket) DO UPDATE SET calls = calls + excluded.calls,'
+                        ' failures = failures + excluded.failures, slow = slow + excluded.slow',
+                        (self.name, bucket, calls, failures, slow)
+                    )
+                if rejected:
+                    conn.execute(
+                        'UPDATE circuit_state SET rejected = rejected + ? WHERE name = ?', (rejected, self.name)
+                    )
+                oldest = int((now - self.window_seconds) // self.BUCKET_SECONDS)
+                conn.execute('DELETE FROM circuit_calls WHERE name = ? AND bucket <= ?', (self.name, oldest))
+                state = self._state(conn)
+                if state[0] == 'closed' and any(failures or slow for _, failures, slow in pending.values()):
+                    calls, bad = conn.execute(
+                        'SELECT COALESCE(SUM(calls), 0), COALESCE(SUM(failures + slow), 0)'
+                        ' FROM circuit_calls WHERE name = ?', (self.name,)
+                    ).fetchone()
+                    if calls >= self.min_calls and bad >= calls * self.failure_ratio:
+                        self._open(conn, now)
+                        state = self._state(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"上游熔断状态同步失败: {e}")
+            return self.shared
+        self.shared = tuple(state[:3])
+        return self.shared
+
+    def before_call(self):
+        """调用上游前检查：返回本次是否为半开探测；熔断中抛出 503 ApiError"""
+        now = time.time()
+        state, opened_at, probe_until = self._sync()
+        if state == 'closed':
+            return False
+        retry_after = None
+        if state == 'open' and now < opened_at + self.open_seconds:
+            retry_after = opened_at + self.open_seconds - now
+        elif state == 'half_open' and now < probe_until:
+            retry_after = probe_until - now
+        if retry_after is not None:
+            with self.lock:
+                self.pending_rejected += 1
+        else:
+            # open 已到期或探测租约已过期：在事务中争取探测资格（同一时刻只有一个 worker 能拿到）
+            try:
+                with self.db.transaction() as conn:
+                    state, opened_at, probe_until, _, _ = self._state(conn)
+                    if state == 'closed':
+                        self.shared = ('closed', opened_at, probe_until)
+                        return False
+                    if state == 'open' and now < opened_at + self.open_seconds:
+                        retry_after = opened_at + self.open_seconds - now
+                    elif state == 'half_open' and now < probe_until:
+                        retry_after = probe_until - now
+                    if retry_after is not None:
+                        conn.execute('UPDATE circuit_state SET rejected = rejected + 1 WHERE name = ?', (self.name,))
+                        self.shared = (state, opened_at, probe_until)
+                    else:
+                        conn.execute(
+                            "UPDATE circuit_state SET state = 'half_open', probe_until = ? WHERE name = ?",
+                            (now + self.probe_seconds, self.name)
+                        )
+                        self.shared = ('half_open', opened_at, now + self.probe_seconds)
+            except sqlite3.Error as e:
+                logger.warning(f"上游熔断状态读取失败，放行: {e}")
+                return False
+        if retry_after is not None:
+            raise ApiError({
+                'error': 'AI 服务暂时不可用，请稍后重试',
+                'details': '上游服务连续失败，已暂停调用',
+                'retryable': True,
+                'retry_after': max(1, int(retry_after + 0.999)),
+            }, 503)
+        logger.info(f"上游熔断 {self.name} 半开，放行探测请求")
+        return True
+
+    def record(self, ok, elapsed, timeout, probe=False):
+        """记录一次调用结果（ok=False 为失败；成功但过慢计为慢调用）"""
+        now = time.time()
+        slow = ok and elapsed > timeout * self.slow_fraction
+        if not probe:
+            bucket = int(now // self.BUCKET_SECONDS)
+            with self.lock:
+                counts = self.pending.setdefault(bucket, [0, 0, 0])
+                counts[0] += 1
+                counts[1] += int(not ok)
+                counts[2] += int(slow)
+            self._sync()
+            return
+        try:
+            with self.db.transaction() as conn:
+                if ok and not slow:
+                    conn.execute("UPDATE circuit_state SET state = 'closed' WHERE name = ?", (self.name,))
+                    conn.execute('DELETE FROM circuit_calls WHERE name = ?', (self.name,))
+                    with self.lock:
+                        self.pending = {}
+                    self.shared = ('closed', 0.0, 0.0)
+                    logger.info(f"上游熔断 {self.name} 探测成功，恢复调用")
+                else:
+                    self._open(conn, now)
+                    self.shared = ('open', now, 0.0)
+        except sqlite3.Error as e:
+            logger.warning(f"上游熔断记录失败: {e}")
+
+    def _open(self, conn, now):
+        conn.execute(
+            "INSERT INTO circuit_state (name, state, opened_at, opens) VALUES (?, 'open', ?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET state = 'open', opened_at = excluded.opened_at, opens = opens + 1",
+            (self.name, now)
+        )
+        logger.error(f"上游熔断 {self.name} 打开，{self.open_seconds}s 内直接返回 503")
+
+    def state(self):
+        """当前状态（open 已到期但尚无探测请求时报告为 half_open）"""
+        try:
+            state, opened_at, _, _, _ = self._state(self.db.connect())
+        except sqlite3.Error:
+            return 'unknown'
+        if state == 'open' and time.time() >= opened_at + self.open_seconds:
+            return 'half_open'
+        return state
+
+    def stats(self):
+        self._sync(force=True)
+        now = time.time()
+        try:
+            conn = self.db.connect()
+            _, opened_at, _, opens, rejected = self._state(conn)
+            oldest = int((now - self.window_seconds) // self.BUCKET_SECONDS)
+            calls, failures, slow = conn.execute(
+                'SELECT COALESCE(SUM(calls), 0), COALESCE(SUM(failures), 0), COALESCE(SUM(slow), 0) '
+                'FROM circuit_calls WHERE name = ? AND bucket > ?', (self.name, oldest)
+            ).fetchone()
+        except sqlite3.Error as e:
+            return {'state': 'unknown', 'error': str(e)}
+        state = self.state()
+        return {
+            'state': state,
+            'window_calls': calls,
+            'window_failures': failures,
+            'window_slow': slow,
+            'opens': opens,
+            'rejected': rejected,
+            'retry_after': max(0, round(opened_at + self.open_seconds - now)) if state == 'open' else 0,
+        }
+
+
+class UpstreamPolicy:
+    """上游调用策略：指数退避 + 抖动重试、整体截止时间、备选请求与可选的对冲请求
+
+    primary / fallback 是 func(timeout) 形式的单次调用，timeout 为本次可用的秒数
+    （不超过单次超时，也不超过整体截止时间剩余的部分）。
+    - 可重试的错误按 base_delay × 2^n（上限 max_delay，随机取后一半）退避后重试，
+      退避后剩余时间不足 1 秒时不再重试，直接抛出最后一次的错误；
+    - primary 抛出 FallbackRequired 时改调 fallback（同一截止时间内）；
+    - 设置 hedge_after 时，primary 超过该秒数仍未返回就并行发出 fallback，先成功者胜出；
+    - 有熔断器时每次尝试前先检查（熔断中直接抛出 503 ApiError），尝试结果计入熔断窗口：
+      可重试的错误与 FallbackRequired 记为失败，其他错误（如请求参数错误）不算上游故障。
+    call() 用于同步 worker（对冲请求在线程池中执行），call_async() 用于 asgi.py。
+    """
+
+    def __init__(self, name, attempts=2, timeout=30, deadline=45, base_delay=0.5, max_delay=4.0,
+                 fallback_timeout=None, hedge_after=None, breaker=None):
+        self.name = name
+        self.attempts = attempts
+        self.timeout = timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fallback_timeout = fallback_timeout or timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self.lock = threading.Lock()
+        self.counters = {'calls': 0, 'retries': 0, 'fallbacks': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    @classmethod
+    def from_config(cls, name, **defaults):
+        options = {**defaults, **UPSTREAM_POLICY.get(name, {})}
+        return cls(name, breaker=CircuitBreaker.from_config(name, options['deadline']), **options)
+
+    def _record(self, probe, started, timeout, error=None, retryable=is_retryable_upstream_error):
+        if self.breaker is None:
+            return
+        failed = error is not None and (isinstance(error, FallbackRequired) or retryable(error))
+        self.breaker.record(not failed, time.monotonic() - started, timeout, probe)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _retry_delay(self, e, retry, deadline, retryable):
+        """本次失败后应等待的秒数；不再重试时返回 None"""
+        if retry + 1 >= self.attempts or not retryable(e):
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** retry)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if time.monotonic() + delay + 1 > deadline:
+            return None
+        self._count('retries')
+        logger.warning(f"上游调用 {self.name} 第 {retry + 1} 次失败，{delay:.1f}s 后重试: {e}")
+        return delay
+
+    def _run(self, func, deadline, timeout, retryable):
+        retry = 0
+        while True:
+            probe = self.breaker.before_call() if self.breaker is not None else False
+            started = time.monotonic()
+            try:
+                result = func(max(0.1, min(timeout, deadline - time.monotonic())))
+                self._record(probe, started, timeout)
+                return result
+            except Exception as e:
+                self._record(probe, started, timeout, e, retryable)
+                delay = self._retry_delay(e, retry, deadline, retryable)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                retry += 1
+
+    def call(self, primary, fallback=None, retryable=is_retryable_upstream_error):
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        if fallback is None:
+            return self._run(primary, deadline, self.timeout, retryable)
+        if self.hedge_after is None:
+            try:
+                return self._run(primary, deadline, self.timeout, retryable)
+            except FallbackRequired as e:
+                return self._fallback(e, fallback, deadline, retryable)
+
+        pool = get_hedge_pool()
+        first = pool.submit(self._run, primary, deadline, self.timeout, retryable)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FuturesTimeoutError:
+            pass
+        except FallbackRequired as e:
+            return self._fallback(e, fallback, deadline, retryable)
+
+        # 主请求过慢：并行发出备选请求，未胜出的一方在后台自然结束（受截止时间约束）
+        self._count('hedges')
+        logger.info(f"上游调用 {self.name} 超过 {self.hedge_after}s 未返回，发出对冲请求")
+        second = pool.submit(self._run, fallback, deadline, self.fallback_timeout, retryable)
+        error = None
+        for future in as_completed([first, second]):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e if error is None or future is second else error
+                continue
+            if future is second:
+                self._count('hedge_wins')
+            return result
+        raise error
+
+    def _fallback(self, e, fallback, deadline, retryable):
+        self._count('fallbacks')
+        logger.warning(f"上游调用 {self.name} 改用备选请求: {e}")
+        return self._run(fallback, deadline, self.fallback_timeout, retryable)
+
+    async def _run_async(self, func, deadline, timeout, retryable):
+        # 熔断器的检查与记录可能读写共享 SQLite，放到线程池执行，不阻塞事件循环
+        retry = 0
+        while True:
+            probe = await asyncio.to_thread(self.breaker.before_call) if self.breaker is not None else False
+            started = time.monotonic()
+            try:
+                result = await func(max(0.1, min(timeout, deadline - time.monotonic())))
+                if self.breaker is not None:
+                    await asyncio.to_thread(self._record, probe, started, timeout)
+                return result
+            except Exception as e:
+                if self.breaker is not None:
+                    await asyncio.to_thread(self._record, probe, started, timeout, e, retryable)
+                delay = self._retry_delay(e, retry, deadline, retryable)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retry += 1
+
+    async def call_async(self, primary, fallback=None, retryable=is_retryable_upstream_error):
+        """call() 的异步版本：primary / fallback 为 async func(timeout)，对冲的一方胜出后取消另一方"""
+        self._count('calls')
+        deadline = time.monotonic() + self.deadline
+        if fallback is None:
+            return await self._run_async(primary, deadline, self.timeout, retryable)
+        if self.hedge_after is None:
+            try:
+                return await self._run_async(primary, deadline, self.timeout, retryable)
+            except FallbackRequired as e:
+                self._count('fallbacks')
+                logger.warning(f"上游调用 {self.name} 改用备选请求: {e}")
+                return await self._run_async(fallback, deadline, self.fallback_timeout, retryable)
+
+        first = asyncio.ensure_future(self._run_async(primary, deadline, self.timeout, retryable))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            try:
+                return first.result()
+            except FallbackRequired as e:
+                self._count('fallbacks')
+                logger.warning(f"上游调用 {self.name} 改用备选请求: {e}")
+                return await self._run_async(fallback, deadline, self.fallback_timeout, retryable)
+
+        self._count('hedges')
+        logger.info(f"上游调用 {self.name} 超过 {self.hedge_after}s 未返回，发出对冲请求")
+        second = asyncio.ensure_future(self._run_async(fallback, deadline, self.fallback_timeout, retryable))
+        pending, error = {first, second}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is second:
+                            self._count('hedge_wins')
+                        return future.result()
+                    error = future.exception() if error is None or future is second else error
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'attempts': self.attempts,
+                'timeout': self.timeout,
+                'deadline': self.deadline,
+                'hedge_after': self.hedge_after,
+                **self.counters,
+                'circuit_breaker': self.breaker.stats() if self.breaker is not None else {'enabled': False},
+            }
+
+
+# 问答：最多 2 次、整体 45 秒；音色复刻：极速版最多 3 次，失败改用高质量模型，整体 90 秒
+CHAT_POLICY = UpstreamPolicy.from_config('chat', attempts=2, timeout=30, deadline=45)
+VOICE_CLONE_POLICY = UpstreamPolicy.from_config(
+    'voice_clone', attempts=3, timeout=45, deadline=90, base_delay=1.0, fallback_timeout=60
+)
+
+# ========== AI 问答缓存 ==========
+
+_QUESTION_TRAILING_PUNCTUATION = '?？!！.。~～ '
+
+
+def normalize_question(question):
+    """规范化问题文本：全半角统一、小写、合并空白、去掉结尾标点
+
+    “What does future mean?” 与 “what  does future mean” 视为同一个问题。
+    """
+    text = unicodedata.normalize('NFKC', question).lower()
+    text = ' '.join(text.split())
+    return text.rstrip(_QUESTION_TRAILING_PUNCTUATION)
+
+
+class ChatAnswerCache:
+    """AI 问答回答缓存：进程内 LRU（BoundedTTLStore）+ 所有 worker 共享的 SQLite 磁盘层
+
+    键为 sha256(模型 + 联网开关 + 规范化问题)；命中 / 未命中次数先在内存中累计，至多每 COUNTER_FLUSH_SECONDS
+    在一个事务中写入磁盘层（命中内存层时不访问 SQLite），/api/status 看到的是所有 worker 的合计
+    （其他 worker 尚未写入的部分除外；未启用磁盘层时为本 worker 的计数）。
+    """
+
+    # 每写入这么多条（单个 worker 内）清理一次磁盘层的过期和超额条目
+    PRUNE_EVERY = 200
+    COUNTER_FLUSH_SECONDS = 1.0
+
+    def __init__(self, ttl, max_entries, disk_path=None, max_disk_entries=50000):
+        self.ttl = ttl
+        self.memory = BoundedTTLStore(max_entries, ttl)
+        self.lock = threading.Lock()
+        self.max_disk_entries = max_disk_entries
+        self.writes = 0
+        self.counters = {'hits_memory': 0, 'hits_disk': 0, 'misses': 0}
+        # 尚未写入磁盘层的计数
+        self.pending_counters = {}
+        self.flushed_at = time.monotonic()
+        self.db = None
+        if disk_path:
+            try:
+                self.db = SharedSQLite(disk_path, schema=(
+                    'CREATE TABLE IF NOT EXISTS chat_cache ('
+                    ' key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL, last_hit REAL NOT NULL)',
+                    'CREATE INDEX IF NOT EXISTS chat_cache_last_hit ON chat_cache (last_hit)',
+                    'CREATE TABLE IF NOT EXISTS chat_cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+                    # 跨 worker 的请求合并：正在调用上游的问题（租约到期视为放弃）
+                    'CREATE TABLE IF NOT EXISTS chat_inflight (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)',
+                ))
+            except Exception as e:
+                logger.error(f"问答缓存磁盘层初始化失败，仅使用内存缓存: {e}")
+
+    @staticmethod
+    def make_key(question, enable_web_search):
+        raw = f'{MINIMAX_MODEL}\n{int(bool(enable_web_search))}\n{normalize_question(question)}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            if self.db is None:
+                return
+            self.pending_counters[name] = self.pending_counters.get(name, 0) + 1
+            due = time.monotonic() - self.flushed_at >= self.COUNTER_FLUSH_SECONDS
+        if due:
+            self._flush_counters()
+
+    def _flush_counters(self):
+        """把累计的计数写入磁盘层（一个事务）；失败时保留，下次再写"""
+        with self.lock:
+            pending, self.pending_counters = self.pending_counters, {}
+            self.flushed_at = time.monotonic()
+        if not pending or self.db is None:
+            return
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany(
+                    'INSERT INTO chat_cache_counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value', list(pending.items())
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"问答缓存计数失败: {e}")
+            with self.lock:
+                for name, value in pending.items():
+                    self.pending_counters[name] = self.pending_counters.get(name, 0) + value
+
+    def counter(self, name):
+        """读取计数（启用磁盘层时为所有 worker 的合计）"""
+        if self.db is not None:
+            self._flush_counters()
+            try:
+                row = self.db.connect().execute(
+                    'SELECT value FROM chat_cache_counters WHERE name = ?', (name,)
+                ).fetchone()
+                return row[0] if row else 0
+            except sqlite3.Error as e:
+                logger.warning(f"问答缓存计数读取失败: {e}")
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def claim_flight(self, key, lease_seconds):
+        """尝试成为该问题的跨 worker leader；已有未过期租约时返回 False"""
+        if self.db is None:
+            return True
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                conn.execute('DELETE FROM chat_inflight WHERE key = ? AND expires_at <= ?', (key, now))
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO chat_inflight (key, expires_at) VALUES (?, ?)', (key, now + lease_seconds)
+                )
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning(f"问答请求合并租约获取失败: {e}")
+            return True
+
+    def release_flight(self, key):
+        if self.db is None:
+            return
+        try:
+            self.db.connect().execute('DELETE FROM chat_inflight WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"问答请求合并租约释放失败: {e}")
+
+    def poll_flight(self, key):
+        """跟随方轮询一次：返回 (answer, still_running)"""
+        now = time.time()
+        conn = self.db.connect()
+        row = conn.execute(
+            'SELECT answer FROM chat_cache WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if row is not None:
+            return row[0], False
+        running = conn.execute(
+            'SELECT 1 FROM chat_inflight WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return None, running is not None
+
+    def get(self, question, enable_web_search):
+        key = self.make_key(question, enable_web_search)
+        now = time.time()
+        with self.lock:
+            answer = self.memory.get(key, now)
+        if answer is not None:
+            self._count('hits_memory')
+            return answer
+
+        if self.db is not None:
+            try:
+                conn = self.db.connect()
+                row = conn.execute(
+                    'SELECT answer, expires_at FROM chat_cache WHERE key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE chat_cache SET last_hit = ? WHERE key = ?', (now, key))
+                    with self.lock:
+                        self.memory.set(key, row[0], now, ttl=row[1] - now)
+                    self._count('hits_disk')
+                    return row[0]
+            except sqlite3.Error as e:
+                logger.warning(f"问答缓存磁盘层读取失败: {e}")
+
+        self._count('misses')
+        return None
+
+    def put(self, question, enable_web_search, answer):
+        key = self.make_key(question, enable_web_search)
+        now = time.time()
+        with self.lock:
+            self.memory.set(key, answer, now)
+            self.writes += 1
+            prune = self.writes % self.PRUNE_EVERY == 0
+        if self.db is None:
+            return
+        try:
+            conn = self.db.connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO chat_cache (key, answer, expires_at, last_hit) VALUES (?, ?, ?, ?)',
+                (key, answer, now + self.ttl, now)
+            )
+            if prune:
+                conn.execute('DELETE FROM chat_cache WHERE expires_at <= ?', (now,))
+                conn.execute(
+                    'DELETE FROM chat_cache WHERE key IN ('
+                    ' SELECT key FROM chat_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?)',
+                    (self.max_disk_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"问答缓存磁盘层写入失败: {e}")
+
+    def stats(self):
+        names = ('hits_memory', 'hits_disk', 'misses')
+        self._flush_counters()
+        with self.lock:
+            memory = self.memory.stats()
+            counters = {name: self.counters[name] for name in names}
+        result = {'memory': memory}
+        if self.db is not None:
+            try:
+                conn = self.db.connect()
+                for name, value in conn.execute('SELECT name, value FROM chat_cache_counters').fetchall():
+                    if name in counters:
+                        counters[name] = value
+                (entries,) = conn.execute('SELECT COUNT(*) FROM chat_cache').fetchone()
+                result['disk'] = {'entries': entries, 'bytes': self.db.size()}
+            except sqlite3.Error as e:
+                logger.warning(f"问答缓存统计失败: {e}")
+        hits = counters['hits_memory'] + counters['hits_disk']
+        total = hits + counters['misses']
+        result.update(counters, hits=hits, hit_rate=round(hits / total, 4) if total else 0.0)
+        return result
+
+
+chat_cache = ChatAnswerCache(
+    ttl=CHAT_CACHE['ttl_seconds'],
+    max_entries=CHAT_CACHE['max_entries'],
+    disk_path=os.path.join(CACHE_DIR, 'chat_cache.sqlite3') if CHAT_CACHE['disk'] else None,
+    max_disk_entries=CHAT_CACHE['max_disk_entries'],
+) if CHAT_CACHE['enabled'] else None
+
+# ========== 预生成单词讲解 ==========
+
+# 与前端单词卡片的提问一致（js/app.js：`${plainWord} 是什么意思？`）
+WORD_QUESTION_TEMPLATE = '{word} 是什么意思？'
+
+
+def word_question(word):
+    """单词卡片向小灵提问时使用的问题文本"""
+    return WORD_QUESTION_TEMPLATE.format(word=word.replace('**', '').strip())
+
+
+class WordExplanations(JsonArtifact):
+    """data/word-explanations.json：规范化问题 → 预生成的回答
+
+    文件格式：{"version": 1, "model": ..., "entries": {单词 ID: {"word", "question", "answer"}}}。
+    只服务未开启联网搜索的提问（联网搜索要的是实时信息）。
+    """
+
+    def build(self, data):
+        index = {}
+        for entry in data.get('entries', {}).values():
+            if entry.get('answer'):
+                index[normalize_question(entry['question'])] = entry['answer']
+        return index
+
+    def get(self, question, enable_web_search=False):
+        if enable_web_search:
+            return None
+        return self._get(normalize_question(question))
+
+
+word_explanations = WordExplanations(WORD_EXPLANATIONS_PATH)
+
+
+def lookup_chat_answer(question, enable_web_search=False):
+    """不调用上游的回答来源：预生成的单词讲解优先，其次问答缓存；返回 (answer, source) 或 (None, None)"""
+    answer = word_explanations.get(question, enable_web_search)
+    if answer is not None:
+        return answer, 'precomputed'
+    if chat_cache is not None:
+        answer = chat_cache.get(question, enable_web_search)
+        if answer is not None:
+            return answer, 'cache'
+    return None, None
+
+# ========== 单词索引 ==========
+
+_HAN_RE = re.compile(r'[\u3400-\u9fff]')
+
+
+def word_key(word):
+    """前缀 / 精确查询使用的单词键：去掉 ** 标记、合并空白、小写"""
+    return ' '.join(word.replace('**', '').split()).lower()
+
+
+_EXAMPLE_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def edit_distance(a, b, max_distance):
+    """a、b 的编辑距离（插入、删除、替换、相邻两字母交换各算 1）；超过 max_distance 时返回 max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        # 整行都已超过上限，之后只会更大
+        if row_min > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _deletes(term, max_distance):
+    """term 删去至多 max_distance 个字母得到的所有字符串（含 term 本身）"""
+    variants = {term}
+    frontier = {term}
+    for _ in range(max_distance):
+        frontier = {t[:i] + t[i + 1:] for t in frontier for i in range(len(t))}
+        variants |= frontier
+    return variants
+
+
+class SpellingIndex:
+    """听写答案的拼写纠错（SymSpell 式删除索引）
+
+    每个词条预先生成删去至多 MAX_DISTANCE 个字母的变体，记录 变体 → 词条；查询时只生成输入的删除变体
+    去查表，取出的候选再用 edit_distance 确认，不需要与全部词条逐个比较。
+    词条为单词本身（word 字段）与例句中的英文词；排序：编辑距离 → 单词优先于例句词 → 出现次数多 → 字母顺序。
+    """
+
+    MAX_DISTANCE = 2
+
+    def __init__(self, terms):
+        """terms：词条 → (出现次数, 单词 ID 或 None)"""
+        self.terms = sorted(terms)
+        self.counts = [terms[term][0] for term in self.terms]
+        self.word_ids = [terms[term][1] for term in self.terms]
+        deletes = {}
+        for term_id, term in enumerate(self.terms):
+            for variant in _deletes(term, self.MAX_DISTANCE):
+                deletes.setdefault(variant, []).append(term_id)
+        self.deletes = {variant: tuple(term_ids) for variant, term_ids in deletes.items()}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def suggest(self, text, limit=5, max_distance=MAX_DISTANCE):
+        """返回与 text 编辑距离不超过 max_distance 的前 limit 个词条"""
+        query = word_key(text)
+        if not query:
+            return []
+        max_distance = min(max_distance, self.MAX_DISTANCE)
+        candidates = set()
+        for variant in _deletes(query, max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+        ranked = []
+        for term_id in candidates:
+            distance = edit_distance(query, self.terms[term_id], max_distance)
+            if distance <= max_distance:
+                ranked.append((distance, self.word_ids[term_id] is None, -self.counts[term_id], self.terms[term_id], term_id))
+        ranked.sort()
+        return [
+            {'term': term, 'distance': distance, 'count': self.counts[term_id], 'wordId': self.word_ids[term_id]}
+            for distance, _, _, term, term_id in ranked[:limit]
         ]
-    
-    # 检查每小时请求次数
-    hourly_limit = RATE_LIMIT.get('requests_per_hour', 20)
-    if hourly_limit > 0 and len(request_history[client_ip]['hourly']) >= hourly_limit:
-        oldest = min(request_history[client_ip]['hourly'])
-        reset_time = datetime.fromtimestamp(oldest) + timedelta(hours=1)
-        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每小时请求超限")
-        return False, f"请求过于频繁，请在 {reset_time.strftime('%H:%M:%S')} 后重试"
-    
-    # 检查每日请求次数
-    daily_limit = RATE_LIMIT.get('requests_per_day', 0)
-    if daily_limit > 0 and len(request_history[client_ip]['daily']) >= daily_limit:
-        oldest = min(request_history[client_ip]['daily'])
-        reset_time = datetime.fromtimestamp(oldest) + timedelta(days=1)
-        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每日请求超限")
-        return False, f"今日请求次数已达上限，请在 {reset_time.strftime('%Y-%m-%d %H:%M:%S')} 后重试"
-    
-    # 检查每分钟请求次数
-    minute_limit = RATE_LIMIT.get('requests_per_minute', 0)
-    if minute_limit > 0 and len(request_history[client_ip]['minute']) >= minute_limit:
-        oldest = min(request_history[client_ip]['minute'])
-        reset_time = datetime.fromtimestamp(oldest) + timedelta(minutes=1)
-        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每分钟请求超限")
-        return False, f"请求过于频繁，请在 {reset_time.strftime('%S')} 秒后重试"
-    
-    # 检查冷却时间
+
+
+class WordSearchIndex:
+    """words.json 的只读查询索引，单词只保存一份，其余结构都只存下标
+
+    - words / locations：按词书顺序排列的单词及其 (词书 ID, 单元)
+    - keys / key_positions：按单词键排序的数组，前缀查询用 bisect 取出一段连续区间（扁平化的前缀树）
+    - by_id：单词 ID → 下标
+    - meaning_chars / by_category：释义中的汉字、分类 → 下标集合（倒排索引）
+    - by_book / by_unit：词书、(词书, 单元) → 下标 range（同一单元的单词在 words 中连续）
+    - spelling：单词与例句词的拼写纠错索引（SpellingIndex）
+    """
+
+    def __init__(self, books):
+        self.words = []
+        self.locations = []
+        self.by_id = {}
+        self.by_book = {}
+        self.by_unit = {}
+        meaning_chars = {}
+        by_category = {}
+        for book in books:
+            book_id = book.get('id')
+            book_start = len(self.words)
+            for unit in book.get('units', []):
+                unit_start = len(self.words)
+                for word in unit.get('words', []):
+                    if not isinstance(word.get('word'), str) or not word['word'].strip():
+                        continue
+                    position = len(self.words)
+                    self.words.append(word)
+                    self.locations.append((book_id, unit.get('unit')))
+                    if word.get('id'):
+                        self.by_id[word['id']] = position
+                    for char in set(_HAN_RE.findall(word.get('meaning') or '')):
+                        meaning_chars.setdefault(char, []).append(position)
+                    if word.get('category'):
+                        by_category.setdefault(word['category'], []).append(position)
+                self.by_unit[(book_id, unit.get('unit'))] = range(unit_start, len(self.words))
+            self.by_book[book_id] = range(book_start, len(self.words))
+        self.meaning_chars = {char: frozenset(positions) for char, positions in meaning_chars.items()}
+        self.by_category = {category: frozenset(positions) for category, positions in by_category.items()}
+        keyed = sorted((word_key(word['word']), position) for position, word in enumerate(self.words))
+        self.keys = [key for key, _ in keyed]
+        self.key_positions = [position for _, position in keyed]
+
+        spelling_terms = {}
+        for word in self.words:
+            key = word_key(word['word'])
+            count, word_id = spelling_terms.get(key, (0, None))
+            spelling_terms[key] = (count + 1, word_id or word.get('id'))
+            for token in _EXAMPLE_TOKEN_RE.findall((word.get('example') or '').lower()):
+                count, word_id = spelling_terms.get(token, (0, None))
+                spelling_terms[token] = (count + 1, word_id)
+        self.spelling = SpellingIndex(spelling_terms)
+
+    def __len__(self):
+        return len(self.words)
+
+    def item(self, position):
+        """返回给前端的单词：words.json 中的字段 + book（词书 ID）+ unit"""
+        book_id, unit = self.locations[position]
+        return {**self.words[position], 'book': book_id, 'unit': unit}
+
+    def get(self, word_id):
+        position = self.by_id.get(word_id)
+        return self.item(position) if position is not None else None
+
+    def _key_range(self, key, exact=False):
+        start = bisect_left(self.keys, key)
+        stop = bisect_right(self.keys, key) if exact else bisect_left(self.keys, key + '\uffff')
+        return self.key_positions[start:stop]
+
+    def search(self, prefix=None, word=None, meaning=None, category=None, book=None, unit=None):
+        """返回满足全部条件的下标列表：有 word / prefix 时按单词键排序，否则按词书顺序"""
+        filters = []
+        if book is not None:
+            filters.append(self.by_book.get(book, ()) if unit is None else self.by_unit.get((book, unit), ()))
+        if category is not None:
+            filters.append(self.by_category.get(category, ()))
+        if meaning is not None:
+            filters.extend(self.meaning_chars.get(char, ()) for char in set(_HAN_RE.findall(meaning)))
+
+        if word is not None:
+            candidates = self._key_range(word_key(word), exact=True)
+        elif prefix is not None:
+            candidates = self._key_range(word_key(prefix))
+        elif filters:
+            # 从最小的集合出发，其余集合只做成员判断
+            filters.sort(key=len)
+            candidates = sorted(filters.pop(0))
+        else:
+            candidates = range(len(self.words))
+
+        results = []
+        for position in candidates:
+            if not all(position in positions for positions in filters):
+                continue
+            # 汉字倒排索引只保证字都出现过，释义需要真正包含查询串
+            if meaning is not None and meaning not in (self.words[position].get('meaning') or ''):
+                continue
+            results.append(position)
+        return results
+
+
+class WordLookup(JsonArtifact):
+    """data/words.json 的服务端查询（/api/words）：每个 worker 加载一次并建立 WordSearchIndex，文件更新后自动重建"""
+
+    def build(self, data):
+        return WordSearchIndex(data)
+
+    def get(self, word_id):
+        return self._get(word_id)
+
+    def query(self, offset, limit, **criteria):
+        """返回 (总条数, 当前页的单词列表)"""
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            index = self.index
+            self.hits += 1
+        if not index:
+            return 0, []
+        positions = index.search(**criteria)
+        return len(positions), [index.item(position) for position in positions[offset:offset + limit]]
+
+    def suggest(self, answers, limit):
+        """每个听写答案最接近的词条列表（与答案顺序一致）"""
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            index = self.index
+            self.hits += 1
+        if not index:
+            return [[] for _ in answers]
+        return [index.spelling.suggest(answer, limit) for answer in answers]
+
+    def stats(self):
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            return {
+                'path': os.path.relpath(self.path, os.path.dirname(os.path.abspath(__file__))),
+                'entries': len(self.index),
+                'spelling_terms': len(self.index.spelling) if self.index else 0,
+                'queries': self.hits,
+            }
+
+
+word_lookup = WordLookup(WORDS_DATA_PATH)
+
+
+class PassageSearch(JsonArtifact):
+    """data/search-index.bin 的查询（/api/search）：mmap 只读打开，多个 worker 共享页缓存，文件更新后重新映射"""
+
+    def load(self):
+        return search_index.open_index(self.path)
+
+    def build(self, data):
+        return data
+
+    def search(self, query, offset, limit, source=None):
+        """返回 (命中段落总数, 当前页结果)；索引文件不存在时返回 None"""
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            index = self.index
+            self.hits += 1
+        if not index:
+            return None
+        return index.search(query, offset, limit, source)
+
+    def stats(self):
+        with self.lock:
+            self._maybe_reload(time.monotonic())
+            return {
+                'path': os.path.relpath(self.path, os.path.dirname(os.path.abspath(__file__))),
+                'entries': len(self.index),
+                'terms': self.index.n_terms if self.index else 0,
+                'queries': self.hits,
+            }
+
+
+passage_search = PassageSearch(SEARCH_INDEX_PATH)
+
+# ========== 辅助函数 ==========
+
+def check_rate_limit(client_ip):
+    """检查速率限制"""
+    now = time.time()
+    windows = [
+        (window, seconds, RATE_LIMIT.get(config_key, 20 if window == 'hourly' else 0))
+        for window, seconds, config_key in RATE_LIMIT_WINDOWS
+    ]
+    windows = [w for w in windows if w[2] > 0]
     cooldown = RATE_LIMIT.get('cooldown_seconds', 5)
-    if cooldown > 0 and request_history[client_ip]['hourly']:
-        last_request = max(request_history[client_ip]['hourly'])
-        if (now - datetime.fromtimestamp(last_request)).total_seconds() < cooldown:
-            logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 冷却时间未到")
-            return False, f"请等待 {cooldown} 秒后重试"
-    
-    # 记录请求
-    now_ts = now.timestamp()
-    request_history[client_ip]['hourly'].append(now_ts)
-    request_history[client_ip]['daily'].append(now_ts)
-    request_history[client_ip]['minute'].append(now_ts)
-    return True, "OK"
+    if not windows and cooldown <= 0:
+        return True, "OK"
+
+    try:
+        allowed, reason, reset_at = rate_limiter.hit(client_ip, now, windows, cooldown)
+    except Exception as e:
+        # 共享存储故障时放行，避免整个站点不可用
+        logger.error(f"速率限制后端 {rate_limiter.name} 错误，本次放行: {e}")
+        return True, "OK"
+
+    if allowed:
+        return True, "OK"
+
+    reset_time = datetime.fromtimestamp(reset_at)
+    if reason == 'hourly':
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每小时请求超限")
+        return False, f"请求过于频繁，请在 {reset_time.strftime('%H:%M:%S')} 后重试"
+    if reason == 'daily':
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每日请求超限")
+        return False, f"今日请求次数已达上限，请在 {reset_time.strftime('%Y-%m-%d %H:%M:%S')} 后重试"
+    if reason == 'minute':
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 每分钟请求超限")
+        return False, f"请求过于频繁，请在 {reset_time.strftime('%S')} 秒后重试"
+    logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: 冷却时间未到")
+    return False, f"请等待 {cooldown} 秒后重试"
+
+class ApiError(Exception):
+    """可直接返回给前端的错误：payload 为 JSON 内容，status 为 HTTP 状态码"""
+
+    def __init__(self, payload, status):
+        super().__init__(payload.get('error', ''))
+        self.payload = payload
+        self.status = status
+
+
+def cors_json(payload, status=200):
+    """返回带 CORS 头的 JSON 响应"""
+    response = jsonify(payload)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response, status
+
+
+def sse_event(event, payload):
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    """以 text/event-stream 返回事件生成器（关闭代理缓冲，保证逐条送达浏览器）"""
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def cors_preflight():
+    """处理 CORS 预检请求"""
+    response = make_response()
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+
+def require_api_key():
+    """未配置 API Key 时抛出 ApiError"""
+    if not API_KEY:
+        raise ApiError({
+            'error': '服务器未配置 API Key',
+            'help': '请设置环境变量 MINIMAX_API_KEY 或编辑 server.py'
+        }, 500)
+
+
+def minimax_headers():
+    """MiniMax 请求头"""
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {API_KEY}'
+    }
+
+
+# ---------- AI 问答 ----------
+
+CHAT_SYSTEM_PROMPT = '''You are an English learning assistant for primary school students. 
+Help explain English words, sentences, and grammar in a clear and simple way.
+Use Chinese to explain when helpful.
+Format your response with clear structure using headings and bullet points.
+Respond in Simplified Chinese with Chinese punctuation.'''
+
+
+def parse_chat_request(data):
+    """校验 /api/chat 请求体，返回 (question, enable_web_search)"""
+    if not data or 'question' not in data:
+        raise ApiError({'error': '请提供问题内容'}, 400)
+    question = data['question'].strip()
+    if not question:
+        raise ApiError({'error': '问题不能为空'}, 400)
+    # 获取是否启用联网搜索
+    return question, data.get('enable_web_search', False)
+
+
+def build_chat_payload(question, enable_web_search=False):
+    """构建 MiniMax chatcompletion 请求体"""
+    data = {
+        'model': MINIMAX_MODEL,
+        'messages': [
+            {'role': 'system', 'content': CHAT_SYSTEM_PROMPT},
+            {'role': 'user', 'content': question}
+        ],
+        'temperature': 0.7,
+        'max_tokens': 1000
+    }
+
+    # 启用联网搜索功能
+    if enable_web_search:
+        data['tools'] = [{"type": "web_search"}]
+        data['tool_choice'] = "auto"
+    return data
+
+
+def extract_chat_answer(result):
+    """解析响应 - 尝试多种可能的格式，取不到回答时抛出异常"""
+    answer = None
+
+    # 格式1: OpenAI 兼容格式 choices[0].message.content
+    if result.get('choices') and len(result['choices']) > 0:
+        choice = result['choices'][0]
+        if 'message' in choice:
+            answer = choice.get('message', {}).get('content')
+        elif 'delta' in choice:
+            answer = choice.get('delta', {}).get('content')
+        elif 'text' in choice:
+            answer = choice.get('text')
+
+    # 格式2: 直接返回文本
+    if answer is None and 'text' in result:
+        answer = result['text']
+
+    # 格式3: base_resp 中可能包含文本
+    if answer is None and result.get('base_resp'):
+        answer = result['base_resp'].get('content') or result['base_resp'].get('text')
+
+    if not answer:
+        logger.error(f"API 响应格式异常: {result}")
+        raise Exception('API 响应格式错误，无法提取回答内容')
+    return answer
+
+
+def parse_chat_stream_line(line):
+    """解析流式响应（stream: true）的一行 SSE，返回 (done, delta_text)
+
+    增量文本取自 choices[0].delta.content（与 extract_chat_answer 的 delta 分支相同）；
+    末尾汇总整段回答的 message 分片会被忽略，避免重复输出。
+    """
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if not line.startswith('data:'):
+        return False, ''
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return True, ''
+    chunk = json.loads(data)
+    base_resp = chunk.get('base_resp') or {}
+    if base_resp.get('status_code'):
+        raise Exception(f"API 请求失败: {base_resp.get('status_msg', '未知错误')}")
+    choices = chunk.get('choices') or []
+    if choices and 'delta' in choices[0]:
+        return False, choices[0].get('delta', {}).get('content') or ''
+    return False, ''
+
+
+def stream_minimax_api(question, enable_web_search=False):
+    """以 stream: true 调用 MiniMax，逐段产出回答文本（只在收到响应头之前按 CHAT_POLICY 重试）"""
+    payload = build_chat_payload(question, enable_web_search)
+    payload['stream'] = True
+
+    def attempt(timeout):
+        response = get_upstream_session().post(
+            MINIMAX_API_URL,
+            headers=minimax_headers(),
+            json=payload,
+            stream=True,
+            timeout=timeout
+        )
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            response.close()
+            raise
+        return response
+
+    try:
+        response = CHAT_POLICY.call(attempt)
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"MiniMax API HTTP 错误: {e}")
+        error_data = upstream_error_data(e)
+        raise Exception(f"API 请求失败: {error_data.get('base_resp', {}).get('msg', str(e))}")
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"MiniMax API 错误: {e}")
+        raise Exception(f"API 请求失败: {str(e)}")
+
+    with response:
+        for line in response.iter_lines():
+            done, text = parse_chat_stream_line(line)
+            if done:
+                break
+            if text:
+                yield text
+
+
+def call_minimax_api(question, enable_web_search=False):
+    """调用 MiniMax API（按 CHAT_POLICY 重试）"""
+    payload = build_chat_payload(question, enable_web_search)
+
+    def attempt(timeout):
+        response = get_upstream_session().post(
+            MINIMAX_API_URL,
+            headers=minimax_headers(),
+            json=payload,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        return CHAT_POLICY.call(attempt)
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"MiniMax API HTTP 错误: {e}")
+        error_data = upstream_error_data(e)
+        raise Exception(f"API 请求失败: {error_data.get('base_resp', {}).get('msg', str(e))}")
+    except ApiError:
+        raise
+    except Exception as e:
+        logger.error(f"MiniMax API 错误: {e}")
+        raise Exception(f"API 请求失败: {str(e)}")
+
+
+# 相同问题的并发请求合并到一次上游调用
+# 跨 worker 租约时长（略长于 CHAT_POLICY 的整体截止时间）与跟随方轮询共享缓存的间隔
+CHAT_FLIGHT_LEASE_SECONDS = CHAT_POLICY.deadline + 5
+CHAT_FLIGHT_POLL_SECONDS = 0.2
+# 同一 worker 内跟随方等待 leader 的上限：leader 最多等其他 worker 一个租约时长，再自己调用上游一个租约时长
+CHAT_FLIGHT_FOLLOWER_WAIT_SECONDS = 2 * CHAT_FLIGHT_LEASE_SECONDS
+
+chat_flights = SingleFlight()
+
+
+def record_coalesced_chat():
+    """记录一次被合并的问答请求（有共享缓存时计入所有 worker 的合计）"""
+    if chat_cache is not None:
+        chat_cache._count('coalesced')
+
+
+def chat_flight_timeout():
+    return ApiError({'error': '等待相同问题的回答超时，请稍后重试', 'retryable': True}, 504)
+
+
+def wait_for_peer_answer(key, deadline):
+    """等待其他 worker 对同一问题的上游调用完成，返回回答；对方失败、放弃或到达 deadline 时返回 None"""
+    while time.time() < deadline:
+        try:
+            answer, running = chat_cache.poll_flight(key)
+        except sqlite3.Error as e:
+            logger.warning(f"问答请求合并轮询失败: {e}")
+            return None
+        if answer is not None or not running:
+            return answer
+        time.sleep(CHAT_FLIGHT_POLL_SECONDS)
+    return None
+
+
+def claim_chat_flight(key):
+    """跨 worker 合并：取得租约时返回 None（调用方负责调用上游并 release_flight），否则返回其他 worker 的回答
+
+    对方失败或租约过期时重新竞争租约，只有抢到的一方调用上游，其余继续等待；
+    总等待不超过 CHAT_FLIGHT_LEASE_SECONDS，超时抛出 ApiError（504）。
+    """
+    deadline = time.time() + CHAT_FLIGHT_LEASE_SECONDS
+    while not chat_cache.claim_flight(key, CHAT_FLIGHT_LEASE_SECONDS):
+        answer = wait_for_peer_answer(key, deadline)
+        if answer is not None:
+            record_coalesced_chat()
+            return answer
+        if time.time() >= deadline:
+            raise chat_flight_timeout()
+    return None
+
+
+def wait_for_chat_leader(call):
+    """同一 worker 内的跟随方：等待 leader 的结果（最多 CHAT_FLIGHT_FOLLOWER_WAIT_SECONDS）"""
+    if not call.event.wait(CHAT_FLIGHT_FOLLOWER_WAIT_SECONDS):
+        raise chat_flight_timeout()
+    if call.error is not None:
+        raise call.error
+    record_coalesced_chat()
+    return call.result
+
+
+def fetch_chat_answer(question, enable_web_search=False):
+    """调用 MiniMax 取回答并写入缓存"""
+    result = call_minimax_api(question, enable_web_search)
+    answer = extract_chat_answer(result)
+    if chat_cache is not None:
+        chat_cache.put(question, enable_web_search, answer)
+    return answer
+
+
+def answer_chat_question(question, enable_web_search=False):
+    """取回答，并合并相同问题（规范化后）的并发请求
+
+    同一 worker 内：SingleFlight 让并发线程共享一次调用；
+    多个 worker 之间：通过共享缓存库中的租约选出一个 worker 调用上游，其余 worker 轮询缓存等结果。
+    返回 (answer, coalesced)。
+    """
+    key = ChatAnswerCache.make_key(question, enable_web_search)
+    call, leader = chat_flights.begin(key)
+    if not leader:
+        return wait_for_chat_leader(call), True
+
+    try:
+        answer, coalesced = _answer_across_workers(key, question, enable_web_search)
+    except Exception as e:
+        chat_flights.finish(key, call, error=e)
+        raise
+    chat_flights.finish(key, call, result=answer)
+    return answer, coalesced
+
+
+def _answer_across_workers(key, question, enable_web_search):
+    if chat_cache is None or chat_cache.db is None:
+        return fetch_chat_answer(question, enable_web_search), False
+
+    answer = claim_chat_flight(key)
+    if answer is not None:
+        return answer, True
+    try:
+        return fetch_chat_answer(question, enable_web_search), False
+    finally:
+        chat_cache.release_flight(key)
+
+
+# ---------- 音色复刻 ----------
+
+# MiniMax 同步语音合成单次最长 10,000 字符
+VOICE_CLONE_MAX_TEXT_LENGTH = 10000
+# 极速版模型（更快更优惠，适用于语音聊天和数字人场景）与失败时的高质量备选模型
+VOICE_CLONE_MODEL = 'speech-2.6-turbo'
+VOICE_CLONE_FALLBACK_MODEL = 'speech-2.8-hd'
+
+
+def configured_voice_clone_voices():
+    """已配置 file_id 的语音列表"""
+    return [v for v in MINIMAX_VOICE_CLONE_VOICES if v.get('file_id', 0) > 0]
+
+
+def parse_voice_clone_request(data):
+    """校验 /api/voice-clone 请求体，返回 (text, selected_voice)"""
+    # 检查音色复刻配置
+    configured_voices = configured_voice_clone_voices()
+    if len(configured_voices) == 0:
+        raise ApiError({
+            'error': '音色复刻未配置',
+            'help': '请在 api_config.py 中设置 MINIMAX_VOICE_CLONE_VOICES'
+        }, 400)
+
+    if not data:
+        raise ApiError({'error': '请提供请求数据'}, 400)
+
+    text = data.get('text', '').strip()
+
+    # 获取请求的 file_id（可选，如果未提供则使用默认语音）
+    requested_file_id = data.get('file_id')
+
+    # 查找对应的语音配置
+    selected_voice = None
+    if requested_file_id:
+        # 如果前端指定了 file_id，查找对应的语音
+        for voice in configured_voices:
+            if voice.get('file_id') == requested_file_id:
+                selected_voice = voice
+                break
+        if not selected_voice:
+            raise ApiError({
+                'error': '无效的语音 ID',
+                'help': '请选择有效的语音'
+            }, 400)
+    else:
+        # 使用默认语音
+        selected_voice = configured_voices[0]
+
+    if not text:
+        raise ApiError({'error': '请提供要合成的声音文本'}, 400)
+
+    return text, selected_voice
+
+
+def needs_chunked_synthesis(text):
+    """超过单次合成上限、需要分段合成的文本"""
+    return VOICE_CHUNKED['enabled'] and len(text) > VOICE_CLONE_MAX_TEXT_LENGTH
+
+
+def check_voice_clone_text_length(text):
+    """文本长度校验（预合成的长章节不受此限制，因此在查完预合成清单后再检查）"""
+    max_length = VOICE_CHUNKED['max_chars'] if VOICE_CHUNKED['enabled'] else VOICE_CLONE_MAX_TEXT_LENGTH
+    if len(text) > max_length:
+        raise ApiError({
+            'error': '文本长度超过限制',
+            'details': f'当前长度: {len(text)} 字符, 最大允许: {max_length} 字符',
+            'suggestion': '请分段朗读或选择较短的章节'
+        }, 400)
+
+
+# 分段时优先在这些位置断开（段落 > 句末 > 逗号等 > 空格）
+_TEXT_BREAKS = (('\n',), ('. ', '! ', '? ', '。', '！', '？'), (', ', '; ', '，', '；', '：'), (' ',))
+
+
+def strip_id3v2(data):
+    """去掉 MP3 开头的 ID3v2 标签（拼接多段音频时只保留第一段的标签）"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return data
+    size = (data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f)
+    footer = 10 if data[5] & 0x10 else 0
+    return data[10 + size + footer:]
+
+
+def split_voice_clone_text(text, limit=VOICE_CLONE_MAX_TEXT_LENGTH):
+    """把长文本切成每段不超过 limit 个字符的片段，尽量在段落 / 句子边界断开"""
+    segments = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = 0
+        for breaks in _TEXT_BREAKS:
+            cut = max(window.rfind(b) + len(b) for b in breaks)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        segments.append(text[:cut].strip())
+        text = text[cut:].lstrip()
+    if text.strip():
+        segments.append(text.strip())
+    return [seg for seg in segments if seg]
+
+
+def new_voice_id():
+    """生成唯一的 voice_id（基于时间戳和随机数）"""
+    return f"voice-{int(time.time())}-{str(uuid.uuid4())[:8]}"
+
+
+def voice_clone_succeeded(result):
+    return result.get('base_resp', {}).get('status_msg') == 'success'
+
+
+def voice_clone_audio_url(result):
+    """从成功的响应中取出音频 URL，并处理 HTTP/HTTPS 问题（iOS 需要 HTTPS）"""
+    audio_url = result.get('demo_audio', '')
+    if not audio_url:
+        raise Exception('音色复刻 API 未返回音频 URL')
+
+    if audio_url.startswith('http://'):
+        # 尝试转换为 HTTPS
+        https_url = audio_url.replace('http://', 'https://')
+        # 记录原始 URL 和转换后的 URL
+        logger.info(f"原始音频 URL (HTTP): {audio_url}")
+        logger.info(f"转换后音频 URL (HTTPS): {https_url}")
+        # 使用 HTTPS URL
+        audio_url = https_url
+    elif audio_url.startswith('https://'):
+        logger.info(f"音频 URL (HTTPS): {audio_url}")
+    else:
+        logger.warning(f"音频 URL 格式异常: {audio_url}")
+    return audio_url
+
+
+def voice_clone_status_msg(result):
+    return result.get('base_resp', {}).get('status_msg', '未知错误')
+
+
+def call_voice_clone_api(file_id, text, voice_description='未知'):
+    """调用 MiniMax 音色复刻 API，返回响应 JSON
+
+    按 VOICE_CLONE_POLICY 重试极速版模型，合成失败时改用高质量模型（开启对冲时极速版过慢也会并行请求）。
+    """
+    headers = minimax_headers()
+
+    def synthesize(model):
+        def attempt(timeout):
+            # 每次生成唯一的 voice_id（对冲时两个请求同时进行，不能共用）
+            voice_id = new_voice_id()
+            logger.info(f"调用 MiniMax 音色复刻 API - voice_id: {voice_id}, 语音: {voice_description}, 模型: {model}")
+            response = get_upstream_session().post(
+                MINIMAX_VOICE_CLONE_URL,
+                headers=headers,
+                json={'file_id': file_id, 'voice_id': voice_id, 'text': text, 'model': model},
+                timeout=timeout,
+                verify=True  # SSL 验证
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"MiniMax 音色复刻 API 响应: {result}")
+            if voice_clone_succeeded(result):
+                return result
+            if model == VOICE_CLONE_MODEL:
+                raise FallbackRequired(f"极速版模型失败（{voice_clone_status_msg(result)}）")
+            raise Exception(f"音色复刻失败: {voice_clone_status_msg(result)}")
+        return attempt
+
+    return VOICE_CLONE_POLICY.call(synthesize(VOICE_CLONE_MODEL), synthesize(VOICE_CLONE_FALLBACK_MODEL))
+
+class AudioCache:
+    """按内容寻址的合成音频磁盘缓存，所有 worker 共用同一目录
+
+    文件名为 sha256(file_id + 模型 + 文本) 加扩展名，先写临时文件再原子替换；
+    命中时刷新修改时间，总大小超过 max_bytes 时按修改时间从旧到新删除。
+    """
+
+    AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg')
+    # 单个音频文件上限（防止异常响应写满磁盘）
+    MAX_FILE_BYTES = 64 * 1024 * 1024
+    URL_PREFIX = '/api/audio/'
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_id, text, model=None):
+        """缓存键；model 默认为当前的极速版模型（备选模型合成的音频也记在这个键下）"""
+        raw = f'{file_id}\n{model or VOICE_CLONE_MODEL}\n{text}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def is_valid_name(cls, name):
+        key, ext = os.path.splitext(name)
+        return len(key) == 64 and all(c in '0123456789abcdef' for c in key) and ext in cls.AUDIO_EXTENSIONS
+
+    @classmethod
+    def extension_of(cls, source_url):
+        ext = os.path.splitext(urlparse(source_url).path)[1].lower()
+        return ext if ext in cls.AUDIO_EXTENSIONS else '.mp3'
+
+    def url_for(self, name):
+        return f'{self.URL_PREFIX}{name}'
+
+    def lookup(self, key):
+        """返回已缓存的文件名（并刷新其修改时间），未缓存返回 None"""
+        for ext in self.AUDIO_EXTENSIONS:
+            name = key + ext
+            try:
+                os.utime(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            with self.lock:
+                self.hits += 1
+            return name
+        with self.lock:
+            self.misses += 1
+        return None
+
+    @contextmanager
+    def writer(self, key, ext):
+        """写入一个音频文件：yield write(chunk) 函数，正常退出后原子地放入缓存目录"""
+        name = key + ext
+        tmp_path = os.path.join(self.directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        written = [0]
+        try:
+            with open(tmp_path, 'wb') as f:
+                def write(chunk):
+                    written[0] += len(chunk)
+                    if written[0] > self.MAX_FILE_BYTES:
+                        raise Exception(f'音频文件超过 {self.MAX_FILE_BYTES} 字节，不缓存')
+                    f.write(chunk)
+                yield write
+            if written[0] == 0:
+                raise Exception('音频文件为空')
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def download(self, key, source_url):
+        """从上游音频地址下载到缓存，返回文件名"""
+        ext = self.extension_of(source_url)
+        response = get_upstream_session().get(source_url, stream=True, timeout=60)
+        with response:
+            response.raise_for_status()
+            with self.writer(key, ext) as write:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    write(chunk)
+        return key + ext
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and self.is_valid_name(entry.name):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的文件（其他 worker 同时删除时忽略）；max_bytes 为 None 时不淘汰"""
+        if self.max_bytes is None:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                with self.lock:
+                    self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        entries = self._entries()
+        with self.lock:
+            return {
+                'files': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+audio_cache = AudioCache(
+    VOICE_AUDIO_CACHE['dir'],
+    VOICE_AUDIO_CACHE['max_bytes'],
+) if VOICE_AUDIO_CACHE['enabled'] else None
+
+
+class PresynthManifest(JsonArtifact):
+    """预合成清单 manifest.json：音频缓存键 → 文件名
+
+    文件格式：{"version": 1, "model": ..., "entries": {键: {"file", "file_id", "speech_id", "chapter", ...}}}，
+    键与 AudioCache.make_key(file_id, 文本) 相同，音频文件与清单位于同一目录。
+    """
+
+    def __init__(self, directory):
+        super().__init__(os.path.join(directory, 'manifest.json'))
+        self.directory = directory
+
+    def build(self, data):
+        return {key: entry['file'] for key, entry in data.get('entries', {}).items()
+                if AudioCache.is_valid_name(entry.get('file', ''))}
+
+    def lookup(self, key):
+        """返回预合成音频的文件名（文件存在时），否则 None"""
+        name = self._get(key)
+        if name is not None and os.path.exists(os.path.join(self.directory, name)):
+            return name
+        return None
+
+
+presynth_manifest = PresynthManifest(VOICE_PRESYNTH_DIR)
+
+
+def find_stored_voice_clone_audio(key):
+    """不调用上游的音频来源：预合成清单优先，其次音频缓存；返回本站地址或 None"""
+    name = presynth_manifest.lookup(key)
+    if name is None and audio_cache is not None:
+        name = audio_cache.lookup(key)
+    return AudioCache.URL_PREFIX + name if name is not None else None
+
+
+def rehost_voice_clone_audio(key, source_url, fallback_url):
+    """把上游音频下载进缓存并返回本站地址；下载失败时返回 fallback_url（不影响本次播放）
+
+    下载使用上游原始地址：voice_clone_audio_url 的 HTTPS 转换只是为了浏览器播放。
+    """
+    try:
+        return audio_cache.url_for(audio_cache.download(key, source_url))
+    except Exception as e:
+        logger.warning(f"音频缓存下载失败，返回上游地址: {e}")
+        return fallback_url
+
+
+class ChunkedVoiceClone:
+    """长文本分段合成：按句子切分后在有界线程池中并行合成，GET 时按顺序流式输出已完成的片段
+
+    片段写在 <directory>/<键>/ 下（0.mp3、1.mp3 …，失败时为 N.error，count 为片段数），
+    任意 worker 都能按顺序读取并流式返回；同一文本只由先创建 owner 文件的进程合成。
+    再次请求同一文本时，失败的片段（N.error）由接到请求的进程重新合成（改名抢占，避免多个进程重复合成同一片段）。
+    全部完成后拼接为完整 MP3 放入音频缓存，之后的请求直接命中缓存（支持 Range）。
+    """
+
+    POLL_SECONDS = 0.2
+    # 片段目录保留时长（流式播放结束后完整音频已在音频缓存中）
+    KEEP_SECONDS = 24 * 3600
+    URL_PREFIX = '/api/audio/stream/'
+
+    def __init__(self, directory, chunk_chars, concurrency):
+        self.directory = directory
+        self.chunk_chars = chunk_chars
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+        self.remaining = {}
+        self._pool = None
+        self._pool_pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _executor(self):
+        with self.lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='voice-chunk')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def chunk_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def url_for(self, key):
+        return f'{self.URL_PREFIX}{key}.mp3'
+
+    def _claim(self, key):
+        """创建 owner 文件取得合成权；已有其他进程在合成（或已合成）时返回 False
+
+        owner 进程已退出且未完成时清掉旧片段后重试；其他进程同时在接管或清理（文件已被删除）时同样重试。
+        """
+        chunk_dir = self.chunk_dir(key)
+        path = os.path.join(chunk_dir, 'owner')
+        for _ in range(3):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path, 'r') as f:
+                        owner = f.read()
+                except FileNotFoundError:
+                    continue
+                owner_host, _, pid = owner.rpartition(':')
+                if (owner_host != socket.gethostname() or not pid.isdigit()
+                        or VoiceCloneJobs._process_alive(int(pid)) or self._complete(key)):
+                    return False
+                # 合成进程已退出且未完成：先删旧片段，owner 最后删（仍是同一个旧 owner 时）
+                try:
+                    for name in os.listdir(chunk_dir):
+                        if name != 'owner':
+                            try:
+                                os.remove(os.path.join(chunk_dir, name))
+                            except FileNotFoundError:
+                                pass
+                    with open(path, 'r') as f:
+                        if f.read() == owner:
+                            os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            except FileNotFoundError:
+                # 片段目录刚被 cleanup() 删除
+                os.makedirs(chunk_dir, exist_ok=True)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(f'{socket.gethostname()}:{os.getpid()}')
+            return True
+        return False
+
+    def _complete(self, key):
+        count = self._count(key)
+        return count is not None and all(
+            os.path.exists(os.path.join(self.chunk_dir(key), f'{i}.mp3')) for i in range(count)
+        )
+
+    def _count(self, key):
+        try:
+            with open(os.path.join(self.chunk_dir(key), 'count'), 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path, data):
+        self._write_chunks_atomic(path, [data])
+
+    def _write_chunks_atomic(self, path, chunks, max_bytes=None):
+        """逐块写入临时文件后原子替换；超过 max_bytes 时放弃并删除临时文件"""
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    written += len(chunk)
+                    if max_bytes is not None and written > max_bytes:
+                        raise Exception(f'音频文件超过 {max_bytes} 字节')
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def start(self, key, file_id, text, voice_description='未知'):
+        """开始（或复用进行中的）分段合成，返回流式播放地址"""
+        self.cleanup()
+        os.makedirs(self.chunk_dir(key), exist_ok=True)
+        if self._claim(key):
+            chunks = split_voice_clone_text(text, self.chunk_chars)
+            self._write_atomic(os.path.join(self.chunk_dir(key), 'count'), str(len(chunks)).encode())
+            logger.info(f"分段合成开始 - 文本长度: {len(text)}, 片段数: {len(chunks)}")
+            with self.lock:
+                self.remaining[key] = len(chunks)
+            pool = self._executor()
+            for index, chunk in enumerate(chunks):
+                pool.submit(self._synthesize_chunk, key, index, file_id, chunk, voice_description)
+        else:
+            self._retry_failed(key, file_id, text, voice_description)
+        return self.url_for(key)
+
+    def _retry_failed(self, key, file_id, text, voice_description):
+        """重新合成失败的片段：先把 N.error 改名（只有一个进程能成功），再提交合成"""
+        count = self._count(key)
+        if count is None:
+            return
+        chunks = None
+        for index in range(count):
+            path = os.path.join(self.chunk_dir(key), f'{index}.error')
+            claimed = f'{path}.{os.getpid()}.{threading.get_ident()}.retry'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            os.remove(claimed)
+            if chunks is None:
+                chunks = split_voice_clone_text(text, self.chunk_chars)
+            logger.info(f"分段合成重试 - 片段 {index}/{count}")
+            with self.lock:
+                self.remaining[key] = self.remaining.get(key, 0) + 1
+            self._executor().submit(self._synthesize_chunk, key, index, file_id, chunks[index], voice_description)
+
+    def _synthesize_chunk(self, key, index, file_id, text, voice_description):
+        path = os.path.join(self.chunk_dir(key), str(index))
+        try:
+            result = call_voice_clone_api(file_id, text, voice_description)
+            response = get_upstream_session().get(result['demo_audio'], stream=True, timeout=60)
+            with response:
+                response.raise_for_status()
+                self._write_chunks_atomic(
+                    f'{path}.mp3', response.iter_content(chunk_size=64 * 1024), max_bytes=AudioCache.MAX_FILE_BYTES
+                )
+        except Exception as e:
+            logger.error(f"分段合成失败 - 片段 {index}: {e}")
+            self._write_atomic(f'{path}.error', str(e).encode('utf-8'))
+        with self.lock:
+            self.remaining[key] -= 1
+            finished = self.remaining[key] == 0
+            if finished:
+                del self.remaining[key]
+        if finished:
+            self._assemble(key)
+
+    def _assemble(self, key):
+        """全部片段成功后拼接为完整音频放入音频缓存"""
+        count = self._count(key)
+        if audio_cache is None or not self._complete(key):
+            return
+        try:
+            with audio_cache.writer(key, '.mp3') as write:
+                for index in range(count):
+                    with open(os.path.join(self.chunk_dir(key), f'{index}.mp3'), 'rb') as f:
+                        data = f.read()
+                    write(data if index == 0 else strip_id3v2(data))
+            logger.info(f"分段合成完成 - 片段数: {count}")
+        except Exception as e:
+            logger.error(f"分段音频拼接失败: {e}")
+
+    def iter_audio(self, key):
+        """按顺序产出各片段的音频数据，等待尚未完成的片段；某段失败或超时即结束"""
+        chunk_dir = self.chunk_dir(key)
+        timeout = VOICE_CLONE_POLICY.deadline + 30
+        count = None
+        index = 0
+        waited_since = time.monotonic()
+        while count is None or index < count:
+            if count is None:
+                count = self._count(key)
+            path = os.path.join(chunk_dir, str(index))
+            if count is not None and os.path.exists(f'{path}.mp3'):
+                with open(f'{path}.mp3', 'rb') as f:
+                    data = f.read()
+                yield data if index == 0 else strip_id3v2(data)
+                index += 1
+                waited_since = time.monotonic()
+                continue
+            if os.path.exists(f'{path}.error') or time.monotonic() - waited_since > timeout:
+                logger.warning(f"分段音频流提前结束 - 片段 {index}/{count}")
+                return
+            time.sleep(self.POLL_SECONDS)
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.chunk_dir(key), 'owner'))
+
+    def cleanup(self):
+        """删除超过 KEEP_SECONDS 的片段目录（不在合成中的）"""
+        cutoff = time.time() - self.KEEP_SECONDS
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_dir() and AudioCache.is_valid_name(entry.name + '.mp3'):
+                    try:
+                        if entry.stat().st_mtime < cutoff and entry.name not in self.remaining:
+                            for name in os.listdir(entry.path):
+                                os.remove(os.path.join(entry.path, name))
+                            os.rmdir(entry.path)
+                    except OSError:
+                        pass
+
+
+chunked_voice_clone = ChunkedVoiceClone(
+    os.path.join(CACHE_DIR, 'audio-chunks'),
+    chunk_chars=VOICE_CHUNKED['chunk_chars'],
+    concurrency=VOICE_CHUNKED['concurrency'],
+) if VOICE_CHUNKED['enabled'] else None
+
+
+def synthesize_voice_clone(file_id, text, voice_description='未知'):
+    """合成一段文本并返回 (audio_url, cached)：先查预合成清单和音频缓存，再调用 MiniMax
+
+    超过单次上限的文本改为分段合成，立即返回流式播放地址。
+    """
+    cache_key = AudioCache.make_key(file_id, text)
+    stored_url = find_stored_voice_clone_audio(cache_key)
+    if stored_url is not None:
+        return stored_url, True
+
+    check_voice_clone_text_length(text)
+    require_api_key()
+
+    if needs_chunked_synthesis(text):
+        return chunked_voice_clone.start(cache_key, file_id, text, voice_description), False
+
+    result = call_voice_clone_api(file_id, text, voice_description)
+    # 返回音频 URL（启用缓存时下载到本地，由本站提供）
+    audio_url = voice_clone_audio_url(result)
+    if audio_cache is not None:
+        audio_url = rehost_voice_clone_audio(cache_key, result['demo_audio'], audio_url)
+    return audio_url, False
+
+
+# ---------- 音色复刻异步任务 ----------
+
+class VoiceCloneJobs:
+    """音色复刻异步任务：提交后立即返回任务 ID，由后台线程合成，客户端轮询或订阅 SSE 获取结果
+
+    任务状态保存在所有 worker 共享的 SQLite 文件中，任意 worker 都能回答状态查询；
+    合成在接收任务的 worker 的线程池中执行。排队总数与每个 IP 的进行中任务数在同一事务中检查，
+    超过上限分别返回 503 / 429。执行任务的进程（owner）已退出，或运行中的任务超过 stale_seconds
+    未更新时，任务标记为失败。
+    """
+
+    ACTIVE = ('queued', 'running')
+
+    def __init__(self, path, workers, max_queue, per_ip, ttl):
+        self.max_queue = max_queue
+        self.per_ip = per_ip
+        self.ttl = ttl
+        self.workers = workers
+        # 运行中的任务超过这么久没有结果视为中断（合成最长受 VOICE_CLONE_POLICY 截止时间约束）
+        self.stale_seconds = VOICE_CLONE_POLICY.deadline + 60
+        self.db = SharedSQLite(path, schema=(
+            'CREATE TABLE IF NOT EXISTS voice_jobs ('
+            ' id TEXT PRIMARY KEY, client_ip TEXT NOT NULL, status TEXT NOT NULL,'
+            ' file_id INTEGER NOT NULL, text TEXT NOT NULL, voice_description TEXT,'
+            ' audio_url TEXT, error TEXT, cached INTEGER NOT NULL DEFAULT 0, owner TEXT NOT NULL,'
+            ' created_at REAL NOT NULL, updated_at REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS voice_jobs_status ON voice_jobs (status, client_ip)',
+        ))
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='voice-job')
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def submit(self, client_ip, file_id, text, voice_description):
+        """登记并排队一个任务，返回任务 ID；超过上限时抛出 ApiError"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            self._expire_stale(conn, now)
+            (active,) = conn.execute(
+                'SELECT COUNT(*) FROM voice_jobs WHERE status IN (?, ?)', self.ACTIVE
+            ).fetchone()
+            if active >= self.max_queue:
+                raise ApiError({'error': '合成任务排队已满，请稍后重试', 'retryable': True}, 503)
+            (mine,) = conn.execute(
+                'SELECT COUNT(*) FROM voice_jobs WHERE status IN (?, ?) AND client_ip = ?', (*self.ACTIVE, client_ip)
+            ).fetchone()
+            if mine >= self.per_ip:
+                raise ApiError({'error': f'同时最多进行 {self.per_ip} 个合成任务，请等待完成后再试'}, 429)
+            conn.execute(
+                'INSERT INTO voice_jobs (id, client_ip, status, file_id, text, voice_description, owner, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, client_ip, 'queued', file_id, text, voice_description, self._owner(), now, now)
+            )
+            conn.execute('DELETE FROM voice_jobs WHERE status NOT IN (?, ?) AND updated_at < ?', (*self.ACTIVE, now - self.ttl))
+        self._executor().submit(self._run, job_id, file_id, text, voice_description)
+        return job_id
+
+    @staticmethod
+    def _owner():
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    @staticmethod
+    def _process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    def _expire_stale(self, conn, now):
+        """把执行进程已退出（同一台机器上可判断）或运行超时的任务标记为失败"""
+        host = socket.gethostname()
+        dead = []
+        for (owner,) in conn.execute('SELECT DISTINCT owner FROM voice_jobs WHERE status IN (?, ?)', self.ACTIVE):
+            owner_host, _, pid = owner.rpartition(':')
+            if owner_host == host and pid.isdigit() and not self._process_alive(int(pid)):
+                dead.append(owner)
+        message = '合成任务中断，请重试'
+        for owner in dead:
+            conn.execute(
+                "UPDATE voice_jobs SET status = 'error', error = ?, updated_at = ? WHERE status IN (?, ?) AND owner = ?",
+                (message, now, *self.ACTIVE, owner)
+            )
+        conn.execute(
+            "UPDATE voice_jobs SET status = 'error', error = ?, updated_at = ? WHERE status = 'running' AND updated_at < ?",
+            (message, now, now - self.stale_seconds)
+        )
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self.db.transaction() as conn:
+            conn.execute(f'UPDATE voice_jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def _run(self, job_id, file_id, text, voice_description):
+        self._update(job_id, status='running')
+        try:
+            audio_url, cached = synthesize_voice_clone(file_id, text, voice_description)
+        except ApiError as e:
+            self._update(job_id, status='error', error=e.payload.get('error', '合成失败'))
+        except requests.exceptions.Timeout:
+            self._update(job_id, status='error', error='请求超时，请稍后重试')
+        except requests.exceptions.ConnectionError:
+            self._update(job_id, status='error', error='网络连接失败')
+        except Exception as e:
+            logger.error(f"音色复刻任务失败 - job: {job_id}, 错误: {e}")
+            self._update(job_id, status='error', error=str(e))
+        else:
+            logger.info(f"音色复刻任务完成 - job: {job_id}")
+            self._update(job_id, status='done', audio_url=audio_url, cached=int(cached))
+
+    def _is_stale(self, status, owner, updated_at):
+        if status == 'running' and time.time() - updated_at > self.stale_seconds:
+            return True
+        owner_host, _, pid = owner.rpartition(':')
+        return owner_host == socket.gethostname() and pid.isdigit() and not self._process_alive(int(pid))
+
+    def get(self, job_id):
+        """任务状态字典；不存在时返回 None"""
+        conn = self.db.connect()
+        row = conn.execute(
+            'SELECT status, audio_url, error, cached, owner, created_at, updated_at FROM voice_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, audio_url, error, cached, owner, created_at, updated_at = row
+        if status in self.ACTIVE and self._is_stale(status, owner, updated_at):
+            with self.db.transaction() as conn:
+                self._expire_stale(conn, time.time())
+            return self.get(job_id)
+        job = {'job_id': job_id, 'status': status}
+        if status == 'queued':
+            (ahead,) = conn.execute(
+                "SELECT COUNT(*) FROM voice_jobs WHERE status = 'queued' AND created_at < ?", (created_at,)
+            ).fetchone()
+            job['position'] = ahead + 1
+        elif status == 'done':
+            job.update(audio_url=audio_url, cached=bool(cached))
+        elif status == 'error':
+            job['error'] = error
+        return job
+
+    def stats(self):
+        try:
+            rows = self.db.connect().execute('SELECT status, COUNT(*) FROM voice_jobs GROUP BY status').fetchall()
+        except sqlite3.Error as e:
+            return {'error': str(e)}
+        return {'workers': self.workers, 'max_queue': self.max_queue, 'per_ip': self.per_ip, **dict(rows)}
+
+
+voice_jobs = VoiceCloneJobs(
+    os.path.join(CACHE_DIR, 'voice_jobs.sqlite3'),
+    workers=VOICE_JOBS['workers'],
+    max_queue=VOICE_JOBS['max_queue'],
+    per_ip=VOICE_JOBS['per_ip'],
+    ttl=VOICE_JOBS['ttl_seconds'],
+) if VOICE_JOBS['enabled'] else None
+
+# SSE 订阅时查询任务状态的间隔
+VOICE_JOB_POLL_SECONDS = 0.5
+
+
+# /api/words 每页默认与最多返回的单词数
+WORDS_API_DEFAULT_LIMIT = 20
+WORDS_API_MAX_LIMIT = 100
+
+WORDS_QUERY_PARAMS = ('prefix', 'word', 'meaning', 'category', 'book', 'unit')
+
 
-def call_minimax_api(question, enable_web_search=False):
-    """调用 MiniMax API"""
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {API_KEY}'
-    }
-    
-    messages = [
-        {
-            'role': 'system',
-            'content': '''You are an English learning assistant for primary school students. 
-Help explain English words, sentences, and grammar in a clear and simple way.
-Use Chinese to explain when helpful.
-Format your response with clear structure using headings and bullet points.
-Respond in Simplified Chinese with Chinese punctuation.'''
-        },
-        {
-            'role': 'user',
-            'content': question
-        }
-    ]
-    
-    data = {
-        'model': MINIMAX_MODEL,
-        'messages': messages,
-        'temperature': 0.7,
-        'max_tokens': 1000
-    }
-    
-    # 启用联网搜索功能
-    if enable_web_search:
-        data['tools'] = [{"type": "web_search"}]
-        data['tool_choice'] = "auto"
-    
+def parse_words_query(args):
+    """解析 GET /api/words 的查询参数，返回 (criteria, offset, limit)"""
+    criteria = {name: args.get(name, '').strip() or None for name in WORDS_QUERY_PARAMS}
+    if criteria['unit'] is not None and criteria['book'] is None:
+        raise ApiError({'error': 'unit 参数需要同时指定 book'}, 400)
     try:
-        response = requests.post(
-            MINIMAX_API_URL,
-            headers=headers,
-            json=data,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"MiniMax API HTTP 错误: {e}")
-        error_data = e.response.json() if e.response else {}
-        raise Exception(f"API 请求失败: {error_data.get('base_resp', {}).get('msg', str(e))}")
-    except Exception as e:
-        logger.error(f"MiniMax API 错误: {e}")
-        raise Exception(f"API 请求失败: {str(e)}")
+        offset = int(args.get('offset', 0))
+        limit = int(args.get('limit', WORDS_API_DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError({'error': 'offset 和 limit 必须是整数'}, 400)
+    if offset < 0 or limit < 1:
+        raise ApiError({'error': 'offset 不能为负数，limit 至少为 1'}, 400)
+    return criteria, offset, min(limit, WORDS_API_MAX_LIMIT)
+
+
+# /api/words/suggest：每个答案默认与最多返回的建议数、一次最多提交的答案数、单个答案的最大长度
+SUGGEST_API_DEFAULT_LIMIT = 5
+SUGGEST_API_MAX_LIMIT = 20
+SUGGEST_API_MAX_ANSWERS = 200
+SUGGEST_API_MAX_ANSWER_LENGTH = 50
+
+
+def parse_suggest_request(args, data):
+    """解析 /api/words/suggest：GET ?q=；POST {answers: [...], limit?}。返回 (answers, limit)"""
+    if request.method == 'POST':
+        if not isinstance(data, dict) or not isinstance(data.get('answers'), list):
+            raise ApiError({'error': '请求体需要 answers 数组'}, 400)
+        answers = data['answers']
+        if len(answers) > SUGGEST_API_MAX_ANSWERS:
+            raise ApiError({'error': f'一次最多 {SUGGEST_API_MAX_ANSWERS} 个答案'}, 400)
+        if not all(isinstance(answer, str) for answer in answers):
+            raise ApiError({'error': 'answers 只能包含字符串'}, 400)
+        limit = data.get('limit', SUGGEST_API_DEFAULT_LIMIT)
+    else:
+        answers = [args.get('q', '')]
+        limit = args.get('limit', SUGGEST_API_DEFAULT_LIMIT)
+    if any(len(answer) > SUGGEST_API_MAX_ANSWER_LENGTH for answer in answers):
+        raise ApiError({'error': f'单个答案不能超过 {SUGGEST_API_MAX_ANSWER_LENGTH} 个字符'}, 400)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ApiError({'error': 'limit 必须是整数'}, 400)
+    if limit < 1:
+        raise ApiError({'error': 'limit 至少为 1'}, 400)
+    return answers, min(limit, SUGGEST_API_MAX_LIMIT)
+
+
+# /api/search 每页默认与最多返回的段落数、查询的最大长度
+SEARCH_API_DEFAULT_LIMIT = 10
+SEARCH_API_MAX_LIMIT = 50
+SEARCH_API_MAX_QUERY_LENGTH = 100
+
+
+def parse_search_query(args):
+    """解析 GET /api/search 的查询参数，返回 (query, source, offset, limit)"""
+    query = args.get('q', '').strip()
+    if not query:
+        raise ApiError({'error': '请提供查询内容 q'}, 400)
+    if len(query) > SEARCH_API_MAX_QUERY_LENGTH:
+        raise ApiError({'error': f'查询内容不能超过 {SEARCH_API_MAX_QUERY_LENGTH} 个字符'}, 400)
+    source = args.get('source', '').strip() or None
+    if source is not None and source not in search_index.SOURCES:
+        raise ApiError({'error': f"source 只能是 {' / '.join(search_index.SOURCES)}"}, 400)
+    try:
+        offset = int(args.get('offset', 0))
+        limit = int(args.get('limit', SEARCH_API_DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError({'error': 'offset 和 limit 必须是整数'}, 400)
+    if offset < 0 or limit < 1:
+        raise ApiError({'error': 'offset 不能为负数，limit 至少为 1'}, 400)
+    return query, source, offset, min(limit, SEARCH_API_MAX_LIMIT)
+
 
 # ========== API 路由 ==========
 
+@app.route('/api/words', methods=['GET'])
+def words_api():
+    """单词查询：prefix（联想）、word（精确）、meaning（释义包含）、category、book、unit 可任意组合，offset + limit 分页
+
+    返回 {total, offset, limit, words}；有 prefix 或 word 时按字母顺序，否则按词书顺序。
+    """
+    try:
+        criteria, offset, limit = parse_words_query(request.args)
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+    total, words = word_lookup.query(offset, limit, **criteria)
+    return cors_json({'total': total, 'offset': offset, 'limit': limit, 'words': words})
+
+@app.route('/api/search', methods=['GET'])
+def search_api():
+    """阅读对话 / 句型与听书段落的全文检索：q 为英文或中文，source 可限定 reading / listen，offset + limit 分页
+
+    返回 {total, offset, limit, results}，结果按 BM25 得分降序，每条含 snippet 与 highlights（摘要内的命中区间）。
+    """
+    try:
+        query, source, offset, limit = parse_search_query(request.args)
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+    found = passage_search.search(query, offset, limit, source)
+    if found is None:
+        return cors_json({'error': '检索索引未生成，请运行 ./optools.sh build-data'}, 503)
+    total, results = found
+    return cors_json({'total': total, 'offset': offset, 'limit': limit, 'results': results})
+
+@app.route('/api/words/suggest', methods=['GET', 'POST', 'OPTIONS'])
+def word_suggest_api():
+    """听写答案拼写纠错：编辑距离 2 以内最接近的单词 / 例句词
+
+    GET ?q=答案 → {query, suggestions}；POST {answers: [...]}（一次批改整组听写）→ {results: [{query, suggestions}]}。
+    每条建议含 term、distance、count（在单词与例句中出现的次数）、wordId（例句词为 null）。
+    """
+    if request.method == 'OPTIONS':
+        return cors_preflight()
+    try:
+        answers, limit = parse_suggest_request(request.args, request.get_json(silent=True))
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+    results = [
+        {'query': answer, 'suggestions': suggestions}
+        for answer, suggestions in zip(answers, word_lookup.suggest(answers, limit))
+    ]
+    if request.method == 'POST':
+        return cors_json({'results': results})
+    return cors_json(results[0])
+
+@app.route('/api/words/<word_id>', methods=['GET'])
+def word_api(word_id):
+    """按 ID（如 grade5-upper-u1-w1）返回单个单词"""
+    word = word_lookup.get(word_id)
+    if word is None:
+        return cors_json({'error': '单词不存在'}, 404)
+    return cors_json(word)
+
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
 def chat_api():
     """AI 问答 API 代理"""
-    
+
     # 处理 CORS 预检请求
     if request.method == 'OPTIONS':
-        response = make_response()
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
-        return response
-    
+        return cors_preflight()
+
     # 获取客户端 IP
     client_ip = request.remote_addr or 'unknown'
-    
+
     # 检查速率限制
     allowed, message = check_rate_limit(client_ip)
     if not allowed:
         logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: {message}")
-        response = jsonify({'error': message})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 429
-    
+        return cors_json({'error': message}, 429)
+
     # 解析请求
-    data = request.get_json()
-    if not data or 'question' not in data:
-        response = jsonify({'error': '请提供问题内容'})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
-    
-    question = data['question'].strip()
-    if not question:
-        response = jsonify({'error': '问题不能为空'})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
-    
-    # 获取是否启用联网搜索
-    enable_web_search = data.get('enable_web_search', False)
-    
+    try:
+        question, enable_web_search = parse_chat_request(request.get_json())
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+
     # 记录请求
     logger.info(f"API 请求 - IP: {client_ip}, 问题长度: {len(question)}")
-    
+
     try:
+        # 预生成的单词讲解或相同问题的缓存回答直接返回
+        answer, source = lookup_chat_answer(question, enable_web_search)
+        if answer is not None:
+            logger.info(f"API 缓存命中（{source}） - IP: {client_ip}")
+            return cors_json({'answer': answer, 'cached': True})
+
         # 检查 API Key
-        if not API_KEY:
-            response = jsonify({
-                'error': '服务器未配置 API Key',
-                'help': '请设置环境变量 MINIMAX_API_KEY 或编辑 server.py'
-            })
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            return response, 500
-        
-        # 调用 MiniMax API
+        require_api_key()
+
+        # 调用 MiniMax API（相同问题的并发请求只调用一次）
         logger.info(f"API 请求 - 启用联网搜索: {enable_web_search}")
-        result = call_minimax_api(question, enable_web_search)
-        
-        # 解析响应 - 尝试多种可能的格式
-        answer = None
-        
-        # 格式1: OpenAI 兼容格式 choices[0].message.content
-        if result.get('choices') and len(result['choices']) > 0:
-            choice = result['choices'][0]
-            if 'message' in choice:
-                answer = choice.get('message', {}).get('content')
-            elif 'delta' in choice:
-                answer = choice.get('delta', {}).get('content')
-            elif 'text' in choice:
-                answer = choice.get('text')
-        
-        # 格式2: 直接返回文本
-        if answer is None and 'text' in result:
-            answer = result['text']
-        
-        # 格式3: base_resp 中可能包含文本
-        if answer is None and result.get('base_resp'):
-            answer = result['base_resp'].get('content') or result['base_resp'].get('text')
-        
-        if answer:
-            response_data = {'answer': answer}
-        else:
-            logger.error(f"API 响应格式异常: {result}")
-            raise Exception('API 响应格式错误，无法提取回答内容')
-        
-        logger.info(f"API 成功 - IP: {client_ip}")
-        response = jsonify(response_data)
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response
-        
+        answer, coalesced = answer_chat_question(question, enable_web_search)
+
+        logger.info(f"API 成功 - IP: {client_ip}{'（合并请求）' if coalesced else ''}")
+        return cors_json({'answer': answer})
+
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
     except Exception as e:
         logger.error(f"API 错误 - IP: {client_ip}, 错误: {str(e)}")
-        response = jsonify({'error': str(e)})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 500
+        return cors_json({'error': str(e)}, 500)
+
+@app.route('/api/chat/stream', methods=['POST', 'OPTIONS'])
+def chat_stream_api():
+    """AI 问答流式接口：请求体同 /api/chat，回答以 SSE 事件逐段返回
+
+    事件：delta {text} 若干条 → done {cached}；中途失败时发送 error {error}。
+    请求校验失败（速率限制、参数错误等）仍返回与 /api/chat 相同的 JSON 错误。
+    """
+
+    # 处理 CORS 预检请求
+    if request.method == 'OPTIONS':
+        return cors_preflight()
+
+    # 获取客户端 IP
+    client_ip = request.remote_addr or 'unknown'
+
+    # 检查速率限制
+    allowed, message = check_rate_limit(client_ip)
+    if not allowed:
+        logger.warning(f"速率限制触发 - IP: {client_ip}, 原因: {message}")
+        return cors_json({'error': message}, 429)
+
+    try:
+        question, enable_web_search = parse_chat_request(request.get_json())
+        logger.info(f"API 流式请求 - IP: {client_ip}, 问题长度: {len(question)}")
+
+        answer, source = lookup_chat_answer(question, enable_web_search)
+        if answer is not None:
+            logger.info(f"API 缓存命中（{source}） - IP: {client_ip}")
+            return sse_response(iter([
+                sse_event('delta', {'text': answer}),
+                sse_event('done', {'cached': True}),
+            ]))
+
+        require_api_key()
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+
+    def generate():
+        # 与 answer_chat_question 相同的合并规则：leader 流式转发，跟随者等 leader 完成后一次性返回
+        key = ChatAnswerCache.make_key(question, enable_web_search)
+        call, leader = chat_flights.begin(key)
+        try:
+            if not leader:
+                answer = wait_for_chat_leader(call)
+                yield sse_event('delta', {'text': answer})
+                yield sse_event('done', {'cached': False, 'coalesced': True})
+                return
+            yield from _stream_as_leader(key, call)
+        except Exception as e:
+            logger.error(f"API 流式错误 - IP: {client_ip}, 错误: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+
+    def _stream_as_leader(key, call):
+        outcome = {'answer': None}
+        try:
+            yield from _leader_events(key, outcome)
+        except BaseException as e:
+            # 包括客户端断开（GeneratorExit）：通知等待中的跟随者，避免一直阻塞
+            chat_flights.finish(key, call, error=e if isinstance(e, Exception) else Exception('请求已取消'))
+            raise
+        chat_flights.finish(key, call, result=outcome['answer'])
+
+    def _leader_events(key, outcome):
+        shared = chat_cache is not None and chat_cache.db is not None
+        answer = claim_chat_flight(key) if shared else None
+        if answer is not None:
+            outcome['answer'] = answer
+            yield sse_event('delta', {'text': answer})
+            yield sse_event('done', {'cached': False, 'coalesced': True})
+            return
+        try:
+            parts = []
+            for text in stream_minimax_api(question, enable_web_search):
+                parts.append(text)
+                yield sse_event('delta', {'text': text})
+            answer = ''.join(parts)
+            if not answer:
+                raise Exception('API 响应格式错误，无法提取回答内容')
+            if chat_cache is not None:
+                chat_cache.put(question, enable_web_search, answer)
+            outcome['answer'] = answer
+        finally:
+            if shared:
+                chat_cache.release_flight(key)
+        logger.info(f"API 流式成功 - IP: {client_ip}")
+        yield sse_event('done', {'cached': False})
+
+    return sse_response(generate())
 
 @app.route('/api/status', methods=['GET'])
 def api_status():
-    """API 状态检查"""
+    """API 状态检查（页面加载时调用：只返回配置，不统计各组件）"""
     # 检查是否有已配置的语音
-    configured_voices = [v for v in MINIMAX_VOICE_CLONE_VOICES if v.get('file_id', 0) > 0]
-    
+    configured_voices = configured_voice_clone_voices()
+
     return jsonify({
         'status': 'ok',
         'api_configured': bool(API_KEY),
         'rate_limit': RATE_LIMIT,
         'voice_clone': {
+            'chunked': {'enabled': VOICE_CHUNKED['enabled'], 'max_chars': VOICE_CHUNKED['max_chars']},
             'voices': MINIMAX_VOICE_CLONE_VOICES,
             'configured': len(configured_voices) > 0,
             'default_voice': configured_voices[0] if configured_voices else None
         }
     })
 
+@app.route('/api/status/details', methods=['GET'])
+def api_status_details():
+    """运维诊断：各组件计数与大小、共享文件路径等（需 Authorization: Bearer <STATUS_DETAILS_TOKEN>）"""
+    authorization = request.headers.get('Authorization', '')
+    if not STATUS_DETAILS_TOKEN or not hmac.compare_digest(
+            authorization.encode('utf-8'), f'Bearer {STATUS_DETAILS_TOKEN}'.encode('utf-8')):
+        abort(404)
+
+    return jsonify({
+        'rate_limit_backend': rate_limiter.stats(),
+        'chat_cache': chat_cache.stats() if chat_cache is not None else {'enabled': False},
+        'word_explanations': word_explanations.stats(),
+        'words': word_lookup.stats(),
+        'search': passage_search.stats(),
+        'static': static_assets.stats(),
+        'upstream_policy': {'chat': CHAT_POLICY.stats(), 'voice_clone': VOICE_CLONE_POLICY.stats()},
+        'chat_single_flight': {
+            'in_flight': chat_flights.in_flight(),
+            'coalesced': chat_cache.counter('coalesced') if chat_cache is not None else chat_flights.coalesced,
+        },
+        'voice_clone': {
+            'audio_cache': audio_cache.stats() if audio_cache is not None else {'enabled': False},
+            'presynthesized': presynth_manifest.stats(),
+            'jobs': voice_jobs.stats() if voice_jobs is not None else {'enabled': False},
+        }
+    })
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """健康检查端点"""
-    response = jsonify({
-        'status': 'ok',
+    """健康检查端点（上游熔断时 status 为 degraded，本服务仍可用，因此仍返回 200）"""
+    upstream = {
+        policy.name: policy.breaker.state() if policy.breaker is not None else 'closed'
+        for policy in (CHAT_POLICY, VOICE_CLONE_POLICY)
+    }
+    return cors_json({
+        'status': 'ok' if all(state == 'closed' for state in upstream.values()) else 'degraded',
         'service': 'english-ai-assistant',
+        'upstream': upstream,
         'timestamp': datetime.now().isoformat()
     })
-    response.headers['Access-Control-Allow-Origin'] = '*'
-    return response
 
 @app.route('/api/voice-clone', methods=['POST', 'OPTIONS'])
 def voice_clone_api():
@@ -329,11 +3220,7 @@ def voice_clone_api():
 
     # 处理 CORS 预检请求
     if request.method == 'OPTIONS':
-        response = make_response()
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
-        return response
+        return cors_preflight()
 
     # 获取客户端 IP
     client_ip = request.remote_addr or 'unknown'
@@ -342,227 +3229,170 @@ def voice_clone_api():
     allowed, message = check_rate_limit(client_ip)
     if not allowed:
         logger.warning(f"音色复刻速率限制触发 - IP: {client_ip}, 原因: {message}")
-        response = jsonify({'error': message})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 429
-
-    # 检查音色复刻配置
-    configured_voices = [v for v in MINIMAX_VOICE_CLONE_VOICES if v.get('file_id', 0) > 0]
-    if len(configured_voices) == 0:
-        response = jsonify({
-            'error': '音色复刻未配置',
-            'help': '请在 api_config.py 中设置 MINIMAX_VOICE_CLONE_VOICES'
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
+        return cors_json({'error': message}, 429)
 
     # 解析请求
-    data = request.get_json()
-    if not data:
-        response = jsonify({'error': '请提供请求数据'})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
+    try:
+        text, selected_voice = parse_voice_clone_request(request.get_json())
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
 
-    text = data.get('text', '').strip()
-    
-    # 获取请求的 file_id（可选，如果未提供则使用默认语音）
-    requested_file_id = data.get('file_id')
-    
-    # 查找对应的语音配置
-    selected_voice = None
-    if requested_file_id:
-        # 如果前端指定了 file_id，查找对应的语音
-        for voice in configured_voices:
-            if voice.get('file_id') == requested_file_id:
-                selected_voice = voice
-                break
-        if not selected_voice:
-            response = jsonify({
-                'error': '无效的语音 ID',
-                'help': '请选择有效的语音'
-            })
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            return response, 400
-    else:
-        # 使用默认语音
-        selected_voice = configured_voices[0]
-    
     file_id = selected_voice['file_id']
     voice_description = selected_voice.get('description', '未知')
 
-    if not text:
-        response = jsonify({'error': '请提供要合成的声音文本'})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
-
-    # 文本长度校验（MiniMax 同步语音合成单次最长 10,000 字符）
-    MAX_TEXT_LENGTH = 10000
-    if len(text) > MAX_TEXT_LENGTH:
-        response = jsonify({
-            'error': '文本长度超过限制',
-            'details': f'当前长度: {len(text)} 字符, 最大允许: {MAX_TEXT_LENGTH} 字符',
-            'suggestion': '请分段朗读或选择较短的章节'
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 400
-
-    # 生成唯一的 voice_id（基于时间戳和随机数）
-    import uuid
-    voice_id = f"voice-{int(time.time())}-{str(uuid.uuid4())[:8]}"
-
     # 记录请求
-    logger.info(f"音色复刻请求 - IP: {client_ip}, 文本长度: {len(text)}, voice_id: {voice_id}")
+    logger.info(f"音色复刻请求 - IP: {client_ip}, 文本长度: {len(text)}, 语音: {voice_description}")
 
     try:
-        # 检查 API Key
-        if not API_KEY:
-            response = jsonify({
-                'error': '服务器未配置 API Key',
-                'help': '请设置环境变量 MINIMAX_API_KEY 或编辑 server.py'
-            })
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            return response, 500
-
-        # 调用 MiniMax 音色复刻 API
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {API_KEY}'
-        }
-
-        # 构建请求数据（使用选择的 file_id，每次生成唯一的 voice_id）
-        # 使用 speech-2.6-turbo 极速版，更快更优惠，适用于语音聊天和数字人场景
-        clone_data = {
-            'file_id': file_id,
-            'voice_id': voice_id,
-            'text': text,
-            'model': 'speech-2.6-turbo'  # 极速版，更快更优惠
-        }
-
-        logger.info(f"调用 MiniMax 音色复刻 API - voice_id: {voice_id}, 语音: {voice_description}, 模型: speech-2.6-turbo")
-
-        # 添加重试机制
-        max_retries = 2
-        retry_count = 0
-        last_error = None
-
-        while retry_count <= max_retries:
-            try:
-                response = requests.post(
-                    'https://api.minimaxi.com/v1/voice_clone',
-                    headers=headers,
-                    json=clone_data,
-                    timeout=45,  # 45秒超时（给 iOS 更多时间）
-                    verify=True  # SSL 验证
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                logger.info(f"MiniMax 音色复刻 API 响应: {result}")
-                break  # 成功，跳出重试循环
-
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                retry_count += 1
-                last_error = e
-                logger.warning(f"MiniMax API 第 {retry_count} 次重试失败: {e}")
-
-                if retry_count > max_retries:
-                    logger.error(f"MiniMax API 重试次数耗尽: {e}")
-                    raise Exception(f"网络连接超时，请检查网络设置 ({retry_count} 次尝试)")
-                else:
-                    # 等待后重试
-                    time.sleep(1)
-
-        # 检查响应
-        if result.get('base_resp', {}).get('status_msg') != 'success':
-            error_msg = result.get('base_resp', {}).get('status_msg', '未知错误')
-
-            # 如果极速版模型失败，尝试使用高质量模型作为备选
-            if 'speech-2.6-turbo' in clone_data.get('model', ''):
-                logger.warning(f"极速版模型失败，尝试使用高质量模型 - voice_id: {voice_id}")
-                clone_data['model'] = 'speech-2.8-hd'
-
-                response = requests.post(
-                    'https://api.minimaxi.com/v1/voice_clone',
-                    headers=headers,
-                    json=clone_data,
-                    timeout=60  # 高质量模型需要更长时间
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                # 再次检查响应
-                if result.get('base_resp', {}).get('status_msg') != 'success':
-                    error_msg = result.get('base_resp', {}).get('status_msg', '未知错误')
-                    raise Exception(f"音色复刻失败: {error_msg}")
-            else:
-                raise Exception(f"音色复刻失败: {error_msg}")
-
-        # 返回音频 URL
-        audio_url = result.get('demo_audio', '')
-        if not audio_url:
-            raise Exception('音色复刻 API 未返回音频 URL')
-
-        # 处理 HTTP/HTTPS 问题（iOS 需要 HTTPS）
-        if audio_url.startswith('http://'):
-            # 尝试转换为 HTTPS
-            https_url = audio_url.replace('http://', 'https://')
-            # 记录原始 URL 和转换后的 URL
-            logger.info(f"原始音频 URL (HTTP): {audio_url}")
-            logger.info(f"转换后音频 URL (HTTPS): {https_url}")
-            # 使用 HTTPS URL
-            audio_url = https_url
-        elif audio_url.startswith('https://'):
-            logger.info(f"音频 URL (HTTPS): {audio_url}")
-        else:
-            logger.warning(f"音频 URL 格式异常: {audio_url}")
+        # 相同语音 + 文本已预合成或合成过时直接返回本站保存的音频，否则调用 MiniMax 音色复刻 API
+        audio_url, cached = synthesize_voice_clone(file_id, text, voice_description)
 
-        response_data = {
+        if cached:
+            logger.info(f"音色复刻缓存命中 - IP: {client_ip}")
+            return cors_json({'audio_url': audio_url, 'text': text, 'cached': True})
+        logger.info(f"音色复刻成功 - IP: {client_ip}")
+        return cors_json({
             'audio_url': audio_url,
             'text': text
-        }
-
-        logger.info(f"音色复刻成功 - IP: {client_ip}")
-        response = jsonify(response_data)
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response
+        })
 
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
     except requests.exceptions.HTTPError as e:
         logger.error(f"MiniMax 音色复刻 API HTTP 错误 - IP: {client_ip}, 错误: {e}")
-        error_data = e.response.json() if e.response else {}
+        error_data = upstream_error_data(e)
         error_msg = error_data.get('base_resp', {}).get('msg', str(e))
-        response = jsonify({
+        return cors_json({
             'error': f'API 请求失败: {error_msg}',
             'details': str(e),
             'client_ip': client_ip
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 500
+        }, 500)
     except requests.exceptions.Timeout as e:
         logger.error(f"MiniMax 音色复刻超时 - IP: {client_ip}, 错误: {e}")
-        response = jsonify({
+        return cors_json({
             'error': '请求超时，请稍后重试',
             'details': 'API 服务器响应时间过长',
             'retryable': True
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 504
+        }, 504)
     except requests.exceptions.ConnectionError as e:
         logger.error(f"MiniMax 音色复刻连接错误 - IP: {client_ip}, 错误: {e}")
-        response = jsonify({
+        return cors_json({
             'error': '网络连接失败',
             'details': '无法连接到 API 服务器，请检查网络设置',
             'retryable': True
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 502
+        }, 502)
     except Exception as e:
         logger.error(f"音色复刻错误 - IP: {client_ip}, 错误: {str(e)}")
-        response = jsonify({
+        return cors_json({
             'error': str(e),
             'client_ip': client_ip
-        })
+        }, 500)
+
+@app.route('/api/voice-clone/jobs', methods=['POST', 'OPTIONS'])
+def voice_clone_job_submit():
+    """提交音色复刻异步任务：请求体同 /api/voice-clone，立即返回 202 与任务 ID
+
+    已预合成或缓存的文本直接返回 200 与 audio_url（status: done），无需轮询。
+    """
+    if request.method == 'OPTIONS':
+        return cors_preflight()
+
+    client_ip = request.remote_addr or 'unknown'
+    allowed, message = check_rate_limit(client_ip)
+    if not allowed:
+        logger.warning(f"音色复刻速率限制触发 - IP: {client_ip}, 原因: {message}")
+        return cors_json({'error': message}, 429)
+
+    if voice_jobs is None:
+        return cors_json({'error': '异步合成未启用，请使用 /api/voice-clone'}, 404)
+
+    try:
+        text, selected_voice = parse_voice_clone_request(request.get_json())
+        file_id = selected_voice['file_id']
+        stored_url = find_stored_voice_clone_audio(AudioCache.make_key(file_id, text))
+        if stored_url is not None:
+            logger.info(f"音色复刻缓存命中（任务） - IP: {client_ip}")
+            return cors_json({'status': 'done', 'audio_url': stored_url, 'cached': True})
+        check_voice_clone_text_length(text)
+        require_api_key()
+        job_id = voice_jobs.submit(client_ip, file_id, text, selected_voice.get('description', '未知'))
+    except ApiError as e:
+        return cors_json(e.payload, e.status)
+
+    logger.info(f"音色复刻任务已提交 - IP: {client_ip}, job: {job_id}, 文本长度: {len(text)}")
+    return cors_json({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/voice-clone/jobs/{job_id}',
+        'events_url': f'/api/voice-clone/jobs/{job_id}/events',
+    }, 202)
+
+@app.route('/api/voice-clone/jobs/<job_id>', methods=['GET'])
+def voice_clone_job_status(job_id):
+    """查询音色复刻任务：status 为 queued（含 position）/ running / done（含 audio_url）/ error（含 error）"""
+    job = voice_jobs.get(job_id) if voice_jobs is not None else None
+    if job is None:
+        return cors_json({'error': '任务不存在或已过期'}, 404)
+    return cors_json(job)
+
+@app.route('/api/voice-clone/jobs/<job_id>/events', methods=['GET'])
+def voice_clone_job_events(job_id):
+    """以 SSE 订阅任务状态：每次变化发送 status 事件，结束时发送 done 或 error 事件"""
+    job = voice_jobs.get(job_id) if voice_jobs is not None else None
+    if job is None:
+        return cors_json({'error': '任务不存在或已过期'}, 404)
+
+    def generate(job):
+        last = None
+        deadline = time.monotonic() + voice_jobs.stale_seconds
+        while True:
+            if job['status'] in ('done', 'error'):
+                yield sse_event(job['status'], job)
+                return
+            if job != last:
+                yield sse_event('status', job)
+                last = job
+            if time.monotonic() > deadline:
+                yield sse_event('error', {'job_id': job_id, 'status': 'error', 'error': '等待超时，请重新查询'})
+                return
+            time.sleep(VOICE_JOB_POLL_SECONDS)
+            job = voice_jobs.get(job_id) or {'job_id': job_id, 'status': 'error', 'error': '任务不存在或已过期'}
+
+    return sse_response(generate(job))
+
+@app.route('/api/audio/stream/<name>', methods=['GET'])
+def chunked_audio(name):
+    """分段合成中的长文本音频：按顺序输出已完成的片段（完整音频就绪后跳转到可 Range 的缓存地址）"""
+    key, ext = os.path.splitext(name)
+    if chunked_voice_clone is None or ext != '.mp3' or not AudioCache.is_valid_name(name):
+        return cors_json({'error': '音频不存在'}, 404)
+    stored_url = find_stored_voice_clone_audio(key)
+    if stored_url is not None:
+        response = redirect(stored_url)
         response.headers['Access-Control-Allow-Origin'] = '*'
-        return response, 500
+        return response
+    if not chunked_voice_clone.exists(key):
+        return cors_json({'error': '音频不存在'}, 404)
+    response = Response(chunked_voice_clone.iter_audio(key), mimetype='audio/mpeg')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+@app.route('/api/audio/<name>', methods=['GET'])
+def cached_audio(name):
+    """缓存的合成音频（支持 Range 请求，内容按哈希寻址可长期缓存）"""
+    if not AudioCache.is_valid_name(name):
+        return cors_json({'error': '音频不存在'}, 404)
+    directory = presynth_manifest.directory
+    if not os.path.exists(os.path.join(directory, name)):
+        if audio_cache is None:
+            return cors_json({'error': '音频不存在'}, 404)
+        directory = audio_cache.directory
+    response = send_from_directory(directory, name, conditional=True, max_age=365 * 24 * 3600)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
 # ========== 静态文件服务 ==========
 
@@ -570,15 +3400,306 @@ def voice_clone_api():
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(CURRENT_DIR, '')
 
+
+def is_public_static_path(filename):
+    """静态文件路由是否可以提供该路径：拒绝以点开头的路径段（.git、.cache 等）和 .py 文件（api_config.py 含密钥）"""
+    parts = filename.replace('\\', '/').split('/')
+    if any(part.startswith('.') for part in parts):
+        return False
+    return not filename.lower().endswith(('.py', '.pyc'))
+
+
+class StaticAssets:
+    """静态文件：内容哈希 ETag、条件请求 304、按 Accept-Encoding 返回预压缩版本
+
+    文件的 (mtime, 大小) 未变时复用已算好的哈希，If-None-Match 命中直接返回 304，不读文件；
+    同一文件 check_seconds 内最多 stat 一次。不超过 memory_file_max 的内容（原文件与压缩版本分别计）
+    按 (哈希, 编码) 保存在进程内 LRU 中（总量 memory_max_bytes），文件变化后哈希随之变化，旧内容自然淘汰；
+    更大的内容用 send_file 返回，经 wsgi.file_wrapper 由 Gunicorn 以 sendfile 发送。
+    压缩版本保存为 <directory>/<哈希>.gz / .br（所有 worker 共享；部署时可用
+    scripts/precompress-static.py 预先生成，否则由首次请求生成）。
+    index.html 中 css/、js/ 的引用改写为 ?v=<版本>，并注入 window.ASSET_VERSIONS 供前端给
+    data/、data/words/、data/context/、lottie/ 下的 JSON 加版本号（单词与语境分片的版本号写在各自的 index.json 中）；带当前版本号的请求缓存一年（immutable），其余 no-cache。
+    """
+
+    COMPRESSIBLE = frozenset({'.html', '.js', '.css', '.json', '.svg', '.txt', '.md'})
+    VERSIONED_DIRS = ('data', 'data/words', 'data/context', 'lottie')
+    IMMUTABLE = 'public, max-age=31536000, immutable'
+    REVALIDATE = 'no-cache'
+    _INDEX_REF = re.compile(r'(<(?:script|link)\b[^>]*?\b(?:src|href)=")((?:js|css)/[^"?#]+)(")')
+
+    def __init__(self, root, directory, min_bytes=1024, precompress=True, check_seconds=1.0,
+                 memory_max_bytes=64 * 1024 * 1024, memory_file_max=256 * 1024):
+        self.root = root
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.precompress = precompress
+        self.check_seconds = check_seconds
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_file_max = memory_file_max
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.counters = {'memory_hits': 0, 'memory_misses': 0, 'sendfile': 0, 'not_modified': 0}
+        self.assets = {}
+        self.index_page = None
+        self.encodings = (('br', '.br'), ('gzip', '.gz')) if brotli is not None else (('gzip', '.gz'),)
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, filename):
+        """文件信息 {path, etag, version, mimetype, compressible}；不是仓库内的普通文件时返回 None"""
+        asset = self.assets.get(filename)
+        now = time.monotonic()
+        if asset is not None and now - asset['checked_at'] < self.check_seconds:
+            return asset
+        path = safe_join(self.root, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        if asset is not None and asset['signature'] == signature:
+            asset['checked_at'] = now
+            return asset
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if asset is not None:
+            self._forget(asset['etag'])
+        asset = {
+            'path': path,
+            'signature': signature,
+            'checked_at': now,
+            'large': set(),
+            'etag': digest[:32],
+            'version': digest[:12],
+            'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'compressible': os.path.splitext(filename)[1].lower() in self.COMPRESSIBLE and st.st_size >= self.min_bytes,
+        }
+        self.assets[filename] = asset
+        return asset
+
+    @staticmethod
+    def compress(data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=11)
+        return gzip.compress(data, compresslevel=9, mtime=0)
+
+    def variant(self, asset, encoding, suffix):
+        """压缩版本的路径，不存在时生成（内容哈希命名，文件变化后自然换名）"""
+        path = os.path.join(self.directory, asset['etag'] + suffix)
+        if not os.path.exists(path):
+            with open(asset['path'], 'rb') as f:
+                data = self.compress(f.read(), encoding)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return path
+
+    def _forget(self, etag):
+        """文件已变化：丢掉旧内容在内存中的各个版本"""
+        with self.lock:
+            for key in [key for key in self.memory if key[0] == etag]:
+                self.memory_bytes -= len(self.memory.pop(key))
+
+    def body(self, asset, encoding, suffix):
+        """内存中的文件内容（必要时读入并按 LRU 淘汰）；内容过大时返回 None，由调用方走 sendfile"""
+        key = (asset['etag'], encoding)
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return data
+        if encoding in asset['large']:
+            return None
+        path = self.variant(asset, encoding, suffix) if encoding else asset['path']
+        if os.path.getsize(path) > self.memory_file_max:
+            asset['large'].add(encoding)
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        with self.lock:
+            self.counters['memory_misses'] += 1
+            if key not in self.memory:
+                self.memory[key] = data
+                self.memory_bytes += len(data)
+            while self.memory_bytes > self.memory_max_bytes and self.memory:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+        return data
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def negotiate(self, compressible):
+        """按请求的 Accept-Encoding 选择编码（br 优先），返回 (编码, 文件后缀) 或 (None, None)"""
+        if self.precompress and compressible:
+            for encoding, suffix in self.encodings:
+                if request.accept_encodings[encoding] > 0:
+                    return encoding, suffix
+        return None, None
+
+    def _finish(self, response, etag, encoding, versioned, compressible):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.IMMUTABLE if versioned else self.REVALIDATE
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        if encoding and response.status_code != 304:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def response(self, filename):
+        """静态文件响应；文件不存在时返回 None（由调用方返回 404）"""
+        if filename == 'index.html':
+            return self.index_response()
+        asset = self.get(filename)
+        if asset is None:
+            return None
+        encoding, suffix = self.negotiate(asset['compressible'])
+        etag = f"{asset['etag']}-{encoding}" if encoding else asset['etag']
+        versioned = request.args.get('v') == asset['version']
+        if request.if_none_match.contains(etag):
+            self._count('not_modified')
+            return self._finish(Response(status=304), etag, encoding, versioned, asset['compressible'])
+        try:
+            data = self.body(asset, encoding, suffix)
+        except OSError as e:
+            logger.warning(f"静态文件压缩失败，返回原文件: {filename}: {e}")
+            encoding, suffix, etag = None, None, asset['etag']
+            data = self.body(asset, None, None)
+        if data is not None:
+            response = Response(data, mimetype=asset['mimetype'])
+            response.set_etag(etag)
+            response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+        else:
+            self._count('sendfile')
+            path = self.variant(asset, encoding, suffix) if encoding else asset['path']
+            response = send_file(path, mimetype=asset['mimetype'], conditional=True, etag=False)
+        return self._finish(response, etag, encoding, versioned, asset['compressible'])
+
+    def _versioned_files(self):
+        """VERSIONED_DIRS 下（不含子目录）JSON 文件的当前版本号"""
+        versions = {}
+        for directory in self.VERSIONED_DIRS:
+            try:
+                names = sorted(os.listdir(os.path.join(self.root, directory)))
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith('.json'):
+                    asset = self.get(f'{directory}/{name}')
+                    if asset is not None:
+                        versions[f'{directory}/{name}'] = asset['version']
+        return versions
+
+    def render_index(self):
+        """改写后的 index.html（页面或其引用的文件变化时重新生成）"""
+        asset = self.get('index.html')
+        if asset is None:
+            return None
+        page = self.index_page
+        if page is not None and page['etag_source'] == asset['etag']:
+            versions = {name: (self.get(name) or {}).get('version') for name in page['versions']}
+            if versions == page['versions']:
+                return page
+        with open(asset['path'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        refs = sorted({m.group(2) for m in self._INDEX_REF.finditer(text)})
+        versions = {name: (self.get(name) or {}).get('version') for name in refs}
+        data_versions = self._versioned_files()
+        versions.update(data_versions)
+
+        def add_version(m):
+            version = versions.get(m.group(2))
+            return f'{m.group(1)}{m.group(2)}?v={version}{m.group(3)}' if version else m.group(0)
+
+        text = self._INDEX_REF.sub(add_version, text)
+        script = f'<script>window.ASSET_VERSIONS = {json.dumps(data_versions, sort_keys=True)};</script>\n'
+        text = text.replace('</head>', f'    {script}</head>', 1)
+        body = text.encode('utf-8')
+        page = {
+            'etag_source': asset['etag'],
+            'versions': versions,
+            'body': body,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'compressed': {},
+        }
+        self.index_page = page
+        return page
+
+    def index_response(self):
+        page = self.render_index()
+        if page is None:
+            return None
+        encoding, _ = self.negotiate(len(page['body']) >= self.min_bytes)
+        etag = f"{page['etag']}-{encoding}" if encoding else page['etag']
+        if request.if_none_match.contains(etag):
+            self._count('not_modified')
+            response = Response(status=304)
+        else:
+            body = page['body']
+            if encoding:
+                if encoding not in page['compressed']:
+                    page['compressed'][encoding] = self.compress(body, encoding)
+                body = page['compressed'][encoding]
+            response = Response(body, mimetype='text/html')
+        return self._finish(response, etag, encoding, False, True)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'files': len(self.assets),
+                'memory_entries': len(self.memory),
+                'memory_bytes': self.memory_bytes,
+                'encodings': [encoding for encoding, _ in self.encodings] if self.precompress else [],
+                **self.counters,
+            }
+
+    def prebuild(self, filenames):
+        """为给定文件生成所有压缩版本，返回 [(文件名, 原始大小, {编码: 压缩后大小})]"""
+        results = []
+        for filename in filenames:
+            asset = self.get(filename)
+            if asset is None or not asset['compressible']:
+                continue
+            sizes = {
+                encoding: os.path.getsize(self.variant(asset, encoding, suffix))
+                for encoding, suffix in self.encodings
+            }
+            results.append((filename, asset['signature'][1], sizes))
+        return results
+
+
+static_assets = StaticAssets(
+    STATIC_DIR, STATIC_ASSETS['dir'],
+    min_bytes=STATIC_ASSETS['min_bytes'],
+    precompress=STATIC_ASSETS['precompress'],
+    check_seconds=STATIC_ASSETS['check_seconds'],
+    memory_max_bytes=STATIC_ASSETS['memory_max_bytes'],
+    memory_file_max=STATIC_ASSETS['memory_file_max'],
+)
+
+
 @app.route('/')
 def index():
     """主页面"""
-    return send_from_directory(STATIC_DIR, 'index.html')
+    return static_files('index.html')
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    """静态文件服务"""
-    return send_from_directory(STATIC_DIR, filename)
+    """静态文件服务（内容哈希 ETag + 预压缩，见 StaticAssets）"""
+    if not is_public_static_path(filename):
+        abort(404)
+    response = static_assets.response(filename)
+    if response is None:
+        return send_from_directory(STATIC_DIR, filename)
+    return response
 
 # ========== 启动服务器 ==========
 
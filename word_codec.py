@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单词数据的紧凑编码（只依赖标准库）
+
+scripts/build-data.py 在写 data/words.json 的同时写 data/words.compact.json；本模块的 decode_words()
+还原出与 words.json 完全相同的结构。
+
+这是给脚本 / 工具用的未压缩存储格式，不是前端载荷：gzip 后比 words.json 略大（约 25.1 KB 对 24.3 KB），
+解析 + 还原也更慢，前端仍加载分片（或 words.json），由静态文件层提供 gzip / br 版本。
+
+相比 words.json：
+  - 所有字符串只出现一次（字符串表按出现次数排序，常用字符串的下标更短），其余位置写下标
+  - 单词按列存放（每个字段一个下标数组），不重复写字段名
+  - 单词 ID 与分类可由词书 ID、单元和单元分类推出时不写，只记录推不出的例外
+  - 不缩进
+
+格式：
+  {
+    "format": "words-columnar", "version": 1,
+    "strings": [字符串, ...],
+    "fields": ["word", "phonetic", ...],                     # columns 的字段顺序
+    "books": [[ID, 名称, [[单元, 标题, 分类, 单词数], ...]], ...],   # 均为字符串下标（单词数除外）
+    "columns": [[下标, ...], ...],                            # 每列按词书 → 单元 → 单词顺序排列
+    "ids": {"单词序号": 下标}, "categories": {"单词序号": 下标}   # 例外
+  }
+"""
+
+import json
+import re
+from typing import Dict, List
+
+FORMAT = 'words-columnar'
+VERSION = 1
+# 按列存放的字段；还原时单词对象的键顺序为 id、这些字段、category（与 convert-words.js 输出一致）
+FIELDS = ('word', 'phonetic', 'meaning', 'example', 'translation', 'memoryTip')
+
+
+def unit_slug(unit_name: str) -> str:
+    """Unit 3 → u3（单词 ID 中的单元部分，同 scripts/build-data.py 的 unit_slug）"""
+    return re.sub(r'^Unit', 'u', re.sub(r'\s+', '', unit_name), count=1, flags=re.IGNORECASE)
+
+
+def default_word_id(book_id: str, unit_name: str, number: int) -> str:
+    return f'{book_id}-{unit_slug(unit_name)}-w{number}'
+
+
+def encode_words(books: List[Dict]) -> Dict:
+    """words.json 的内容 → 紧凑编码（dict，可直接 json.dumps）"""
+    counts: Dict[str, int] = {}
+
+    def count(value):
+        counts[value] = counts.get(value, 0) + 1
+
+    for book in books:
+        count(book['id'])
+        count(book['name'])
+        for unit in book['units']:
+            for key in ('unit', 'title', 'category'):
+                count(unit[key])
+            for number, word in enumerate(unit['words'], 1):
+                for field in FIELDS:
+                    count(word[field])
+                if word['id'] != default_word_id(book['id'], unit['unit'], number):
+                    count(word['id'])
+                if word['category'] != unit['category']:
+                    count(word['category'])
+
+    # 出现次数多的在前；次数相同按首次出现顺序（dict 保持插入顺序，sorted 稳定）
+    strings = sorted(counts, key=lambda value: -counts[value])
+    lookup = {value: i for i, value in enumerate(strings)}
+
+    encoded_books = []
+    columns: List[List[int]] = [[] for _ in FIELDS]
+    ids: Dict[str, int] = {}
+    categories: Dict[str, int] = {}
+    position = 0
+    for book in books:
+        units = []
+        for unit in book['units']:
+            units.append([lookup[unit['unit']], lookup[unit['title']], lookup[unit['category']], len(unit['words'])])
+            for number, word in enumerate(unit['words'], 1):
+                for column, field in zip(columns, FIELDS):
+                    column.append(lookup[word[field]])
+                if word['id'] != default_word_id(book['id'], unit['unit'], number):
+                    ids[str(position)] = lookup[word['id']]
+                if word['category'] != unit['category']:
+                    categories[str(position)] = lookup[word['category']]
+                position += 1
+        encoded_books.append([lookup[book['id']], lookup[book['name']], units])
+
+    return {
+        'format': FORMAT,
+        'version': VERSION,
+        'strings': strings,
+        'fields': list(FIELDS),
+        'books': encoded_books,
+        'columns': columns,
+        'ids': ids,
+        'categories': categories,
+    }
+
+
+def dumps(books: List[Dict]) -> str:
+    """紧凑编码的文件内容（无缩进）"""
+    return json.dumps(encode_words(books), ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_words(data: Dict) -> List[Dict]:
+    """紧凑编码 → 与 words.json 相同的词书列表"""
+    if data.get('format') != FORMAT or data.get('version') != VERSION:
+        raise ValueError(f"不支持的单词数据格式: {data.get('format')} v{data.get('version')}")
+    strings = data['strings']
+    columns = [(field, data['columns'][i]) for i, field in enumerate(data['fields'])]
+    ids = data.get('ids', {})
+    categories = data.get('categories', {})
+    books = []
+    position = 0
+    for book_id, book_name, units in data['books']:
+        book = {'id': strings[book_id], 'name': strings[book_name], 'units': []}
+        for unit_name, title, category, word_count in units:
+            unit = {'unit': strings[unit_name], 'title': strings[title], 'category': strings[category], 'words': []}
+            for number in range(1, word_count + 1):
+                key = str(position)
+                word = {'id': strings[ids[key]] if key in ids else default_word_id(book['id'], unit['unit'], number)}
+                for field, column in columns:
+                    word[field] = strings[column[position]]
+                word['category'] = strings[categories[key]] if key in categories else unit['category']
+                unit['words'].append(word)
+                position += 1
+            book['units'].append(unit)
+        books.append(book)
+    return books
+
+
+def load_words(path: str) -> List[Dict]:
+    """读取单词数据：紧凑编码（words.compact.json）或 words.json 均可"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get('format') == FORMAT:
+        return decode_words(data)
+    return data